@@ -0,0 +1,94 @@
+import argparse
+import random
+import time
+
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.domain.entities.baseline import Baseline
+from bin.contentctl_project.contentctl_core.domain.entities.baseline_tags import BaselineTags
+from bin.contentctl_project.contentctl_core.domain.entities.deployment import Deployment
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
+from bin.contentctl_project.contentctl_core.domain.entities.detection_tags import DetectionTags
+from bin.contentctl_project.contentctl_core.domain.entities.lookup import Lookup
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+from bin.contentctl_project.contentctl_core.domain.entities.playbook import Playbook
+from bin.contentctl_project.contentctl_core.domain.entities.playbook_tags import PlaybookTag
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+
+# Measures how resolving the cross references of detections (deployment, baselines,
+# playbooks, macros and lookups) scales with the size of the content.  The objects are
+# built with pydantic's construct(), so only the builder steps themselves are timed.
+#
+#   python -m bin.contentctl_project.benchmarks.bench_cross_reference --sizes 1000 10000 50000
+
+DETECTION_TYPES = ["TTP", "Anomaly", "Hunting", "Correlation"]
+
+
+def generate_content(detection_count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    macro_count = max(1, detection_count // 5)
+    lookup_count = max(1, detection_count // 10)
+    baseline_count = max(1, detection_count // 20)
+    playbook_count = max(1, detection_count // 20)
+
+    deployments = [Deployment.construct(name=f"deployment_{detection_type.lower()}", tags={"type": detection_type})
+                   for detection_type in DETECTION_TYPES + ["Baseline"]]
+    macros = [Macro.construct(name=f"macro_{i}", definition="search *", description="synthetic macro") for i in range(macro_count)]
+    lookups = [Lookup.construct(name=f"lookup_{i}") for i in range(lookup_count)]
+
+    detections = []
+    for i in range(detection_count):
+        search = f"`macro_{rng.randrange(macro_count)}` `macro_{rng.randrange(macro_count)}` " \
+                 f"| lookup lookup_{rng.randrange(lookup_count)} field | `detection_{i}_filter`"
+        tags = DetectionTags.construct(name=f"detection_{i}", analytic_story=[f"story_{rng.randrange(max(1, detection_count // 10))}"])
+        detections.append(Detection.construct(name=f"detection_{i}", type=rng.choice(DETECTION_TYPES), search=search,
+                                              tags=tags, deployment=None))
+
+    baselines = [Baseline.construct(name=f"baseline_{i}",
+                                    tags=BaselineTags.construct(detections=[f"detection_{rng.randrange(detection_count)}" for _ in range(5)]))
+                 for i in range(baseline_count)]
+    playbooks = [Playbook.construct(name=f"playbook_{i}",
+                                    tags=PlaybookTag.construct(detections=[f"detection_{rng.randrange(detection_count)}" for _ in range(5)]))
+                 for i in range(playbook_count)]
+
+    return {"detections": detections, "deployments": deployments, "baselines": baselines,
+            "playbooks": playbooks, "macros": macros, "lookups": lookups}
+
+
+def resolve_references(content: dict, indexed: bool) -> float:
+    builder = SecurityContentDetectionBuilder(skip_enrichment=True)
+    references = {key: content[key] for key in ["deployments", "baselines", "playbooks", "macros", "lookups"]}
+
+    start = time.perf_counter()
+    if indexed:
+        references = {key: ContentIndex(value) for key, value in references.items()}
+    for detection in content["detections"]:
+        builder.setParsedObject(detection)
+        detection.deployment = None
+        builder.addDeployment(references["deployments"])
+        builder.addBaseline(references["baselines"])
+        builder.addPlaybook(references["playbooks"])
+        builder.addMacros(references["macros"])
+        builder.addLookups(references["lookups"])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross reference resolution in SecurityContentDetectionBuilder")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 50000],
+                        help="Number of synthetic detections to build")
+    parser.add_argument("--max_unindexed", type=int, default=10000,
+                        help="Largest size to also run with plain lists, which rebuilds the lookup for every detection")
+    args = parser.parse_args()
+
+    print(f"{'detections':>12} {'indexed (s)':>14} {'per detection (us)':>20} {'plain lists (s)':>16}")
+    for size in args.sizes:
+        content = generate_content(size)
+        indexed = resolve_references(content, indexed=True)
+        unindexed = "skipped"
+        if size <= args.max_unindexed:
+            unindexed = f"{resolve_references(content, indexed=False):.3f}"
+        print(f"{size:>12} {indexed:>14.3f} {indexed / size * 1e6:>20.1f} {unindexed:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from bin.contentctl_project.benchmarks.bench_templates import load_escu, run_docgen
+from bin.contentctl_project.benchmarks.synthetic_content import generate_content
+from bin.contentctl_project.contentctl_core.application.factory.utils.profiler import Profiler
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser
+from bin.contentctl_project.contentctl_core.application.factory.utils.utils import Utils
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_core.domain.entities.lookup import Lookup
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+from bin.contentctl_project.contentctl_core.domain.entities.story import Story
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_conf_adapter import ObjToConfAdapter
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_json_adapter import ObjToJsonAdapter
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_story_builder import SecurityContentStoryBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+
+# Times every stage of generate on synthetic content (see synthetic_content.py) at
+# several scales, and compares the times with the ones stored in baselines/:
+#   yaml_load     - reading every content file (YmlReader)
+#   validation    - validating the files with the pydantic models, without enrichment
+#   load          - the Factory, loading and cross referencing all content, and every
+#                   builder step in it (builder:<class>.<method>, see Profiler)
+#   conf          - rendering the .conf files of the ESCU app
+#   docgen        - rendering the documentation pages
+#   json_export   - the API export
+# Every stage runs --repeat times and its fastest run is kept.  A stage is a regression
+# when it is more than --tolerance slower than its baseline, and at least 5ms slower, so
+# that the short builder steps do not fail on noise.  Baselines depend on the machine,
+# record them again with --save on the machine that compares against them.
+#
+#   python -m bin.contentctl_project.benchmarks.bench_suite --sizes 100 500 2000
+#   python -m bin.contentctl_project.benchmarks.bench_suite --save
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "bench_suite.json")
+MINIMUM_REGRESSION_SECONDS = 0.005
+MODELS = {"detections": Detection, "stories": Story, "macros": Macro, "lookups": Lookup}
+BUILDERS = [SecurityContentBasicBuilder, SecurityContentDetectionBuilder, SecurityContentStoryBuilder]
+
+
+def timed(function, repeat: int, setup=None) -> float:
+    # setup runs before every run, untimed.  As in timeit, the garbage collector does not
+    # run during a run, so a collection of what earlier stages allocated is not timed.
+    fastest = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest
+
+
+def read_content(path: str) -> dict[str, list[dict]]:
+    return {type: [YmlReader.load_file(str(file)) for file in Utils.get_all_yml_files_from_directory(os.path.join(path, type))]
+            for type in MODELS}
+
+
+def validate_content(content: dict[str, list[dict]]) -> None:
+    # Prepared as the builders do before validating
+    for type, objects in content.items():
+        for obj in objects:
+            obj = {**obj, "check_references": False}
+            if "tags" in obj:
+                obj["tags"] = {**obj["tags"], "name": obj["name"]}
+            MODELS[type].parse_obj(obj)
+
+
+def load_content(path: str, repeat: int) -> dict:
+    # The builder steps are timed with the Profiler, which adds its own overhead to load
+    for builder in BUILDERS:
+        Profiler.instrument(builder, 'builder')
+    results = {}
+    for _ in range(repeat):
+        # Every run parses the searches again, as a run of contentctl does
+        SplParser.commands.cache_clear()
+        gc.collect()
+        Profiler.enable()
+        start = time.perf_counter()
+        content = load_escu(path)
+        elapsed = time.perf_counter() - start
+        Profiler.disable()
+        run = {"load": elapsed}
+        run.update({f"builder:{name}": stats[1] for name, stats in Profiler.stats.items()})
+        results = {stage: min(seconds, results.get(stage, seconds)) for stage, seconds in run.items()}
+    return content, results
+
+
+def clean_directory(output_path: str, directories: list[str]) -> None:
+    shutil.rmtree(output_path, ignore_errors=True)
+    for directory in directories:
+        os.makedirs(os.path.join(output_path, directory))
+
+
+def write_conf(content, output_path: str) -> None:
+    adapter = ObjToConfAdapter(os.path.dirname(output_path))
+    adapter.writeHeaders(output_path)
+    for type in [SecurityContentType.detections, SecurityContentType.stories, SecurityContentType.lookups, SecurityContentType.macros]:
+        adapter.writeObjects(getattr(content, type.name), output_path, type)
+    adapter.finalize(output_path)
+
+
+def write_json(content, output_path: str) -> None:
+    os.makedirs(output_path, exist_ok=True)
+    adapter = ObjToJsonAdapter()
+    for type in [SecurityContentType.detections, SecurityContentType.stories, SecurityContentType.lookups, SecurityContentType.macros]:
+        adapter.writeObjects(getattr(content, type.name), output_path, type)
+
+
+def run_scale(detections: int, repeat: int, working_directory: str) -> dict[str, float]:
+    path = os.path.join(working_directory, f"content_{detections}")
+    generate_content(path, detections)
+    output_path = os.path.join(working_directory, f"output_{detections}")
+
+    results = {}
+    results["yaml_load"] = timed(lambda: read_content(path), repeat)
+    files = read_content(path)
+    results["validation"] = timed(lambda: validate_content(files), repeat)
+    content, load_results = load_content(path, repeat)
+    results.update(load_results)
+    results["conf"] = timed(lambda: write_conf(content, os.path.join(output_path, "app")), repeat,
+                            lambda: clean_directory(os.path.join(output_path, "app"), ["default", "lookups"]))
+    # Unchanged pages are not written again, so every run starts without them
+    results["docgen"] = timed(lambda: run_docgen(content, os.path.join(output_path, "docs")), repeat,
+                              lambda: clean_directory(os.path.join(output_path, "docs"), []))
+    results["json_export"] = timed(lambda: write_json(content, os.path.join(output_path, "api")), repeat)
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    regressions = []
+    print(f"\n{'size':>6} {'stage':<66} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                print(f"{size:>6} {stage:<66} {'-':>11} {seconds:>11.4f} {'new':>8}")
+                continue
+            change = (seconds - base) / base if base > 0 else 0
+            regression = seconds > base * (1 + tolerance) and seconds - base >= MINIMUM_REGRESSION_SECONDS
+            if regression:
+                regressions.append(f"{stage} at {size} detections: {base:.4f}s -> {seconds:.4f}s ({change:+.0%})")
+            print(f"{size:>6} {stage:<66} {base:>11.4f} {seconds:>11.4f} {change:>+8.0%}{'  REGRESSION' if regression else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate on synthetic content and compare with the stored baselines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000], help="numbers of detections to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every stage, the fastest is kept")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown relative to the baseline reported as a regression")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with, or to write with --save")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline instead of comparing")
+    args = parser.parse_args()
+
+    working_directory = tempfile.mkdtemp()
+    try:
+        results = {}
+        for size in args.sizes:
+            print(f"Benchmarking [{size}] detections...")
+            results[str(size)] = run_scale(size, args.repeat, working_directory)
+    finally:
+        shutil.rmtree(working_directory, ignore_errors=True)
+
+    if args.save:
+        baseline = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                # Keep the baselines of the sizes that were not run this time
+                baseline["results"] = {**json.load(f)["results"], **results}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            # Formatted the way the pretty-format-json pre-commit hook leaves it
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to [{args.baseline}]")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at [{args.baseline}], run with --save to record one")
+        baseline = {"results": {}}
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print(f"\n[{len(regressions)}] regression(s) against [{args.baseline}]:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
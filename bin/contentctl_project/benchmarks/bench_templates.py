@@ -0,0 +1,119 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from jinja2 import Environment, FileSystemLoader
+
+from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto, Factory, FactoryOutputDto
+from bin.contentctl_project.contentctl_core.application.factory.ba_factory import BAFactoryInputDto, BAFactory, BAFactoryOutputDto
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_md_adapter import ObjToMdAdapter
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_yml_adapter import ObjToYmlAdapter
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry, TEMPLATE_DIRECTORY, custom_jinja2_enrichment_filter
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_baseline_builder import SecurityContentBaselineBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_investigation_builder import SecurityContentInvestigationBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_playbook_builder import SecurityContentPlaybookBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_story_builder import SecurityContentStoryBuilder
+
+# Measures template rendering for docgen (ObjToMdAdapter) and SSA generation
+# (ObjToYmlAdapter) on the real content.  Content is loaded once, without enrichment, so
+# only the writers are timed.  Three modes are compared:
+#   per_call   - a new jinja2 Environment for every object, as the writers did before
+#                the TemplateRegistry
+#   registry   - the shared environments, compiling every template on first use
+#   bytecode   - the shared environments with a warm FileSystemBytecodeCache
+#
+#   python -m bin.contentctl_project.benchmarks.bench_templates --path .
+
+
+def per_call_template(template_name: str, trim_blocks: bool = True):
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_DIRECTORY), trim_blocks=trim_blocks)
+    environment.filters['custom_jinja2_enrichment_filter'] = custom_jinja2_enrichment_filter
+    return environment.get_template(template_name)
+
+
+def load_escu(path: str) -> FactoryOutputDto:
+    factory_output_dto = FactoryOutputDto([],[],[],[],[],[],[],[])
+    Factory(factory_output_dto).execute(FactoryInputDto(
+        os.path.abspath(path),
+        SecurityContentBasicBuilder(),
+        SecurityContentDetectionBuilder(force_cached_or_offline=True, skip_enrichment=True),
+        SecurityContentStoryBuilder(),
+        SecurityContentBaselineBuilder(),
+        SecurityContentInvestigationBuilder(),
+        SecurityContentPlaybookBuilder(input_path=path),
+        SecurityContentDirector(),
+        {}
+    ))
+    return factory_output_dto
+
+
+def load_ssa(path: str) -> BAFactoryOutputDto:
+    factory_output_dto = BAFactoryOutputDto([])
+    BAFactory(factory_output_dto).execute(BAFactoryInputDto(
+        os.path.abspath(path),
+        SecurityContentBasicBuilder(),
+        SecurityContentDetectionBuilder(force_cached_or_offline=True, skip_enrichment=True),
+        SecurityContentDirector(),
+        {}
+    ))
+    return factory_output_dto
+
+
+def run_docgen(content: FactoryOutputDto, output_path: str) -> float:
+    for directory in ['_data', '_pages', '_stories', '_posts', '_playbooks']:
+        os.makedirs(os.path.join(output_path, directory), exist_ok=True)
+    start = time.perf_counter()
+    ObjToMdAdapter().writeObjects([content.stories, content.detections, content.playbooks], output_path)
+    return time.perf_counter() - start
+
+
+def run_ssa(path: str, output_path: str) -> float:
+    # The SSA writer modifies the detections it writes, so they are loaded for every run
+    content = load_ssa(path)
+    for directory in ['srs', 'complex']:
+        os.makedirs(os.path.join(output_path, directory), exist_ok=True)
+    start = time.perf_counter()
+    ObjToYmlAdapter(path).writeObjects(content.detections, output_path)
+    return time.perf_counter() - start
+
+
+def set_mode(mode: str, bytecode_directory: str) -> None:
+    TemplateRegistry.environments = {}
+    TemplateRegistry.bytecode_cache_directory = bytecode_directory if mode == "bytecode" else None
+    TemplateRegistry.get_template = staticmethod(per_call_template) if mode == "per_call" else REGISTRY_GET_TEMPLATE
+
+
+REGISTRY_GET_TEMPLATE = TemplateRegistry.__dict__['get_template']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark template rendering for docgen and SSA generation")
+    parser.add_argument("-p", "--path", default=".", help="path to the Splunk Security Content folder")
+    args = parser.parse_args()
+
+    escu = load_escu(args.path)
+    working_directory = tempfile.mkdtemp()
+    bytecode_directory = os.path.join(working_directory, "bytecode")
+    try:
+        # Warm the bytecode cache so the bytecode mode measures loading, not compiling
+        set_mode("bytecode", bytecode_directory)
+        TemplateRegistry.precompile()
+
+        print(f"{'mode':>10} {'docgen (s)':>12} {'ssa (s)':>10}")
+        for mode in ["per_call", "registry", "bytecode"]:
+            set_mode(mode, bytecode_directory)
+            docgen = run_docgen(escu, os.path.join(working_directory, mode, "docs"))
+            ssa = run_ssa(args.path, os.path.join(working_directory, mode, "ssa"))
+            print(f"{mode:>10} {docgen:>12.3f} {ssa:>10.3f}")
+    finally:
+        set_mode("registry", bytecode_directory)
+        shutil.rmtree(working_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
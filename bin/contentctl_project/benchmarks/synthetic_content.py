@@ -0,0 +1,286 @@
+import argparse
+import csv
+import os
+import random
+import shutil
+import uuid
+
+import yaml
+
+# Generates a content folder (detections, stories, macros, lookups and the default
+# deployments) of any size for the benchmarks.  The objects are valid and are loaded by
+# the Factory like the real content.  The number of objects per detection and the
+# distributions of detection types, tags, MITRE ATT&CK ids, observables, searches and of
+# the number of detections per story follow the real content (detections/ at the time
+# of writing, without deprecated detections), so the work per object is comparable.
+#
+#   python -m bin.contentctl_project.benchmarks.synthetic_content --detections 5000 --output /tmp/synthetic
+
+# Objects per detection in the real content
+STORIES_PER_DETECTION = 0.15
+MACROS_PER_DETECTION = 0.13
+LOOKUPS_PER_DETECTION = 0.05
+
+# value: weight
+DETECTION_TYPES = {"TTP": 705, "Anomaly": 311, "Hunting": 184, "Correlation": 10}
+STATUSES = {"production": 1065, "experimental": 145}
+SECURITY_DOMAINS = {"endpoint": 938, "threat": 107, "network": 98, "access": 29, "identity": 21, "audit": 9, "cloud": 3}
+DIRECTORIES = {"endpoint": "endpoint", "threat": "endpoint", "network": "network", "access": "application",
+               "identity": "cloud", "audit": "cloud", "cloud": "cloud"}
+ASSET_TYPES = {"Endpoint": 975, "AWS Account": 50, "Infrastructure": 25, "Azure Active Directory": 25, "Web Server": 22,
+               "AWS Instance": 18, "Windows": 12, "Office 365": 12, "Network": 8, "GSuite": 7, "GitHub": 5}
+MITRE_ATTACK_IDS = {"T1562": 66, "T1059": 58, "T1218": 57, "T1078": 50, "T1548": 50, "T1562.001": 48, "T1110": 38, "T1112": 38,
+                    "T1566": 34, "T1059.001": 34, "T1190": 33, "T1003": 33, "T1548.003": 32, "T1566.001": 31, "T1087": 28,
+                    "T1053": 28, "T1055": 27, "T1110.003": 27, "T1586": 27, "T1021": 26, "T1069": 26, "T1586.003": 26,
+                    "T1070": 20, "T1087.002": 19, "T1543.003": 19, "T1105": 15, "T1047": 14, "T1486": 12, "T1098": 12,
+                    "T1098.003": 10}
+OBSERVABLE_TYPES = {"Hostname": 637, "User": 609, "Process": 429, "Endpoint": 345, "IP Address": 103, "Other": 68,
+                    "Process Name": 29, "File Name": 14, "URL String": 5}
+OBSERVABLE_ROLES = {"Victim": 1512, "Attacker": 262, "Child Process": 209, "Parent Process": 185, "Other": 50}
+CONFIDENCES = {50: 343, 70: 196, 80: 194, 90: 152, 100: 149, 60: 98, 30: 50, 40: 12}
+IMPACTS = {70: 272, 50: 271, 80: 213, 30: 137, 60: 102, 90: 95, 100: 55, 40: 30}
+STORIES_PER_DETECTION_COUNTS = {1: 624, 2: 332, 3: 121, 4: 56, 5: 31, 6: 25, 7: 9, 8: 3, 9: 2, 12: 2, 15: 2, 20: 1}
+REQUIRED_FIELD_COUNTS = {12: 243, 8: 180, 7: 175, 6: 164, 5: 140, 9: 71, 4: 62, 11: 51, 10: 30, 1: 25}
+# Macros in a search, including the filter macro
+MACRO_COUNTS = {5: 490, 4: 340, 2: 154, 6: 142, 3: 42, 7: 26, 1: 9, 8: 5}
+STORY_CATEGORIES = {"Adversary Tactics": 101, "Malware": 46, "Cloud Security": 25, "Privilege Escalation": 9, "Data Destruction": 7,
+                    "Account Compromise": 7, "Best Practices": 6, "Abuse": 5, "Lateral Movement": 5, "Vulnerability": 3}
+PRODUCTS = ["Splunk Enterprise", "Splunk Enterprise Security", "Splunk Cloud"]
+
+FIELDS = ["_time", "dest", "user", "src", "process_name", "process", "process_id", "parent_process_name", "parent_process",
+          "parent_process_id", "process_guid", "original_file_name", "Registry.registry_path", "Registry.registry_value_name",
+          "EventCode", "ComputerName", "signature", "action", "src_ip", "dest_port", "app", "eventName", "userIdentity.arn"]
+DATAMODELS = ["Endpoint.Processes", "Endpoint.Registry", "Endpoint.Filesystem", "Network_Traffic.All_Traffic", "Web.Web", "Authentication.Authentication"]
+WORDS = ["Suspicious", "Windows", "Process", "Registry", "Remote", "Service", "Execution", "Credential", "Access", "Cloud",
+         "Account", "Privilege", "Escalation", "Persistence", "Modification", "Network", "Connection", "PowerShell", "Script",
+         "Scheduled", "Task", "Rare", "Parent", "Child", "Creation", "Deletion", "Token", "Policy", "Login", "Failed"]
+DEPLOYMENTS = {
+    "TTP": {"cron_schedule": "0 * * * *", "notable": True, "rba": True},
+    "Anomaly": {"cron_schedule": "0 * * * *", "notable": False, "rba": True},
+    "Hunting": {"cron_schedule": "0 * * * *", "notable": False, "rba": False},
+    "Correlation": {"cron_schedule": "0 * * * *", "notable": True, "rba": False},
+    "Baseline": {"cron_schedule": "10 0 * * *", "notable": False, "rba": False},
+}
+
+
+def choice(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def sample(rng: random.Random, weights: dict, count: int) -> list:
+    chosen = []
+    while len(chosen) < min(count, len(weights)):
+        value = choice(rng, weights)
+        if value not in chosen:
+            chosen.append(value)
+    return chosen
+
+
+def zipf_weights(count: int) -> dict:
+    # A few stories, macros and lookups are used by many detections, most by a few
+    return {index: 1 / (index + 1) for index in range(count)}
+
+
+def new_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def file_name(name: str) -> str:
+    return name.lower().replace(' ', '_').replace('-', '_') + '.yml'
+
+
+def write_yml(path: str, obj: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        yaml.safe_dump(obj, f, sort_keys=False)
+
+
+def object_name(rng: random.Random, index: int, words: int) -> str:
+    # Detection names are at most 67 characters
+    name = rng.sample(WORDS, words)
+    while len(" ".join(name)) > 56:
+        name.pop()
+    return " ".join(name + [str(index)])
+
+
+def generate_deployments(path: str) -> None:
+    for detection_type, deployment in DEPLOYMENTS.items():
+        obj = {
+            "name": f"ESCU Default Configuration {detection_type}",
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, detection_type)),
+            "date": "2021-12-21",
+            "author": "Synthetic Content",
+            "description": f"This configuration file applies to all detections of type {detection_type}.",
+            "scheduling": {"cron_schedule": deployment["cron_schedule"], "earliest_time": "-70m@m", "latest_time": "-10m@m", "schedule_window": "auto"},
+            "tags": {"type": detection_type}
+        }
+        alert_action = {}
+        if deployment["notable"]:
+            alert_action["notable"] = {"rule_description": "%description%", "rule_title": "%name%", "nes_fields": ["user", "dest"]}
+        if deployment["rba"]:
+            alert_action["rba"] = {"enabled": "true"}
+        if alert_action:
+            obj["alert_action"] = alert_action
+        write_yml(os.path.join(path, "deployments", f"00_default_{detection_type.lower()}.yml"), obj)
+
+
+def generate_macros(path: str, rng: random.Random, count: int) -> list[str]:
+    names = [f"synthetic_macro_{index}" for index in range(count)]
+    for name in names:
+        write_yml(os.path.join(path, "macros", f"{name}.yml"), {
+            "definition": f"sourcetype={rng.choice(['XmlWinEventLog', 'aws:cloudtrail', 'o365:management:activity', 'stream:http'])} "
+                          f"index={rng.choice(['main', 'windows', 'cloud'])}",
+            "description": "customer specific splunk configurations(eg- index, source, sourcetype). Replace the macro definition with configurations for your Splunk Environment.",
+            "name": name
+        })
+    return names
+
+
+def generate_lookups(path: str, rng: random.Random, count: int) -> list[str]:
+    names = [f"synthetic_lookup_{index}" for index in range(count)]
+    for name in names:
+        write_yml(os.path.join(path, "lookups", f"{name}.yml"), {
+            "description": "A list of values used by synthetic detections.",
+            "filename": f"{name}.csv",
+            "name": name,
+            "default_match": "false",
+            "match_type": "WILDCARD(value)",
+            "min_matches": 1,
+            "case_sensitive_match": "false"
+        })
+        with open(os.path.join(path, "lookups", f"{name}.csv"), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["value", "is_suspicious", "description"])
+            for row in range(rng.randrange(5, 200)):
+                writer.writerow([f"*{rng.choice(WORDS).lower()}{row}*", "true", f"synthetic row {row}"])
+    return names
+
+
+def generate_search(rng: random.Random, name: str, macros: list[str], lookups: list[str], fields: list[str]) -> str:
+    macro_weights = zipf_weights(len(macros))
+    used_macros = [macros[index] for index in sample(rng, macro_weights, choice(rng, MACRO_COUNTS) - 1)]
+    filter_macro = file_name(name)[:-len('.yml')] + '_filter'
+    by_fields = ", ".join(fields[:4])
+
+    if rng.random() < 0.6:
+        datamodel = rng.choice(DATAMODELS)
+        search = f"| tstats `{used_macros[0]}` count min(_time) as firstTime max(_time) as lastTime from datamodel={datamodel} " \
+                 f"where {datamodel.split('.')[1]}.{fields[-1]}=* by {by_fields} | `drop_dm_object_name({datamodel.split('.')[1]})`" \
+            if used_macros else f"| tstats count from datamodel={datamodel} by {by_fields}"
+        used_macros = used_macros[1:]
+    else:
+        search = f"`{used_macros[0]}` EventCode={rng.randrange(1, 5000)} | stats count min(_time) as firstTime max(_time) as lastTime by {by_fields}" \
+            if used_macros else f"search * | stats count by {by_fields}"
+        used_macros = used_macros[1:]
+    if lookups and rng.random() < 0.3:
+        search += f" | lookup {lookups[choice(rng, zipf_weights(len(lookups)))]} value as {fields[0]} OUTPUT is_suspicious | search is_suspicious=true"
+    for macro in used_macros:
+        search += f" | `{macro}`"
+    return search + f" | `{filter_macro}`"
+
+
+def generate_detections(path: str, rng: random.Random, count: int, stories: list[str], macros: list[str], lookups: list[str]) -> None:
+    story_weights = zipf_weights(len(stories))
+    for index in range(count):
+        name = object_name(rng, index, rng.randrange(3, 7))
+        status = choice(rng, STATUSES)
+        security_domain = choice(rng, SECURITY_DOMAINS)
+        fields = rng.sample(FIELDS, choice(rng, REQUIRED_FIELD_COUNTS))
+        confidence, impact = choice(rng, CONFIDENCES), choice(rng, IMPACTS)
+        observables = [{"name": rng.choice(["dest", "user", "src", "process_name", "parent_process_name"]), "type": observable_type,
+                        "role": [choice(rng, OBSERVABLE_ROLES)]}
+                       for observable_type in sample(rng, OBSERVABLE_TYPES, rng.randrange(1, 4))]
+        detection = {
+            "name": name,
+            "id": new_id(rng),
+            "version": rng.randrange(1, 5),
+            "date": f"202{rng.randrange(0, 3)}-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}",
+            "author": "Synthetic Content, Splunk",
+            "status": status,
+            "type": choice(rng, DETECTION_TYPES),
+            "description": f"The following analytic identifies {name.lower()}. " * rng.randrange(1, 4),
+            "data_source": [],
+            "search": generate_search(rng, name, macros, lookups, fields),
+            "how_to_implement": "To successfully implement this search you need to be ingesting the required fields from your endpoints.",
+            "known_false_positives": "Administrators may legitimately perform this activity. Filter as needed.",
+            "references": [f"https://attack.mitre.org/techniques/T{rng.randrange(1000, 1600)}/"],
+            "tags": {
+                "analytic_story": [stories[story] for story in sample(rng, story_weights, choice(rng, STORIES_PER_DETECTION_COUNTS))],
+                "asset_type": choice(rng, ASSET_TYPES),
+                "confidence": confidence,
+                "impact": impact,
+                "message": f"{name} on $dest$ by $user$",
+                "mitre_attack_id": sample(rng, MITRE_ATTACK_IDS, rng.randrange(1, 4)),
+                "observable": observables,
+                "product": PRODUCTS,
+                "required_fields": fields,
+                "risk_score": confidence * impact // 100,
+                "security_domain": security_domain
+            },
+        }
+        if status == "production":
+            detection["tests"] = [{"name": "True Positive Test", "attack_data": [{
+                "data": f"https://media.githubusercontent.com/media/splunk/attack_data/master/datasets/synthetic/{index}/windows-sysmon.log",
+                "source": "XmlWinEventLog:Microsoft-Windows-Sysmon/Operational", "sourcetype": "xmlwineventlog"}]}]
+        directory = "experimental" if status == "experimental" else DIRECTORIES[security_domain]
+        write_yml(os.path.join(path, "detections", directory, file_name(name)), detection)
+
+
+def generate_stories(path: str, rng: random.Random, count: int) -> list[str]:
+    names = []
+    for index in range(count):
+        name = object_name(rng, index, rng.randrange(2, 5))
+        names.append(name)
+        category = choice(rng, STORY_CATEGORIES)
+        write_yml(os.path.join(path, "stories", file_name(name)), {
+            "name": name,
+            "id": new_id(rng),
+            "version": 1,
+            "date": "2022-08-17",
+            "author": "Synthetic Content, Splunk",
+            "description": f"Monitor for activities and techniques associated with {name.lower()}.",
+            "narrative": f"Adversaries use {name.lower()} to reach their objectives. " * rng.randrange(2, 8),
+            "references": [f"https://attack.mitre.org/tactics/TA{rng.randrange(1, 43):04}/"],
+            "tags": {
+                "analytic_story": name,
+                "category": [category],
+                "product": PRODUCTS,
+                "usecase": "Advanced Threat Detection" if category == "Adversary Tactics" else "Security Monitoring"
+            }
+        })
+    return names
+
+
+def generate_content(path: str, detections: int, seed: int = 0) -> dict[str, int]:
+    # Replaces the content below path
+    rng = random.Random(seed)
+    for directory in ["detections", "stories", "macros", "lookups", "deployments"]:
+        shutil.rmtree(os.path.join(path, directory), ignore_errors=True)
+    counts = {
+        "detections": detections,
+        "stories": max(1, round(detections * STORIES_PER_DETECTION)),
+        "macros": max(1, round(detections * MACROS_PER_DETECTION)),
+        "lookups": max(1, round(detections * LOOKUPS_PER_DETECTION)),
+    }
+
+    generate_deployments(path)
+    macros = generate_macros(path, rng, counts["macros"])
+    lookups = generate_lookups(path, rng, counts["lookups"])
+    stories = generate_stories(path, rng, counts["stories"])
+    generate_detections(path, rng, detections, stories, macros, lookups)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic security content for the benchmarks")
+    parser.add_argument("-d", "--detections", type=int, default=1000, help="number of detections, stories, macros and lookups are scaled with it")
+    parser.add_argument("-o", "--output", required=True, help="content folder to write, existing content below it is replaced")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate_content(args.output, args.detections, args.seed)
+    print(", ".join(f"[{count}] {type}" for type, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
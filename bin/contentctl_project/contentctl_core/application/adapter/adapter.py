@@ -7,3 +7,6 @@ class Adapter(abc.ABC):
     @abc.abstractmethod
     def writeObjects(self, objects: list, output_path: str, type: SecurityContentType = None) -> None:
         pass
+
+    def finalize(self, output_path: str) -> None:
+        pass
@@ -57,17 +57,31 @@ class DetectionBuilder(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def addCve(self) -> None:
+    def addCve(self, input_path: str) -> None:
         pass
 
     @abc.abstractmethod
-    def addSplunkApp(self) -> None:
+    def addSplunkApp(self, input_path: str) -> None:
+        pass
+
+    def prefetchEnrichment(self, detections: list, input_path: str) -> None:
+        # Called once with every parsed detection before the per detection enrichment,
+        # so builders can resolve external enrichment in bulk.  Enrichment caches are kept
+        # under input_path.  Nothing to do by default.
         pass
 
     @abc.abstractmethod
     def setObject(self, path: str) -> None:
         pass
 
+    @abc.abstractmethod
+    def parseObject(self, path: str) -> SecurityContentObject:
+        pass
+
+    @abc.abstractmethod
+    def setParsedObject(self, detection: SecurityContentObject) -> None:
+        pass
+
     @abc.abstractmethod
     def addCIS(self) -> None:
         pass
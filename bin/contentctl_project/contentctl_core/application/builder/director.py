@@ -7,11 +7,12 @@ from bin.contentctl_project.contentctl_core.application.builder.investigation_bu
 from bin.contentctl_project.contentctl_core.application.builder.story_builder import StoryBuilder
 from bin.contentctl_project.contentctl_core.application.builder.playbook_builder import PlaybookBuilder
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentProduct
+from bin.contentctl_project.contentctl_core.domain.entities.security_content_object import SecurityContentObject
 
 class Director(abc.ABC):
 
     @abc.abstractmethod
-    def constructDetection(self, builder: DetectionBuilder, path: str, deployments: list, playbooks: list, baselines: list, attack_enrichment: dict, macros: list) -> None:
+    def constructDetection(self, builder: DetectionBuilder, path: str, deployments: list, playbooks: list, baselines: list, attack_enrichment: dict, macros: list, lookups: list, input_path: str, force_cached_or_offline: bool = False, detection: SecurityContentObject = None) -> None:
         pass
 
     @abc.abstractmethod
@@ -80,7 +80,7 @@ class BAFactory():
             type_string = "UNKNOWN TYPE"
             if type == SecurityContentType.detections:
                 type_string = "Detections"    
-                self.input_dto.director.constructDetection(self.input_dto.detection_builder, file, [], [], [], self.input_dto.attack_enrichment, [], [])
+                self.input_dto.director.constructDetection(self.input_dto.detection_builder, file, [], [], [], self.input_dto.attack_enrichment, [], [], self.input_dto.input_path)
                 detection = self.input_dto.detection_builder.getObject()
                 Utils.add_id(self.ids, detection, file)
                 
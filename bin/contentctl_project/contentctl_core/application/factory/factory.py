@@ -1,10 +1,12 @@
 import os
 import sys
+import functools
 
 from pydantic import ValidationError
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 import pathlib
-from typing import Tuple
+from typing import Tuple, Union
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentProduct
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 from bin.contentctl_project.contentctl_core.application.builder.basic_builder import BasicBuilder
@@ -15,6 +17,10 @@ from bin.contentctl_project.contentctl_core.application.builder.investigation_bu
 from bin.contentctl_project.contentctl_core.application.builder.playbook_builder import PlaybookBuilder
 from bin.contentctl_project.contentctl_core.application.builder.director import Director
 from bin.contentctl_project.contentctl_core.application.factory.utils.utils import Utils
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_graph import ContentGraph
+from bin.contentctl_project.contentctl_core.application.factory.utils.search_linter import SearchLinter
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser
 from bin.contentctl_project.contentctl_core.domain.entities.link_validator import LinkValidator
 from bin.contentctl_project.contentctl_core.domain.entities.security_content_object import SecurityContentObject
 
@@ -30,6 +36,9 @@ class FactoryInputDto:
     director: Director
     attack_enrichment: dict
     force_cached_or_offline: bool = True
+    workers: int = 1
+    # SearchLinter rules suppressed for every detection
+    search_lint_suppress: tuple = ()
     
 
 @dataclass()
@@ -42,15 +51,72 @@ class FactoryOutputDto:
      deployments: list
      macros: list
      lookups: list
+     graph: Union[ContentGraph, None] = None
+
+
+def parse_detection(detection_builder: DetectionBuilder, file: pathlib.Path) -> Union[SecurityContentObject, Exception]:
+     # Runs in a worker process when Factory is given more than one worker.  Exceptions
+     # are returned rather than raised so that one bad file does not abort the whole map
+     # and so that they can be reported in file order during the merge phase.
+     try:
+          return detection_builder.parseObject(str(file))
+     except Exception as e:
+          return e
+
+
+# The order in which content types are loaded: each type only references types loaded before it
+LOAD_ORDER = [
+     SecurityContentType.lookups,
+     SecurityContentType.macros,
+     SecurityContentType.deployments,
+     SecurityContentType.baselines,
+     SecurityContentType.investigations,
+     SecurityContentType.playbooks,
+     SecurityContentType.detections,
+     SecurityContentType.stories
+]
+
+# The types of content that content of each type embeds, e.g. the deployment of a
+# baseline.  getIndexes indexes them, and reloadContent retries the files of a type that
+# failed to load when content of one of these types changes.
+EMBEDDED_TYPES = {
+     SecurityContentType.baselines: [SecurityContentType.deployments],
+     SecurityContentType.detections: [SecurityContentType.deployments, SecurityContentType.playbooks, SecurityContentType.baselines,
+                                      SecurityContentType.macros, SecurityContentType.lookups],
+     # Stories are matched to content through tags.analytic_story
+     SecurityContentType.stories: [SecurityContentType.detections, SecurityContentType.baselines, SecurityContentType.investigations]
+}
+
+TYPE_STRINGS = {
+     SecurityContentType.lookups: "Lookups",
+     SecurityContentType.macros: "Macros",
+     SecurityContentType.deployments: "Deployments",
+     SecurityContentType.baselines: "Baselines",
+     SecurityContentType.investigations: "Investigations",
+     SecurityContentType.playbooks: "Playbooks",
+     SecurityContentType.detections: "Detections",
+     SecurityContentType.stories: "Stories"
+}
 
 
 class Factory():
      input_dto: FactoryInputDto
      output_dto: FactoryOutputDto
-     ids: dict[str,list[pathlib.Path]] = {}
+     ids: dict[str,list[pathlib.Path]]
+     # The object loaded from every file, so that reloadContent can replace it
+     files: dict[str, SecurityContentObject]
+     # The files of each type that could not be loaded.  They may only be missing content
+     # of another type, so reloadContent retries them when content of that type changes.
+     failed_files: dict[SecurityContentType, set[str]]
+     validation_errors: list[Tuple[pathlib.Path,  ValidationError]]
 
      def __init__(self, output_dto: FactoryOutputDto) -> None:
         self.output_dto = output_dto
+        # Per factory, so that content loaded by another factory is not a duplicate
+        self.ids = {}
+        self.files = {}
+        self.failed_files = {type: set() for type in LOAD_ORDER}
+        self.validation_errors = []
 
      def execute(self, input_dto: FactoryInputDto) -> None:
           self.input_dto = input_dto
@@ -58,17 +124,15 @@ class Factory():
           #Accumulate any validation errors that may occur while creating security_contnet
           validation_errors = []
           # order matters to load and enrich security content types
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.lookups))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.macros))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.deployments))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.baselines))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.investigations))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.playbooks))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.detections))
-          validation_errors.extend(self.createSecurityContent(SecurityContentType.stories))
+          for type in LOAD_ORDER:
+               validation_errors.extend(self.createSecurityContent(type))
           validation_errors.extend(Utils.check_ids_for_duplicates(self.ids))
+          self.output_dto.graph = self.buildGraph()
+          # References were only collected while loading content, they are all resolved here
+          LinkValidator.resolve_references()
           LinkValidator.print_link_validation_errors()
           
+          self.validation_errors = validation_errors
           if len(validation_errors) != 0:
                print(f"There were [{len(validation_errors)}] error(s) found while parsing security_content")
                for ve in validation_errors:
@@ -77,6 +141,17 @@ class Factory():
                     print(f'\nValidation Error for file [{file_path}]:\n{str(error)}')
                raise(Exception("Error(s) validating Security Content"))
 
+     def getObjects(self, type: SecurityContentType) -> list:
+          return getattr(self.output_dto, type.name)
+
+     def buildGraph(self) -> ContentGraph:
+          return ContentGraph.build({type: self.getObjects(type) for type in LOAD_ORDER})
+
+     def getIndexes(self, type: SecurityContentType) -> dict[SecurityContentType, ContentIndex]:
+          # Indexes over the types that content of this type references.  Every one of them
+          # has been loaded by now, so each index is only built once per type.
+          return {referenced_type: ContentIndex(self.getObjects(referenced_type)) for referenced_type in EMBEDDED_TYPES.get(type, [])}
+
      def createSecurityContent(self, type: SecurityContentType) -> list[Tuple[pathlib.Path,  ValidationError]]:
           objects = []
           if type == SecurityContentType.deployments:
@@ -98,74 +173,30 @@ class Factory():
 
           #Non threaded, production version of the construction code
           files_without_ssa = [f for f in files if not f.name.startswith('ssa___')]
+
+          # Detections are parsed and validated up front (optionally across a process pool).
+          # Cross references to deployments, baselines, playbooks, macros and lookups are
+          # then resolved in the loop below, in file order, in this process.
+          parsed_detections = None
+          if type == SecurityContentType.detections:
+               parsed_detections = self.parseDetections(files_without_ssa)
+               # External enrichment (e.g. CVEs) is resolved for all detections at once
+               try:
+                    self.input_dto.detection_builder.prefetchEnrichment([d for d in parsed_detections if not isinstance(d, Exception)], self.input_dto.input_path)
+               except Exception as e:
+                    validation_errors.append((pathlib.Path(os.path.join(self.input_dto.input_path, 'detections')), e))
+          indexes = self.getIndexes(type)
+
           for index,file in enumerate(files_without_ssa):
                #Index + 1 because we are zero indexed, not 1 indexed.  This ensures
                # that printouts end at 100%, not some other number 
                progress_percent = ((index+1)/len(files_without_ssa)) * 100
                try:
-                    type_string = "UNKNOWN TYPE"
-                    if type == SecurityContentType.lookups:
-                         type_string = "Lookups"
-                         self.input_dto.director.constructLookup(self.input_dto.basic_builder, str(file))
-                         lookup = self.input_dto.basic_builder.getObject()
-                         Utils.add_id(self.ids, lookup, file)
-                         self.output_dto.lookups.append(lookup)
-                    
-                    elif type == SecurityContentType.macros:
-                         type_string = "Macros"
-                         self.input_dto.director.constructMacro(self.input_dto.basic_builder, str(file))
-                         macro = self.input_dto.basic_builder.getObject()
-                         Utils.add_id(self.ids, macro, file)
-                         self.output_dto.macros.append(macro)
-                    
-                    elif type == SecurityContentType.deployments:
-                         type_string = "Deployments"
-                         self.input_dto.director.constructDeployment(self.input_dto.basic_builder, str(file))
-                         deployment = self.input_dto.basic_builder.getObject()
-                         Utils.add_id(self.ids, deployment, file)
-                         self.output_dto.deployments.append(deployment)
-                    
-                    elif type == SecurityContentType.playbooks:
-                         type_string = "Playbooks"
-                         self.input_dto.director.constructPlaybook(self.input_dto.playbook_builder, str(file))
-                         playbook = self.input_dto.playbook_builder.getObject()
-                         Utils.add_id(self.ids, playbook, file)
-                         self.output_dto.playbooks.append(playbook)                    
-                    
-                    elif type == SecurityContentType.baselines:
-                         type_string = "Baselines"
-                         self.input_dto.director.constructBaseline(self.input_dto.baseline_builder, str(file), self.output_dto.deployments)
-                         baseline = self.input_dto.baseline_builder.getObject()
-                         Utils.add_id(self.ids, baseline, file)
-                         self.output_dto.baselines.append(baseline)
-                    
-                    elif type == SecurityContentType.investigations:
-                         type_string = "Investigations"
-                         self.input_dto.director.constructInvestigation(self.input_dto.investigation_builder, file)
-                         investigation = self.input_dto.investigation_builder.getObject()
-                         Utils.add_id(self.ids, investigation, file)
-                         self.output_dto.investigations.append(investigation)
-
-                    elif type == SecurityContentType.stories:
-                         type_string = "Stories"
-                         self.input_dto.director.constructStory(self.input_dto.story_builder, str(file), 
-                              self.output_dto.detections, self.output_dto.baselines, self.output_dto.investigations)
-                         story = self.input_dto.story_builder.getObject()
-                         Utils.add_id(self.ids, story, file)
-                         self.output_dto.stories.append(story)
-               
-                    elif type == SecurityContentType.detections:
-                         type_string = "Detections"
-                         self.input_dto.director.constructDetection(self.input_dto.detection_builder, file, 
-                              self.output_dto.deployments, self.output_dto.playbooks, self.output_dto.baselines,
-                              self.input_dto.attack_enrichment, self.output_dto.macros,
-                              self.output_dto.lookups, self.input_dto.force_cached_or_offline)
-                         detection = self.input_dto.detection_builder.getObject()
-                         Utils.add_id(self.ids, detection, file)
-                         self.output_dto.detections.append(detection)
-
-                    else:
-                         raise Exception(f"Unsupported type: [{type}]")
+                    type_string = TYPE_STRINGS.get(type, "UNKNOWN TYPE")
+                    obj = self.constructObject(type, file, indexes, parsed_detections[index] if parsed_detections is not None else None)
+                    Utils.add_id(self.ids, obj, file)
+                    self.getObjects(type).append(obj)
+                    self.files[str(file)] = obj
                     
                     if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()) or not already_ran:
                          already_ran = True
@@ -173,8 +204,10 @@ class Factory():
                
                except ValidationError as e:
                     validation_errors.append((pathlib.Path(file), e))
+                    self.failed_files[type].add(os.path.abspath(file))
                except Exception as e:
                     validation_errors.append((pathlib.Path(file), e))
+                    self.failed_files[type].add(os.path.abspath(file))
                     
                
                    
@@ -184,3 +217,225 @@ class Factory():
           print("Done!")
 
           return validation_errors
+
+
+     def constructObject(self, type: SecurityContentType, file: pathlib.Path, indexes: dict[SecurityContentType, ContentIndex],
+                         parsed_detection: Union[SecurityContentObject, Exception, None] = None) -> SecurityContentObject:
+          if type == SecurityContentType.lookups:
+               self.input_dto.director.constructLookup(self.input_dto.basic_builder, str(file))
+               return self.input_dto.basic_builder.getObject()
+          
+          elif type == SecurityContentType.macros:
+               self.input_dto.director.constructMacro(self.input_dto.basic_builder, str(file))
+               return self.input_dto.basic_builder.getObject()
+          
+          elif type == SecurityContentType.deployments:
+               self.input_dto.director.constructDeployment(self.input_dto.basic_builder, str(file))
+               return self.input_dto.basic_builder.getObject()
+          
+          elif type == SecurityContentType.playbooks:
+               self.input_dto.director.constructPlaybook(self.input_dto.playbook_builder, str(file))
+               return self.input_dto.playbook_builder.getObject()
+          
+          elif type == SecurityContentType.baselines:
+               self.input_dto.director.constructBaseline(self.input_dto.baseline_builder, str(file), self.output_dto.deployments)
+               return self.input_dto.baseline_builder.getObject()
+          
+          elif type == SecurityContentType.investigations:
+               self.input_dto.director.constructInvestigation(self.input_dto.investigation_builder, file)
+               return self.input_dto.investigation_builder.getObject()
+
+          elif type == SecurityContentType.stories:
+               self.input_dto.director.constructStory(self.input_dto.story_builder, str(file), 
+                    indexes[SecurityContentType.detections], indexes[SecurityContentType.baselines], indexes[SecurityContentType.investigations])
+               return self.input_dto.story_builder.getObject()
+     
+          elif type == SecurityContentType.detections:
+               if parsed_detection is None:
+                    parsed_detection = parse_detection(self.input_dto.detection_builder, file)
+               if isinstance(parsed_detection, Exception):
+                    raise parsed_detection
+               self.input_dto.director.constructDetection(self.input_dto.detection_builder, file, 
+                    indexes[SecurityContentType.deployments], indexes[SecurityContentType.playbooks], indexes[SecurityContentType.baselines],
+                    self.input_dto.attack_enrichment, indexes[SecurityContentType.macros],
+                    indexes[SecurityContentType.lookups], self.input_dto.input_path, self.input_dto.force_cached_or_offline,
+                    detection=parsed_detection)
+               detection = self.input_dto.detection_builder.getObject()
+               self.lintDetection(detection, indexes[SecurityContentType.macros])
+               return detection
+
+          else:
+               raise Exception(f"Unsupported type: [{type}]")
+
+
+     def lintDetection(self, detection: SecurityContentObject, macros: ContentIndex) -> None:
+          # The cost of the search with its macros expanded, as it runs on the search head.
+          # The macros of the detection that are not in macros/, its _filter macro, are
+          # expanded too.  The expansion is the one the detection builder cached.
+          suppress = detection.tags.search_lint_suppress or []
+          unknown_rules = [rule for rule in suppress if rule not in SearchLinter.RULES]
+          if len(unknown_rules) > 0:
+               raise(Exception(f"Unknown search_lint_suppress rule(s) {unknown_rules} in detection [{detection.name}], "
+                               f"the rules are {list(SearchLinter.RULES)}"))
+          search = detection.search if isinstance(detection.search, str) else ''
+          extra_macros = [macro for macro in detection.macros or [] if len(macros.get_by_name(macro.name)) == 0]
+          expanded_search = macros.macro_expander.expand(search, extra_macros)
+          detection.search_cost, detection.search_warnings = SearchLinter.lint(expanded_search, [*suppress, *self.input_dto.search_lint_suppress])
+
+
+     def getContentType(self, file: str) -> Union[SecurityContentType, None]:
+          # The type of a content file, from the directory createSecurityContent finds it in
+          relative_path = pathlib.Path(os.path.relpath(file, self.input_dto.input_path))
+          if relative_path.suffix != '.yml' or relative_path.name.startswith('ssa___') or len(relative_path.parts) < 2:
+               return None
+          for type in LOAD_ORDER:
+               if relative_path.parts[0] == type.name:
+                    return type
+          return None
+
+     def reloadContent(self, files: list[str]) -> dict[str, list[Exception]]:
+          # Loads the given content files again, or drops the content of files that were
+          # deleted, and then every object that embeds content which changed: the detections
+          # using a macro, lookup, deployment, baseline or playbook, and the stories of a
+          # detection, baseline or investigation.  Types are reloaded in LOAD_ORDER, so
+          # everything an object embeds is up to date when it is reloaded.  Returns the
+          # errors of every file that was loaded again, by file; files without errors map
+          # to an empty list.  The references recorded while reloading are resolved at the
+          # end, and a link that failed is an error of each reloaded file using it.
+          pending = {}
+          for file in files:
+               file = os.path.abspath(file)
+               type = self.getContentType(file)
+               if type is not None:
+                    pending[file] = type
+
+          errors = {}
+          loaded = {}
+          for type in LOAD_ORDER:
+               batch = sorted(file for file, file_type in pending.items() if file_type == type and file not in errors)
+               if len(batch) == 0:
+                    continue
+               indexes = self.getIndexes(type)
+               parsed_detections = {}
+               if type == SecurityContentType.detections:
+                    parsed_detections = self.parseReloadedDetections(batch, errors)
+               for file in batch:
+                    errors.setdefault(file, [])
+                    old = self.files.pop(file, None)
+                    new = None
+                    if os.path.exists(file):
+                         try:
+                              new = self.constructObject(type, pathlib.Path(file), indexes, parsed_detections.get(file))
+                         except Exception as e:
+                              errors[file].append(e)
+                    if new is None and os.path.exists(file):
+                         self.failed_files[type].add(file)
+                    else:
+                         self.failed_files[type].discard(file)
+                    self.replaceObject(type, file, old, new)
+                    if old is not None:
+                         self.output_dto.graph.remove_object(type, old)
+                    if new is not None:
+                         self.output_dto.graph.add_object(type, new)
+                         loaded[file] = new
+                    for changed in [old, new]:
+                         if changed is not None:
+                              pending.update(self.getEmbeddingFiles(type, changed))
+
+          for file, duplicate_errors in self.getDuplicateIdErrors(list(errors)).items():
+               errors[file].extend(duplicate_errors)
+
+          LinkValidator.resolve_references()
+          for file, obj in loaded.items():
+               for reference in getattr(obj, 'references', None) or []:
+                    stats = LinkValidator.cache.get(reference)
+                    if stats is not None and stats.resolved and stats.valid is False:
+                         errors[file].append(Exception(f"Reference Link Failed: {reference}"))
+          return errors
+
+     def parseReloadedDetections(self, files: list[str], errors: dict[str, list[Exception]]) -> dict[str, Union[SecurityContentObject, Exception]]:
+          # As in createSecurityContent, the enrichment of the reloaded detections is
+          # resolved at once.  If that fails, it is an error of each of them.
+          existing = [file for file in files if os.path.exists(file)]
+          parsed_detections = dict(zip(existing, self.parseDetections([pathlib.Path(file) for file in existing])))
+          try:
+               self.input_dto.detection_builder.prefetchEnrichment([d for d in parsed_detections.values() if not isinstance(d, Exception)], self.input_dto.input_path)
+          except Exception as e:
+               for file in files:
+                    errors.setdefault(file, []).append(e)
+          return parsed_detections
+
+     def replaceObject(self, type: SecurityContentType, file: str, old: Union[SecurityContentObject, None], new: Union[SecurityContentObject, None]) -> None:
+          # The new object takes the place of the old one, so the order of the content is kept
+          objects = self.getObjects(type)
+          if old is not None:
+               position = next(position for position, obj in enumerate(objects) if obj is old)
+               if new is None:
+                    del objects[position]
+               else:
+                    objects[position] = new
+               old_id = getattr(old, 'id', None)
+               if old_id in self.ids:
+                    self.ids[old_id] = [path for path in self.ids[old_id] if str(path) != file]
+                    if len(self.ids[old_id]) == 0:
+                         del self.ids[old_id]
+          elif new is not None:
+               objects.append(new)
+          if new is not None:
+               self.files[file] = new
+               Utils.add_id(self.ids, new, pathlib.Path(file))
+
+     def getEmbeddingFiles(self, type: SecurityContentType, obj: SecurityContentObject) -> dict[str, SecurityContentType]:
+          # The files of the objects that embed obj, see reloadContent
+          embedding = []
+          if type in [SecurityContentType.macros, SecurityContentType.lookups]:
+               # The detections using obj, also through other macros.  A detection has no
+               # edge to a macro or lookup that did not exist when it was built, nor to
+               # drop_dm_object_name, so the detections calling obj directly are added too.
+               names = {name for _, name in self.output_dto.graph.get_dependents(type, obj.name, SecurityContentType.detections, transitive=True)}
+               calls = SplParser.macros if type == SecurityContentType.macros else SplParser.lookups
+               embedding += [(SecurityContentType.detections, detection) for detection in self.output_dto.detections
+                             if detection.name in names or obj.name in calls(detection.search if isinstance(detection.search, str) else '')]
+          elif type == SecurityContentType.deployments:
+               # Deployments are matched by their tags, any detection or baseline may use one
+               embedding += [(SecurityContentType.detections, detection) for detection in self.output_dto.detections]
+               embedding += [(SecurityContentType.baselines, baseline) for baseline in self.output_dto.baselines]
+          references = ContentGraph.get_references(type, obj)
+          if type in [SecurityContentType.baselines, SecurityContentType.playbooks]:
+               names = set(references.get(SecurityContentType.detections, []))
+               embedding += [(SecurityContentType.detections, detection) for detection in self.output_dto.detections if detection.name in names]
+          if type in [SecurityContentType.detections, SecurityContentType.baselines, SecurityContentType.investigations]:
+               names = set(references.get(SecurityContentType.stories, []))
+               embedding += [(SecurityContentType.stories, story) for story in self.output_dto.stories if story.name in names]
+
+          files = {id(file_obj): file for file, file_obj in self.files.items()}
+          embedding_files = {files[id(embedding_obj)]: embedding_type for embedding_type, embedding_obj in embedding if id(embedding_obj) in files}
+          # A file that failed may have been missing obj, e.g. a baseline without a deployment
+          for embedding_type, embedded_types in EMBEDDED_TYPES.items():
+               if type in embedded_types:
+                    embedding_files.update({file: embedding_type for file in self.failed_files[embedding_type]})
+          return embedding_files
+
+     def getDuplicateIdErrors(self, files: list[str]) -> dict[str, list[Exception]]:
+          # The same errors as Utils.check_ids_for_duplicates, reported against each of the files
+          errors = {}
+          for file in files:
+               obj_id = getattr(self.files.get(file), 'id', None)
+               if obj_id is not None and len(self.ids.get(obj_id, [])) > 1:
+                    all_files = '\n\t'.join(str(pathlib.Path(p)) for p in self.ids[obj_id])
+                    errors[file] = [ValueError(f"Error validating id [{obj_id}] - duplicate ID was used in the following files: \n\t{all_files}")]
+          return errors
+
+     def parseDetections(self, files: list[pathlib.Path]) -> list[Union[SecurityContentObject, Exception]]:
+          parse = functools.partial(parse_detection, self.input_dto.detection_builder)
+          if self.input_dto.workers <= 1 or len(files) < 2:
+               return list(map(parse, files))
+
+          print(f"\r{'Detections Parsing'.rjust(23)}: [{self.input_dto.workers} workers]...", end="", flush=True)
+          # executor.map preserves the input order, so the merge phase sees the
+          # detections in exactly the same order as the sequential path
+          chunksize = max(1, len(files) // (self.input_dto.workers * 4))
+          with ProcessPoolExecutor(max_workers=self.input_dto.workers) as executor:
+               parsed = list(executor.map(parse, files, chunksize=chunksize))
+          print("Done!")
+          return parsed
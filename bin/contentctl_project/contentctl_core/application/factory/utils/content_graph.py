@@ -0,0 +1,157 @@
+from collections import deque
+from typing import Iterable, Union
+
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser
+
+# A node of the graph: the type and the name of a piece of content
+Node = tuple[SecurityContentType, str]
+
+
+class ContentGraph():
+    # The references between all of the security content, indexed in both directions.
+    # An edge goes from an object to what it depends on: a detection to its macros,
+    # lookups, baselines, playbooks, deployment, data sources and stories; a baseline or
+    # playbook to its stories and detections; an investigation to its stories; a macro to
+    # the macros and lookups its definition uses.  So "what depends on macro X" is
+    # get_dependents(macros, X) and "all detections in story Y" is
+    # get_dependents(stories, Y, SecurityContentType.detections).
+    #
+    # Factory builds the graph once all content is loaded.  References are kept by name,
+    # so a reference to content that does not exist (the generated <detection>_filter
+    # macros, for example) is still a node, but has no object.
+    objects: dict[Node, object]
+    dependencies: dict[Node, dict[Node, None]]
+    dependents: dict[Node, dict[Node, None]]
+
+    def __init__(self):
+        self.objects = {}
+        self.dependencies = {}
+        self.dependents = {}
+
+
+    @staticmethod
+    def build(content: dict[SecurityContentType, list]) -> "ContentGraph":
+        graph = ContentGraph()
+        for type, objects in content.items():
+            for obj in objects:
+                graph.add_object(type, obj)
+        return graph
+
+
+    @staticmethod
+    def from_references(references: Iterable[tuple[str, str, str, str]], nodes: Iterable[tuple[str, str]] = ()) -> "ContentGraph":
+        # (source type, source name, target type, target name) and (type, name), as stored
+        # in a content bundle.  The graph has no objects, only their names.
+        graph = ContentGraph()
+        for type, name in nodes:
+            graph.dependencies.setdefault((SecurityContentType[type], name), {})
+            graph.dependents.setdefault((SecurityContentType[type], name), {})
+        for source_type, source_name, target_type, target_name in references:
+            graph.add_reference((SecurityContentType[source_type], source_name), (SecurityContentType[target_type], target_name))
+        return graph
+
+
+    @staticmethod
+    def get_references(type: SecurityContentType, obj) -> dict[SecurityContentType, list[str]]:
+        # The names of the content obj references, by type
+        tags = getattr(obj, 'tags', None)
+        if type == SecurityContentType.detections:
+            return {
+                SecurityContentType.stories: tags.analytic_story or [],
+                SecurityContentType.macros: [macro.name for macro in obj.macros or []],
+                SecurityContentType.lookups: [lookup.name for lookup in obj.lookups or []],
+                SecurityContentType.baselines: [baseline.name for baseline in obj.baselines or []],
+                SecurityContentType.playbooks: [playbook.name for playbook in obj.playbooks or []],
+                SecurityContentType.deployments: [obj.deployment.name] if obj.deployment and obj.deployment.name else [],
+                SecurityContentType.data_sources: obj.data_source or []
+            }
+        elif type == SecurityContentType.baselines:
+            return {
+                SecurityContentType.stories: tags.analytic_story or [],
+                SecurityContentType.detections: tags.detections or [],
+                SecurityContentType.deployments: [obj.deployment.name] if obj.deployment and obj.deployment.name else []
+            }
+        elif type == SecurityContentType.playbooks:
+            return {
+                SecurityContentType.stories: tags.analytic_story or [],
+                SecurityContentType.detections: tags.detections or []
+            }
+        elif type == SecurityContentType.investigations:
+            return {
+                SecurityContentType.stories: tags.analytic_story or []
+            }
+        elif type == SecurityContentType.macros:
+            # Parsed the way the detection builder parses the macros and lookups of a search
+            return {
+                SecurityContentType.macros: [macro for macro in SplParser.macros(obj.definition or '') if macro != obj.name],
+                SecurityContentType.lookups: SplParser.lookups(obj.definition or '')
+            }
+        return {}
+
+
+    def add_object(self, type: SecurityContentType, obj) -> None:
+        node = (type, obj.name)
+        self.objects[node] = obj
+        self.dependencies.setdefault(node, {})
+        self.dependents.setdefault(node, {})
+        for target_type, target_names in ContentGraph.get_references(type, obj).items():
+            for target_name in target_names:
+                self.add_reference(node, (target_type, target_name))
+
+
+    def remove_object(self, type: SecurityContentType, obj) -> None:
+        # Drops the object and what it references.  References to it are kept, since they
+        # are made by name and the content making them has not changed.
+        node = (type, obj.name)
+        if self.objects.get(node) is obj:
+            del self.objects[node]
+        for target in self.dependencies.get(node, {}):
+            self.dependents[target].pop(node, None)
+        self.dependencies[node] = {}
+
+
+    def add_reference(self, source: Node, target: Node) -> None:
+        self.dependencies.setdefault(source, {})[target] = None
+        self.dependents.setdefault(source, {})
+        self.dependencies.setdefault(target, {})
+        self.dependents.setdefault(target, {})[source] = None
+
+
+    def get_object(self, type: SecurityContentType, name: str) -> Union[object, None]:
+        return self.objects.get((type, name))
+
+
+    def get_nodes(self, type: Union[SecurityContentType, None] = None) -> list[Node]:
+        return [node for node in self.dependencies if type is None or node[0] == type]
+
+
+    def get_dependencies(self, type: SecurityContentType, name: str, target_type: Union[SecurityContentType, None] = None,
+                         transitive: bool = False) -> list[Node]:
+        return self.traverse(self.dependencies, (type, name), target_type, transitive)
+
+
+    def get_dependents(self, type: SecurityContentType, name: str, source_type: Union[SecurityContentType, None] = None,
+                       transitive: bool = False) -> list[Node]:
+        return self.traverse(self.dependents, (type, name), source_type, transitive)
+
+
+    def traverse(self, adjacency: dict[Node, dict[Node, None]], start: Node, type: Union[SecurityContentType, None],
+                 transitive: bool) -> list[Node]:
+        # Breadth first, so nearer nodes are listed first.  The type filter applies to the
+        # result, not to the walk: the detections depending on a macro include those that
+        # use it through another macro.
+        if not transitive:
+            return [node for node in adjacency.get(start, {}) if type is None or node[0] == type]
+
+        visited = {start}
+        found = []
+        queue = deque([start])
+        while queue:
+            for node in adjacency.get(queue.popleft(), {}):
+                if node not in visited:
+                    visited.add(node)
+                    queue.append(node)
+                    if type is None or node[0] == type:
+                        found.append(node)
+        return found
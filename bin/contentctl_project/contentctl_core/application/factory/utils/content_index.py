@@ -0,0 +1,126 @@
+import functools
+from collections.abc import Hashable
+from typing import Union
+
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import MacroExpander
+
+
+class ContentIndex():
+    # Lookup tables over one type of security content, so that resolving the cross
+    # references of a detection or story does not scan every object of the types it
+    # references.  Factory builds one index per content type once that type has
+    # been loaded.  Each table is built the first time it is used, and lists objects in
+    # the same order as the underlying list, so lookups return exactly what a linear
+    # scan of the list would have returned.
+    objects: list
+
+    def __init__(self, objects: list):
+        self.objects = objects
+
+
+    @staticmethod
+    def of(objects: Union[list, "ContentIndex"]) -> "ContentIndex":
+        if isinstance(objects, ContentIndex):
+            return objects
+        return ContentIndex(objects)
+
+
+    def __iter__(self):
+        return iter(self.objects)
+
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+    @functools.cached_property
+    def by_name(self) -> dict[str, list]:
+        index = {}
+        for obj in self.objects:
+            index.setdefault(obj.name, []).append(obj)
+        return index
+
+
+    @functools.cached_property
+    def by_detection(self) -> dict[str, list]:
+        # An object is listed once for every time a detection appears in its tags.detections
+        index = {}
+        for obj in self.objects:
+            for detection in obj.tags.detections or []:
+                index.setdefault(detection, []).append(obj)
+        return index
+
+
+    @functools.cached_property
+    def by_analytic_story(self) -> dict[str, list]:
+        # An object is listed once for every time a story appears in its tags.analytic_story
+        index = {}
+        for obj in self.objects:
+            if obj:
+                for analytic_story in obj.tags.analytic_story:
+                    index.setdefault(analytic_story, []).append(obj)
+        return index
+
+
+    @functools.cached_property
+    def by_deployment_tag(self) -> tuple[dict[tuple, int], list[tuple]]:
+        # (tag, value) -> position of the last deployment with that tag.  Values that can
+        # not be hashed are kept aside and compared one by one.
+        index = {}
+        unhashable = []
+        for position, deployment in enumerate(self.objects):
+            for tag, value in dict(deployment.tags).items():
+                if isinstance(value, Hashable):
+                    index[(tag, value)] = position
+                else:
+                    unhashable.append((tag, value, position))
+        return index, unhashable
+
+
+    @functools.cached_property
+    def deployment_tags(self) -> set[str]:
+        index, unhashable = self.by_deployment_tag
+        return {tag for tag, _ in index} | {tag for tag, _, _ in unhashable}
+
+
+    @functools.cached_property
+    def macro_expander(self) -> MacroExpander:
+        # Expands searches with the macros of this index, shared by everything that
+        # expands searches with them so that each search is only expanded once
+        return MacroExpander(self)
+
+
+    def get_by_name(self, name: str) -> list:
+        return self.by_name.get(name, [])
+
+
+    def get_by_detection(self, detection_name: str) -> list:
+        return self.by_detection.get(detection_name, [])
+
+
+    def get_by_analytic_story(self, story_name: str) -> list:
+        return self.by_analytic_story.get(story_name, [])
+
+
+    def get_deployment(self, obj) -> Union[object, None]:
+        # Equivalent to matching every tag of every deployment against the attribute of
+        # the same name on obj and keeping the last deployment that matched
+        index, unhashable = self.by_deployment_tag
+
+        matched_position = -1
+        for tag in self.deployment_tags:
+            if tag.startswith('_') or not hasattr(obj, tag):
+                continue
+            attr_values = getattr(obj, tag)
+            if type(attr_values) is str:
+                attr_values = [attr_values]
+            for attr_value in attr_values:
+                if isinstance(attr_value, Hashable):
+                    matched_position = max(matched_position, index.get((tag, attr_value), -1))
+                for unhashable_tag, value, position in unhashable:
+                    if unhashable_tag == tag and attr_value == value:
+                        matched_position = max(matched_position, position)
+
+        if matched_position == -1:
+            return None
+        return self.objects[matched_position]
@@ -0,0 +1,162 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Iterator, Union
+
+
+class Profiler():
+    # Records the wall time, CPU time, allocations and number of calls of the steps of a
+    # run.  Disabled by default: classes are only instrumented, and spans only recorded,
+    # once enable() was called (see --profile).
+    #
+    # Allocations are the net number of bytes a step left allocated, traced with
+    # tracemalloc.  Tracing every allocation makes a run several times slower, so they are
+    # only recorded when enable() is asked to (see --profile_allocations).  CPU time is the
+    # time of the calling thread.  Steps running in worker processes (--workers) are not
+    # recorded, their time is part of the step waiting for them.
+    #
+    # The spans are written in the Chrome trace event format, which chrome://tracing and
+    # https://ui.perfetto.dev open, and summed up per step in summary().
+    enabled: bool = False
+    trace_allocations: bool = False
+    start: float = 0
+    events: list[dict] = []
+    # name -> [calls, wall seconds, self wall seconds, cpu seconds, net allocated bytes]
+    stats: dict[str, list] = {}
+    lock: threading.Lock = threading.Lock()
+    local: threading.local = threading.local()
+
+    @staticmethod
+    def enable(trace_allocations: bool = False) -> None:
+        Profiler.enabled = True
+        Profiler.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        Profiler.start = time.perf_counter()
+        Profiler.events = []
+        Profiler.stats = {}
+
+
+    @staticmethod
+    def disable() -> None:
+        Profiler.enabled = False
+        if Profiler.trace_allocations:
+            tracemalloc.stop()
+
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, category: str = "contentctl", args: Union[dict, None] = None) -> Iterator[None]:
+        if not Profiler.enabled:
+            yield
+            return
+
+        # The wall time of the spans nested in this one, to compute its self time
+        stack = getattr(Profiler.local, 'stack', None)
+        if stack is None:
+            stack = Profiler.local.stack = []
+        stack.append(0.0)
+        allocated_start = tracemalloc.get_traced_memory()[0] if Profiler.trace_allocations else 0
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            allocated = tracemalloc.get_traced_memory()[0] - allocated_start if Profiler.trace_allocations else 0
+            children = stack.pop()
+            if stack:
+                stack[-1] += wall
+
+            event_args = {'cpu_us': round(cpu * 1e6, 3)}
+            if Profiler.trace_allocations:
+                event_args['allocated_bytes'] = allocated
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((wall_start - Profiler.start) * 1e6, 3),
+                'dur': round(wall * 1e6, 3),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {**event_args, **(args or {})}
+            }
+            with Profiler.lock:
+                Profiler.events.append(event)
+                stats = Profiler.stats.setdefault(name, [0, 0.0, 0.0, 0.0, 0])
+                stats[0] += 1
+                stats[1] += wall
+                stats[2] += wall - children
+                stats[3] += cpu
+                stats[4] += allocated
+
+
+    @staticmethod
+    def wrap(function: Callable, name: str, category: str) -> Callable:
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            if not Profiler.enabled:
+                return function(*args, **kwargs)
+            with Profiler.span(name, category):
+                return function(*args, **kwargs)
+        profiled.__profiled__ = True
+        return profiled
+
+
+    @staticmethod
+    def instrument(cls: type, category: str, methods: Union[list[str], None] = None) -> None:
+        # Wraps the public methods defined by cls, or only the given ones, in spans named
+        # <class>.<method>.  Methods are wrapped once, however often this is called.
+        for method_name, attribute in list(vars(cls).items()):
+            if methods is None and method_name.startswith('_'):
+                continue
+            if methods is not None and method_name not in methods:
+                continue
+            name = f"{cls.__name__}.{method_name}"
+            if isinstance(attribute, staticmethod):
+                function, wrapper = attribute.__func__, staticmethod
+            elif isinstance(attribute, classmethod):
+                function, wrapper = attribute.__func__, classmethod
+            elif inspect.isfunction(attribute):
+                function, wrapper = attribute, lambda f: f
+            else:
+                continue
+            if getattr(function, '__profiled__', False) or getattr(function, '__isabstractmethod__', False):
+                continue
+            setattr(cls, method_name, wrapper(Profiler.wrap(function, name, category)))
+
+
+    @staticmethod
+    def write_trace(path: str) -> None:
+        with Profiler.lock:
+            trace = {
+                'traceEvents': sorted(Profiler.events, key=lambda event: event['ts']),
+                'displayTimeUnit': 'ms',
+                'otherData': {'argv': sys.argv}
+            }
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+
+
+    @staticmethod
+    def summary(limit: int = 40) -> str:
+        with Profiler.lock:
+            rows = sorted(Profiler.stats.items(), key=lambda item: item[1][2], reverse=True)
+        if len(rows) == 0:
+            return "No steps were profiled"
+
+        width = max(len('step'), *(len(name) for name, _ in rows[:limit]))
+        lines = [f"{'step'.ljust(width)} {'calls':>8} {'wall ms':>11} {'self ms':>11} {'cpu ms':>11} {'ms/call':>9} {'net KiB':>11}"]
+        for name, (calls, wall, self_wall, cpu, allocated) in rows[:limit]:
+            allocated = f"{allocated/1024:.1f}" if Profiler.trace_allocations else "-"
+            lines.append(f"{name.ljust(width)} {calls:>8} {wall*1000:>11.1f} {self_wall*1000:>11.1f} {cpu*1000:>11.1f} {wall*1000/calls:>9.3f} {allocated:>11}")
+        if len(rows) > limit:
+            lines.append(f"... and {len(rows) - limit} more step(s), see the trace")
+        return "\n".join(lines)
@@ -0,0 +1,122 @@
+from typing import Iterable, NamedTuple
+
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser, SplCommand, STRING, WORD
+
+
+# The commands that can follow the inputlookup of a subsearch that only reads a lookup
+LOOKUP_SUBSEARCH_COMMANDS = {'fields', 'table', 'rename', 'dedup', 'return', 'format', 'search', 'where'}
+
+
+class SearchLintRule(NamedTuple):
+    id: str
+    # Added to the cost of a search the rule warns about, once however often it matches
+    cost: int
+    description: str
+
+
+class SearchLinter():
+    # Finds the patterns that make a scheduled search expensive on the search heads, in
+    # the search of a detection with its macros expanded (see MacroExpander).  Every rule
+    # that matches adds a warning and its cost to the search, a detection can suppress
+    # rules with tags.search_lint_suppress and validate can suppress them for all
+    # detections.
+    RULES: dict[str, SearchLintRule] = {rule.id: rule for rule in [
+        SearchLintRule('missing_summariesonly', 3, "tstats without summariesonly=true also searches the raw events of the time range that is not summarized"),
+        SearchLintRule('datamodel_without_tstats', 5, "the data model is searched event by event instead of with tstats over its accelerated summaries"),
+        SearchLintRule('leading_wildcard', 2, "a value starting with a wildcard can not use the index and matches every event of the field"),
+        SearchLintRule('transaction', 5, "transaction keeps every open transaction in memory on the search head"),
+        SearchLintRule('unbounded_join', 5, "join with max=0 joins every matching result of its subsearch"),
+        SearchLintRule('subsearch', 3, "a subsearch runs before the search, and is silently truncated at the subsearch limits"),
+        SearchLintRule('map', 5, "map runs a search for every result"),
+    ]}
+
+    @staticmethod
+    def lint(search: str, suppress: Iterable[str] = ()) -> tuple[int, list[dict]]:
+        # Returns the cost of the search and its warnings, {"rule", "cost", "message"}
+        suppress = set(suppress)
+        commands = SplParser.commands(search)
+        warnings = []
+        for rule_id, matches in [
+            ('missing_summariesonly', SearchLinter.missing_summariesonly(commands)),
+            ('datamodel_without_tstats', SearchLinter.datamodel_without_tstats(commands)),
+            ('leading_wildcard', SearchLinter.leading_wildcards(commands)),
+            ('transaction', [command.name for command in commands if command.name == 'transaction']),
+            ('unbounded_join', SearchLinter.unbounded_joins(commands)),
+            ('subsearch', SearchLinter.subsearches(commands)),
+            ('map', [command.name for command in commands if command.name == 'map'])
+        ]:
+            if rule_id in suppress or len(matches) == 0:
+                continue
+            rule = SearchLinter.RULES[rule_id]
+            examples = ', '.join(matches[:3]) + (f" and {len(matches) - 3} more" if len(matches) > 3 else "")
+            warnings.append({
+                'rule': rule.id,
+                'cost': rule.cost,
+                'message': f"{rule.description}: {examples}"
+            })
+        return sum(warning['cost'] for warning in warnings), warnings
+
+
+    @staticmethod
+    def missing_summariesonly(commands: list[SplCommand]) -> list[str]:
+        # tstats over a data model, tstats over an index has no summaries to restrict it to.
+        # summariesonly=false is the default, as security_content_summariesonly sets it.
+        matches = []
+        for command in commands:
+            options = [argument.value.lower() for argument in command.arguments if argument.type == WORD]
+            if command.name != 'tstats' or not any(option.startswith('datamodel=') for option in options):
+                continue
+            summariesonly = [option for option in options if option.startswith('summariesonly=')]
+            if len(summariesonly) == 0:
+                matches.append('tstats')
+            elif summariesonly[-1].split('=', 1)[1] not in ('true', 't', '1'):
+                matches.append('tstats ' + summariesonly[-1])
+        return matches
+
+
+    @staticmethod
+    def datamodel_without_tstats(commands: list[SplCommand]) -> list[str]:
+        matches = []
+        for command in commands:
+            if command.name in ('datamodel', 'pivot'):
+                matches.append(command.name)
+            elif command.name == 'from' and any(argument.type == WORD and argument.value.lower().startswith('datamodel')
+                                                for argument in command.arguments):
+                matches.append('from datamodel')
+        return matches
+
+
+    @staticmethod
+    def leading_wildcards(commands: list[SplCommand]) -> list[str]:
+        # The values of the terms of search and of the where clause of tstats
+        matches = []
+        for command in commands:
+            if command.name not in ('search', 'tstats'):
+                continue
+            for argument in command.arguments:
+                if argument.type == STRING:
+                    value = argument.value.strip('"')
+                elif argument.type == WORD:
+                    value = argument.value.split('=', 1)[-1]
+                else:
+                    continue
+                if value.startswith('*') and value.strip('*') != '':
+                    matches.append(argument.value)
+        return matches
+
+
+    @staticmethod
+    def unbounded_joins(commands: list[SplCommand]) -> list[str]:
+        return ['join max=0' for command in commands if command.name == 'join' and any(
+            argument.type == WORD and argument.value.lower() == 'max=0' for argument in command.arguments)]
+
+
+    @staticmethod
+    def subsearches(commands: list[SplCommand]) -> list[str]:
+        # The first command of every subsearch, except the ones only reading a lookup
+        subsearches = {}
+        for command in commands:
+            if command.subsearch != 0:
+                subsearches.setdefault(command.subsearch, []).append(command.name)
+        return ['[' + names[0] + ']' for names in subsearches.values()
+                if names[0] != 'inputlookup' or not all(name in LOOKUP_SUBSEARCH_COMMANDS for name in names[1:])]
@@ -0,0 +1,301 @@
+import functools
+import re
+from typing import NamedTuple, Union
+
+# Token types of a search
+MACRO = 'macro'
+STRING = 'string'
+PIPE = 'pipe'
+SUBSEARCH_START = 'subsearch_start'
+SUBSEARCH_END = 'subsearch_end'
+WORD = 'word'
+
+# `name` or `name(argument, ...)`
+MACRO_CALL = re.compile(r'\s*[\w.:-]+\s*(\(.*\))?\s*$', re.DOTALL)
+# A double quoted string, which may be unterminated at the end of a search, and the
+# characters of a word up to a backtick.  A backslash escapes the character after it.
+STRING_TOKEN = re.compile(r'"[^"\\]*(?:\\.?[^"\\]*)*"?', re.DOTALL)
+WORD_CHARACTERS = re.compile(r'(?:[^\s"|\[\]\\`]|\\.?)[^\s"|\[\]\\`]*(?:\\.?[^\s"|\[\]\\`]*)*', re.DOTALL)
+WHITESPACE = re.compile(r'\s*')
+# Every token of a search without macro calls, where a backtick is part of a word
+TOKEN = re.compile(r'\s*(?:(?P<string>"[^"\\]*(?:\\.?[^"\\]*)*"?)|(?P<pipe>\|)|(?P<subsearch_start>\[)|(?P<subsearch_end>\])|(?P<word>(?:[^\s"|\[\]\\]|\\.?)[^\s"|\[\]\\]*(?:\\.?[^\s"|\[\]\\]*)*))', re.DOTALL)
+
+# Commands that can start a search or subsearch without a leading pipe.  Anything else
+# at the start of a search is the terms of an implicit search command.
+GENERATING_COMMANDS = {'search', 'inputlookup', 'tstats', 'mstats', 'datamodel', 'from', 'pivot', 'makeresults', 'rest', 'metadata', 'dbinspect', 'eventcount', 'loadjob', 'savedsearch'}
+LOOKUP_COMMANDS = {'lookup', 'inputlookup', 'outputlookup'}
+
+
+class SplToken(NamedTuple):
+    type: str
+    value: str
+    start: int
+    end: int
+
+
+class SplCommand(NamedTuple):
+    # A command and its arguments, depth is 0 in the search and 1 or more in subsearches.
+    # subsearch numbers the subsearches in the order they start, 0 is the search itself.
+    name: str
+    arguments: list[SplToken]
+    depth: int
+    subsearch: int = 0
+
+
+class SplParser():
+    # A tokenizer for SPL, precise enough to tell the macros, commands, lookups and data
+    # models of a search apart from the same words in strings and field values.  Strings
+    # are double quoted, and a backslash escapes the character after it in strings and
+    # words alike.
+
+    @staticmethod
+    def macro_calls(text: str) -> list[SplToken]:
+        # Splunk expands macros before it parses a search, so a macro is expanded in a
+        # string too.  A backtick that does not start a macro call is left as it is.
+        calls = []
+        position = text.find('`')
+        while position != -1:
+            end = text.find('`', position + 1)
+            if end == -1:
+                break
+            if MACRO_CALL.match(text[position+1:end]):
+                calls.append(SplToken(MACRO, text[position:end+1], position, end + 1))
+                position = text.find('`', end + 1)
+            else:
+                position = end
+        return calls
+
+
+    @staticmethod
+    def tokenize(search: str) -> list[SplToken]:
+        macros = {call.start: call for call in SplParser.macro_calls(search)}
+        if len(macros) == 0:
+            # Most searches, once their macros are expanded
+            return [SplToken(match.lastgroup, match.group(match.lastgroup), match.start(match.lastgroup), match.end())
+                    for match in TOKEN.finditer(search) if match.lastgroup is not None]
+        tokens = []
+        position = 0
+        length = len(search)
+        while True:
+            position = WHITESPACE.match(search, position).end()
+            if position >= length:
+                break
+            char = search[position]
+            start = position
+            if position in macros:
+                tokens.append(macros[position])
+                position = macros[position].end
+            elif char == '"':
+                position = STRING_TOKEN.match(search, position).end()
+                tokens.append(SplToken(STRING, search[start:position], start, position))
+            elif char in '|[]':
+                position += 1
+                token_type = {'|': PIPE, '[': SUBSEARCH_START, ']': SUBSEARCH_END}[char]
+                tokens.append(SplToken(token_type, char, start, position))
+            else:
+                # \" is part of a word, and so is a backtick that does not start a macro
+                while True:
+                    match = WORD_CHARACTERS.match(search, position)
+                    if match:
+                        position = match.end()
+                    if position < length and search[position] == '`' and position not in macros:
+                        position += 1
+                    else:
+                        break
+                tokens.append(SplToken(WORD, search[start:position], start, position))
+        return tokens
+
+
+    @staticmethod
+    def split_macro(token: str) -> tuple[str, list[str]]:
+        # `name(a, "b, c")` -> ("name", ["a", '"b, c"'])
+        call = token.strip('`').strip()
+        start = call.find('(')
+        if start == -1 or not call.endswith(')'):
+            return call, []
+        name = call[:start].strip()
+        arguments = []
+        argument = ''
+        depth = 0
+        quoted = False
+        escaped = False
+        for char in call[start+1:-1]:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                quoted = not quoted
+            elif not quoted and char == '(':
+                depth += 1
+            elif not quoted and char == ')':
+                depth -= 1
+            elif not quoted and depth == 0 and char == ',':
+                arguments.append(argument.strip())
+                argument = ''
+                continue
+            argument += char
+        if argument.strip() or arguments:
+            arguments.append(argument.strip())
+        return name, arguments
+
+
+    @staticmethod
+    def macros(search: str) -> list[str]:
+        # The names of the macros the search calls directly, in order and once each
+        names = {}
+        for call in SplParser.macro_calls(search):
+            names.setdefault(SplParser.split_macro(call.value)[0], None)
+        return list(names)
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def commands(search: str) -> list[SplCommand]:
+        # Cached, as the lookups, data models and cost of a search are all found in its
+        # commands.  The commands returned are shared and must not be changed.
+        commands = []
+        # The command and subsearch every enclosing search continues with
+        enclosing = []
+        current = None
+        subsearch = 0
+        subsearches = 0
+        start_of_search = True
+        after_pipe = False
+        for token in SplParser.tokenize(search):
+            if token.type == PIPE:
+                current = None
+                after_pipe = True
+                continue
+            if token.type == SUBSEARCH_START:
+                enclosing.append((current, subsearch))
+                subsearches += 1
+                subsearch = subsearches
+                current = None
+                start_of_search = True
+                after_pipe = False
+                continue
+            if token.type == SUBSEARCH_END:
+                current, subsearch = enclosing.pop() if enclosing else (None, 0)
+                continue
+            if current is None:
+                name = token.value.lower() if token.type == WORD else None
+                if after_pipe or (start_of_search and name in GENERATING_COMMANDS):
+                    current = SplCommand(name or token.value, [], len(enclosing), subsearch)
+                    commands.append(current)
+                    start_of_search = after_pipe = False
+                    continue
+                current = SplCommand('search', [], len(enclosing), subsearch)
+                commands.append(current)
+                start_of_search = after_pipe = False
+            current.arguments.append(token)
+        return commands
+
+
+    @staticmethod
+    def lookups(search: str) -> list[str]:
+        # The lookup table of every lookup, inputlookup and outputlookup, the first
+        # argument that is not an option
+        names = {}
+        for command in SplParser.commands(search):
+            if command.name not in LOOKUP_COMMANDS:
+                continue
+            for argument in command.arguments:
+                if argument.type == WORD and '=' not in argument.value:
+                    names.setdefault(argument.value, None)
+                    break
+                if argument.type == STRING:
+                    names.setdefault(argument.value.strip('"'), None)
+                    break
+        return list(names)
+
+
+    @staticmethod
+    def datamodels(search: str) -> list[str]:
+        # The data models named by datamodel=<model>[.<dataset>] or datamodel:<model>, for
+        # tstats and from, by from datamodel <model>, and by the first argument of the
+        # datamodel and pivot commands
+        names = {}
+        for command in SplParser.commands(search):
+            arguments = command.arguments
+            for position, argument in enumerate(arguments):
+                value = None
+                if argument.type != WORD:
+                    continue
+                key = argument.value.lower()
+                if key.startswith('datamodel=') or key.startswith('datamodel:'):
+                    value = argument.value[len('datamodel='):]
+                    if value == '' and position + 1 < len(arguments) and arguments[position+1].type == STRING:
+                        value = arguments[position+1].value.strip('"')
+                elif command.name == 'from' and key == 'datamodel' and position + 1 < len(arguments):
+                    value = arguments[position+1].value.strip('"')
+                elif command.name in ('datamodel', 'pivot') and position == 0:
+                    value = argument.value
+                if value:
+                    names.setdefault(value.split('.')[0], None)
+        return list(names)
+
+
+class MacroExpander():
+    # Expands the macros of searches with the definitions of the macros/ content,
+    # recursively, substituting $argument$ with the arguments of the call.  A macro that
+    # is not defined, that is called with the wrong number of arguments or that calls
+    # itself is left as it is, as Splunk would report it when the search runs.  Every
+    # search and every macro call is expanded once, which matters when many detections
+    # share the same macros.
+    macros: object
+    expanded: dict[tuple, str]
+    definitions: dict[tuple, Union[str, None]]
+
+    def __init__(self, macros):
+        # macros is a ContentIndex of the macros
+        self.macros = macros
+        self.expanded = {}
+        self.definitions = {}
+
+
+    def expand(self, search: str, extra_macros: list = None) -> str:
+        # extra_macros are defined for this search only, as the generated _filter macro of a
+        # detection is
+        extra_macros = {macro.name: macro for macro in extra_macros or []}
+        key = (search, tuple(sorted(extra_macros)))
+        if key not in self.expanded:
+            self.expanded[key] = self.expand_text(search, extra_macros, ())
+        return self.expanded[key]
+
+
+    def expand_text(self, text: str, extra_macros: dict, calling: tuple) -> str:
+        parts = []
+        position = 0
+        for token in SplParser.macro_calls(text):
+            name, arguments = SplParser.split_macro(token.value)
+            definition = self.expand_macro(name, tuple(arguments), extra_macros, calling)
+            if definition is None:
+                continue
+            parts.append(text[position:token.start])
+            parts.append(definition)
+            position = token.end
+        parts.append(text[position:])
+        return ''.join(parts)
+
+
+    def expand_macro(self, name: str, arguments: tuple, extra_macros: dict, calling: tuple) -> Union[str, None]:
+        if name in calling:
+            return None
+        key = (name, arguments)
+        if key in self.definitions and name not in extra_macros:
+            return self.definitions[key]
+
+        found = self.macros.get_by_name(name)
+        macro = found[0] if found else extra_macros.get(name)
+        if macro is None or len(macro.arguments or []) != len(arguments):
+            definition = None
+        else:
+            definition = macro.definition
+            for argument, value in zip(macro.arguments or [], arguments):
+                definition = definition.replace('$' + argument + '$', value)
+            definition = self.expand_text(definition, extra_macros, calling + (name,))
+
+        if name not in extra_macros and not calling:
+            self.definitions[key] = definition
+        return definition
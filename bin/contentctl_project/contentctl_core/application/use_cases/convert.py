@@ -7,6 +7,7 @@ from dataclasses import dataclass
 
 from bin.contentctl_project.contentctl_infrastructure.builder.sigma_converter import SigmaConverter, SigmaConverterInputDto, SigmaConverterOutputDto
 from bin.contentctl_project.contentctl_infrastructure.adapter.yml_output import YmlOutput
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter
 
 
 @dataclass(frozen=True)
@@ -24,3 +25,17 @@ class Convert:
 
         yml_output = YmlOutput()
         yml_output.writeDetections(sigma_converter_output_dto.detections, input_dto.output_path)
+
+        # Every file that failed, so a run over a whole folder can be triaged afterwards.
+        # When nothing converted, no detection has created the output folder yet.
+        os.makedirs(input_dto.output_path, exist_ok=True)
+        JsonWriter.writeJsonObject(os.path.join(input_dto.output_path, 'conversion_report.json'), {
+            'data_model': input_dto.sigma_converter_input_dto.data_model.name.lower(),
+            'log_source': input_dto.sigma_converter_input_dto.log_source,
+            'converted': len(sigma_converter_output_dto.detections),
+            'failed': len(sigma_converter_output_dto.errors),
+            'errors': sigma_converter_output_dto.errors
+        })
+
+        if sigma_converter_output_dto.errors:
+            sys.exit(1)
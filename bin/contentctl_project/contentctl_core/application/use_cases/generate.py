@@ -35,6 +35,7 @@ class Generate:
             input_dto.adapter.writeObjects(factory_output_dto.investigations, input_dto.output_path, SecurityContentType.investigations)
             input_dto.adapter.writeObjects(factory_output_dto.lookups, input_dto.output_path, SecurityContentType.lookups)
             input_dto.adapter.writeObjects(factory_output_dto.macros, input_dto.output_path, SecurityContentType.macros)
+            input_dto.adapter.finalize(input_dto.output_path)
         
         elif input_dto.product == SecurityContentProduct.SSA:
             shutil.rmtree(input_dto.output_path + '/srs/', ignore_errors=True)
@@ -58,4 +59,18 @@ class Generate:
             input_dto.adapter.writeObjects(factory_output_dto.macros, input_dto.output_path, SecurityContentType.macros)
             input_dto.adapter.writeObjects(factory_output_dto.deployments, input_dto.output_path, SecurityContentType.deployments)
 
+        elif input_dto.product == SecurityContentProduct.BUNDLE:
+            factory_output_dto = FactoryOutputDto([],[],[],[],[],[],[],[])
+            factory = Factory(factory_output_dto)
+            factory.execute(input_dto.factory_input_dto)
+            input_dto.adapter.writeObjects(factory_output_dto.detections, input_dto.output_path, SecurityContentType.detections)
+            input_dto.adapter.writeObjects(factory_output_dto.stories, input_dto.output_path, SecurityContentType.stories)
+            input_dto.adapter.writeObjects(factory_output_dto.baselines, input_dto.output_path, SecurityContentType.baselines)
+            input_dto.adapter.writeObjects(factory_output_dto.investigations, input_dto.output_path, SecurityContentType.investigations)
+            input_dto.adapter.writeObjects(factory_output_dto.lookups, input_dto.output_path, SecurityContentType.lookups)
+            input_dto.adapter.writeObjects(factory_output_dto.macros, input_dto.output_path, SecurityContentType.macros)
+            input_dto.adapter.writeObjects(factory_output_dto.deployments, input_dto.output_path, SecurityContentType.deployments)
+            input_dto.adapter.writeObjects(factory_output_dto.playbooks, input_dto.output_path, SecurityContentType.playbooks)
+            input_dto.adapter.finalize(input_dto.output_path)
+
         print('Generate of security content successful.')
\ No newline at end of file
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Union
+
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto, Factory, FactoryOutputDto
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_graph import ContentGraph, Node
+
+
+@dataclass(frozen=True)
+class QueryInputDto:
+    # The graph is built from factory_input_dto when it is not given, e.g. when it was
+    # loaded from a content bundle
+    factory_input_dto: Union[FactoryInputDto, None]
+    graph: Union[ContentGraph, None]
+    type: SecurityContentType
+    name: str
+    dependencies: bool = False
+    result_type: Union[SecurityContentType, None] = None
+    transitive: bool = False
+
+
+class Query:
+
+    def execute(self, input_dto: QueryInputDto) -> list[Node]:
+        graph = input_dto.graph
+        if graph is None:
+            factory_output_dto = FactoryOutputDto([],[],[],[],[],[],[],[])
+            factory = Factory(factory_output_dto)
+            factory.execute(input_dto.factory_input_dto)
+            graph = factory_output_dto.graph
+
+        if (input_dto.type, input_dto.name) not in graph.dependencies:
+            raise(Exception(f"No {input_dto.type.name} named '{input_dto.name}' is part of the security content or referenced by it"))
+
+        if input_dto.dependencies:
+            nodes = graph.get_dependencies(input_dto.type, input_dto.name, input_dto.result_type, input_dto.transitive)
+            print(f"{input_dto.type.name} '{input_dto.name}' depends on [{len(nodes)}] object(s):")
+        else:
+            nodes = graph.get_dependents(input_dto.type, input_dto.name, input_dto.result_type, input_dto.transitive)
+            print(f"[{len(nodes)}] object(s) depend on {input_dto.type.name} '{input_dto.name}':")
+        for type, name in nodes:
+            print(f"{type.name}: {name}")
+        return nodes
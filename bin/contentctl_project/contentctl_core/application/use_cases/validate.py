@@ -1,5 +1,5 @@
-
-
+import os
+import sys
 from dataclasses import dataclass
 
 from pydantic import ValidationError
@@ -8,6 +8,8 @@ from typing import Union
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentProduct
 from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto, Factory, FactoryOutputDto
 from bin.contentctl_project.contentctl_core.application.factory.ba_factory import BAFactoryInputDto, BAFactory, BAFactoryOutputDto
+from bin.contentctl_project.contentctl_core.application.factory.utils.search_linter import SearchLinter
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter
 
 
 @dataclass(frozen=True)
@@ -15,6 +17,10 @@ class ValidateInputDto:
     factory_input_dto: Union[FactoryInputDto,None]
     ba_factory_input_dto: Union[BAFactoryInputDto,None]
     product: SecurityContentProduct
+    # Writes the search cost and warnings of every detection to this file
+    search_cost_report: Union[str, None] = None
+    # Fails the validation when a detection costs more
+    max_search_cost: Union[int, None] = None
 
 
 class Validate:
@@ -24,6 +30,7 @@ class Validate:
             factory_output_dto = FactoryOutputDto([],[],[],[],[],[],[],[])
             factory = Factory(factory_output_dto)
             factory.execute(input_dto.factory_input_dto)
+            self.checkSearchCosts(input_dto, factory_output_dto.detections)
 
         elif input_dto.product == SecurityContentProduct.SSA:
             factory_output_dto = BAFactoryOutputDto([])
@@ -34,4 +41,36 @@ class Validate:
         # validate detections
         
         print('Validation of security content successful.')
+
+
+    def checkSearchCosts(self, input_dto: ValidateInputDto, detections: list) -> None:
+        expensive_detections = sorted((detection for detection in detections if detection.search_cost),
+                                      key=lambda detection: detection.search_cost, reverse=True)
+        print(f"[{len(expensive_detections)}] of [{len(detections)}] detection(s) have search cost warnings")
+        for detection in expensive_detections[:10]:
+            print(f"  [{detection.search_cost}] {detection.name}: {', '.join(warning['rule'] for warning in detection.search_warnings)}")
+
+        if input_dto.search_cost_report:
+            JsonWriter.writeJsonObject(input_dto.search_cost_report, {
+                'rules': [rule._asdict() for rule in SearchLinter.RULES.values()],
+                'suppressed': list(input_dto.factory_input_dto.search_lint_suppress),
+                'detections': [{
+                    'name': detection.name,
+                    'id': detection.id,
+                    'file_path': os.path.relpath(detection.file_path, input_dto.factory_input_dto.input_path) if detection.file_path else None,
+                    'search_cost': detection.search_cost,
+                    'search_warnings': detection.search_warnings
+                } for detection in detections]
+            })
+            print(f"Search cost report written to [{input_dto.search_cost_report}]")
+
+        if input_dto.max_search_cost is not None:
+            too_expensive = [detection for detection in expensive_detections if detection.search_cost > input_dto.max_search_cost]
+            if len(too_expensive) > 0:
+                print(f"\n[{len(too_expensive)}] detection(s) cost more than the maximum search cost of [{input_dto.max_search_cost}]:")
+                for detection in too_expensive:
+                    print(f"\nDetection [{detection.name}] in [{detection.file_path}] costs [{detection.search_cost}]:")
+                    for warning in detection.search_warnings:
+                        print(f"  {warning['rule']} ({warning['cost']}): {warning['message']}")
+                sys.exit(1)
         
\ No newline at end of file
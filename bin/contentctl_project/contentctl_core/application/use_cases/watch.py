@@ -0,0 +1,109 @@
+import os
+import pathlib
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Union
+
+from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto, Factory, FactoryOutputDto
+
+
+@dataclass(frozen=True)
+class WatchInputDto:
+    factory_input_dto: FactoryInputDto
+    # Yields the lists of files that changed, see ContentWatcher
+    watcher: object
+    # Started with this Watch once the content is loaded, see WatchStatusServer
+    server: Union[object, None] = None
+
+
+class Watch:
+    # Loads the content once and keeps it, and the errors of every file, in memory.
+    # Afterwards only the files that change, and the content that embeds them, are
+    # validated again (see Factory.reloadContent).
+    factory: Union[Factory, None]
+    errors: dict[str, list[str]]
+    revision: int
+    lock: threading.Lock
+
+    def __init__(self):
+        self.factory = None
+        self.errors = {}
+        self.revision = 0
+        self.lock = threading.Lock()
+
+
+    def execute(self, input_dto: WatchInputDto) -> None:
+        self.factory = Factory(FactoryOutputDto([],[],[],[],[],[],[],[]))
+        try:
+            self.factory.execute(input_dto.factory_input_dto)
+        except Exception as e:
+            if len(self.factory.validation_errors) == 0:
+                raise e
+        for file, error in self.factory.validation_errors:
+            # Duplicate ids are reported against every file using the id below
+            if str(file) != "MULTIPLE":
+                self.errors.setdefault(os.path.abspath(file), []).append(str(error))
+        for file, errors in self.factory.getDuplicateIdErrors(list(self.factory.files)).items():
+            self.errors.setdefault(file, []).extend(str(error) for error in errors)
+
+        if input_dto.server is not None:
+            input_dto.server.start(self)
+        print(f"Watching {input_dto.factory_input_dto.input_path} for changes, [{len(self.errors)}] file(s) with errors.  Press Ctrl+C to stop.")
+        try:
+            for files in input_dto.watcher.watch():
+                self.revalidate(files)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if input_dto.server is not None:
+                input_dto.server.stop()
+
+
+    def getPath(self, file: str) -> str:
+        return os.path.abspath(os.path.join(self.factory.input_dto.input_path, file))
+
+
+    def revalidate(self, files: list[str]) -> dict:
+        start = time.perf_counter()
+        changed = [self.getPath(file) for file in files]
+        with self.lock:
+            results = self.factory.reloadContent(changed)
+            for file, errors in results.items():
+                if len(errors) == 0:
+                    self.errors.pop(file, None)
+                else:
+                    self.errors[file] = [str(error) for error in errors]
+            self.revision += 1
+            revision = self.revision
+            files_with_errors = len(self.errors)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for file, errors in results.items():
+            relative_path = pathlib.Path(os.path.relpath(file, self.factory.input_dto.input_path))
+            if len(errors) == 0 and file in changed:
+                print(f"OK [{relative_path}]")
+            for error in errors:
+                print(f'\nValidation Error for file [{relative_path}]:\n{str(error)}')
+        print(f"Validated [{len(results)}] file(s) in {elapsed:.0f}ms, [{files_with_errors}] file(s) with errors")
+
+        return {
+            'revision': revision,
+            'elapsed_ms': elapsed,
+            'files': {file: [str(error) for error in errors] for file, errors in results.items()}
+        }
+
+
+    def getErrors(self, file: str) -> list[str]:
+        with self.lock:
+            return list(self.errors.get(self.getPath(file), []))
+
+
+    def getStatus(self) -> dict:
+        with self.lock:
+            return {
+                'revision': self.revision,
+                'files_with_errors': len(self.errors),
+                'errors': {file: list(errors) for file, errors in self.errors.items()}
+            }
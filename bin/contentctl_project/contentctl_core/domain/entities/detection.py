@@ -74,6 +74,9 @@ class Detection(BaseModel, SecurityContentObject):
     nes_fields: str = None
     providing_technologies: list = None
     runtime: str = None
+    # set by SearchLinter, see Factory.lintDetection
+    search_cost: int = None
+    search_warnings: list = None
 
     # @validator('name')v
     # def name_max_length(cls, v, values):
@@ -29,6 +29,8 @@ class DetectionTags(BaseModel):
     atomic_guid: list = None
     drilldown_search: str = None
     manual_test: str = None
+    # Ids of the SearchLinter rules that do not apply to this search
+    search_lint_suppress: list = None
 
 
     # enrichment
@@ -39,6 +39,7 @@ class SecurityContentType(enum.Enum):
     investigations = 8
     unit_tests = 9
     attack_data = 10
+    data_sources = 11
 
 
 class SecurityContentProduct(enum.Enum):
@@ -46,6 +47,7 @@ class SecurityContentProduct(enum.Enum):
     SSA = 2
     API = 3
     CUSTOM = 4
+    BUNDLE = 5
 
 
 class SigmaConverterTarget(enum.Enum):
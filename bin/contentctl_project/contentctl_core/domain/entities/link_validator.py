@@ -1,22 +1,25 @@
-import re
-from tracemalloc import start
-from unittest.mock import DEFAULT
-from pydantic import BaseModel, validator, root_validator,Field
-from typing import Union, Callable
+import asyncio
+import sqlite3
+import sys
+import urllib.parse
+from pydantic import BaseModel
+from typing import Union
 import requests
+import requests.adapters
 import urllib3, urllib3.exceptions
 import time
 import abc
+from concurrent.futures import ThreadPoolExecutor
 
 import os
-import shelve
 
 DEFAULT_USER_AGENT_STRING = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.4951.41 Safari/537.36"
 ALLOWED_HTTP_CODES = [200]
+HTTP_NOT_MODIFIED = 304
+
 class LinkStats(BaseModel):
     #Static Values
-    method: Callable = requests.get
-    allowed_http_codes: list[int] = ALLOWED_HTTP_CODES 
+    allowed_http_codes: list[int] = ALLOWED_HTTP_CODES
     access_count: int = 1 #when constructor is called, it has been accessed once!
     timeout_seconds: int = 15
     allow_redirects: bool = True
@@ -24,76 +27,86 @@ class LinkStats(BaseModel):
     verify_ssl: bool = False
     if verify_ssl is False:
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    
-    #Values generated at runtime.
-    #We need to assign these some default values to get the 
-    #validation working since ComputedField has not yet been 
-    #introduced to Pydantic
+
+    #Values filled in when the reference is resolved by LinkValidator.resolve_references
     reference: str
     referencing_files: set[str]
     redirect: Union[str,None] = None
     status_code: int = 0
     valid: bool = False
-    resolution_time: float = 0 
-    
-    
+    resolved: bool = False
+    resolution_time: float = 0
+    etag: Union[str,None] = None
+    last_modified: Union[str,None] = None
+    checked_at: float = 0
+
+
     def is_link_valid(self, referencing_file:str)->bool:
         self.access_count += 1
         self.referencing_files.add(referencing_file)
         return self.valid
-    
-    @root_validator
-    def check_reference(cls, values):
+
+
+    def check_reference(self, session: requests.Session) -> None:
+        # HEAD first since most servers answer it without a body.  Servers that do not
+        # implement HEAD (or answer it differently than GET) get a second chance with GET.
+        # If a previous response carried an ETag or Last-Modified header, the request is
+        # conditional and a 304 means the cached result still holds.
         start_time = time.time()
-        #Get out all the fields names to make them easier to reference
-        method = values['method']
-        reference = values['reference']
-        timeout_seconds = values['timeout_seconds']
-        headers = values['headers']
-        allow_redirects = values['allow_redirects']
-        verify_ssl = values['verify_ssl']
-        allowed_http_codes = values['allowed_http_codes']
-        if not (reference.startswith("http://") or reference.startswith("https://")):
-            raise(ValueError(f"Reference {reference} does not begin with http(s). Only http(s) references are supported"))
-        
-        try:
-            get = method(reference, timeout=timeout_seconds, 
-                            headers = headers, 
-                            allow_redirects=allow_redirects, verify=verify_ssl)
-            resolution_time = time.time() - start_time
-            values['status_code'] = get.status_code
-            values['resolution_time'] = resolution_time
-            if reference != get.url:
-                values['redirect'] = get.url
-            else:
-                values['redirect'] = None #None is also already the default
+        headers = dict(self.headers)
+        if self.valid and self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.valid and self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
 
-            #Returns the updated values and sets them for the object
-            if get.status_code in allowed_http_codes:
-                values['valid'] = True
+        try:
+            response = session.head(self.reference, timeout=self.timeout_seconds, headers=headers,
+                                    allow_redirects=self.allow_redirects, verify=self.verify_ssl)
+            if response.status_code not in self.allowed_http_codes and response.status_code != HTTP_NOT_MODIFIED:
+                response = session.get(self.reference, timeout=self.timeout_seconds, headers=headers,
+                                       allow_redirects=self.allow_redirects, verify=self.verify_ssl, stream=True)
+                response.close()
+        except Exception as e:
+            #print(f"Reference {self.reference} was not reachable after {time.time() - start_time:.2f} seconds")
+            self.status_code = 0
+            self.valid = False
+            self.redirect = None
+        else:
+            if response.status_code == HTTP_NOT_MODIFIED and self.valid:
+                # Unchanged since it was last resolved: keep status code, redirect and validators
+                pass
             else:
-                #print(f"Unacceptable HTTP Status Code {get.status_code} received for {reference}")
-                values['valid'] = False
-            return values    
+                self.status_code = response.status_code
+                self.valid = response.status_code in self.allowed_http_codes
+                self.redirect = response.url if self.reference != response.url else None
+                self.etag = response.headers.get("ETag")
+                self.last_modified = response.headers.get("Last-Modified")
 
-        except Exception as e:
-            resolution_time = time.time() - start_time
-            #print(f"Reference {reference} was not reachable after {resolution_time:.2f} seconds")
-            values['status_code'] = 0
-            values['valid'] = False
-            values['redirect'] = None
-            values['resolution_time'] = resolution_time
-            return values
+        self.resolution_time = time.time() - start_time
+        self.checked_at = time.time()
+        self.resolved = True
 
 
 class LinkValidator(abc.ABC):
-    cache: Union[dict[str,LinkStats], shelve.Shelf] = {}
+    # References are resolved in two phases.  While content is loaded, validate_reference
+    # only records each reference and the files that use it.  Once everything has been
+    # loaded, resolve_references checks every recorded reference concurrently: at most
+    # max_concurrency requests in flight, at most max_per_host to the same host, and at
+    # least min_host_interval_seconds between the start of two requests to one host.
+    # Connections are reused through one requests.Session per host.
+    cache: dict[str,LinkStats] = {}
     uncached_checks: int = 0
     total_checks: int = 0
-    #cache: dict[str,LinkStats] = {}
 
     use_file_cache: bool = False
-    reference_cache_file: str ="lookups/REFERENCE_CACHE.db"
+    reference_cache_file: str ="lookups/REFERENCE_CACHE.sqlite"
+    # Valid references cached within this many seconds are not requested again.  Older
+    # entries are revalidated with a conditional request.
+    cache_ttl_seconds: int = 7 * 24 * 60 * 60
+
+    max_concurrency: int = 32
+    max_per_host: int = 4
+    min_host_interval_seconds: float = 0.1
 
     @staticmethod
     def initialize_cache(use_file_cache: bool = False):
@@ -102,55 +115,143 @@ class LinkValidator(abc.ABC):
             return
         if not os.path.exists(LinkValidator.reference_cache_file):
             print(f"Cache at {LinkValidator.reference_cache_file} not found - Creating it.")
-        
+
         try:
-            LinkValidator.cache = shelve.open(LinkValidator.reference_cache_file, flag='c', writeback=True)
-        except:
-            print(f"Failed to create the cache file {LinkValidator.reference_cache_file}.  Reference info will not be cached.")
-            LinkValidator.cache = {}
-
-        #Remove all of the failures to force those resources to be resolved again
-        failed_refs = []
-        for ref in LinkValidator.cache.keys():
-            if LinkValidator.cache[ref].status_code not in ALLOWED_HTTP_CODES:
-                failed_refs.append(ref)
-                #can't remove it here because this will throw an error:
-                #cannot change size of dictionary while iterating over it
-            else:
-                #Set the reference count to 0 and referencing files to empty set
-                LinkValidator.cache[ref].access_count = 0
-                LinkValidator.cache[ref].referencing_files = set()
-        
-        for ref in failed_refs:
-            del(LinkValidator.cache[ref])
+            connection = LinkValidator.get_connection()
+            # Only valid references are ever cached, so failures are always resolved again
+            rows = connection.execute("SELECT reference, status_code, redirect, etag, last_modified, checked_at, resolution_time FROM reference_cache").fetchall()
+            connection.close()
+        except Exception as e:
+            print(f"Failed to open the cache file {LinkValidator.reference_cache_file}.  Reference info will not be cached: {str(e)}")
+            LinkValidator.use_file_cache = False
+            return
+
+        for reference, status_code, redirect, etag, last_modified, checked_at, resolution_time in rows:
+            #The reference count starts at 0 and the referencing files are empty until content is loaded
+            LinkValidator.cache[reference] = LinkStats(reference=reference, referencing_files=set(), access_count=0,
+                status_code=status_code, valid=True, redirect=redirect, etag=etag, last_modified=last_modified,
+                checked_at=checked_at, resolution_time=resolution_time)
+
+
+    @staticmethod
+    def get_connection() -> sqlite3.Connection:
+        connection = sqlite3.connect(LinkValidator.reference_cache_file, timeout=60)
+        connection.execute("CREATE TABLE IF NOT EXISTS reference_cache (reference TEXT PRIMARY KEY, status_code INTEGER, redirect TEXT, "
+                           "etag TEXT, last_modified TEXT, checked_at REAL, resolution_time REAL)")
+        return connection
 
 
-        
-             
     @staticmethod
     def close_cache():
-        if LinkValidator.use_file_cache:
-            LinkValidator.cache.close()
+        if not LinkValidator.use_file_cache:
+            return
+        try:
+            connection = LinkValidator.get_connection()
+            with connection:
+                for stats in LinkValidator.cache.values():
+                    if stats.valid:
+                        connection.execute("INSERT OR REPLACE INTO reference_cache (reference, status_code, redirect, etag, last_modified, checked_at, resolution_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (stats.reference, stats.status_code, stats.redirect, stats.etag, stats.last_modified, stats.checked_at, stats.resolution_time))
+                    else:
+                        connection.execute("DELETE FROM reference_cache WHERE reference = ?", (stats.reference,))
+            connection.close()
+        except Exception as e:
+            print(f"Failed to write the cache file {LinkValidator.reference_cache_file}: {str(e)}")
+
 
     @staticmethod
     def validate_reference(reference: str, referencing_file:str, raise_exception_if_failure: bool = False) -> bool:
+        # Phase one: record the reference.  It is checked by resolve_references, so until
+        # then every reference that has not been resolved before is reported as valid.
         LinkValidator.total_checks += 1
+        if not (reference.startswith("http://") or reference.startswith("https://")):
+            raise(ValueError(f"Reference {reference} does not begin with http(s). Only http(s) references are supported"))
         if reference not in LinkValidator.cache:
             LinkValidator.uncached_checks += 1
             LinkValidator.cache[reference] = LinkStats(reference=reference, referencing_files = set([referencing_file]))
-        result = LinkValidator.cache[reference].is_link_valid(referencing_file)
-
-        #print(f"Total Checks: {LinkValidator.total_checks}, Percent Cached: {100*(1 - LinkValidator.uncached_checks / LinkValidator.total_checks):.2f}")
+            return True
+        stats = LinkValidator.cache[reference]
+        result = stats.is_link_valid(referencing_file)
 
-        if result is True:
+        if result is True or not stats.resolved:
             return True
         elif raise_exception_if_failure is True:
             raise(Exception(f"Reference Link Failed: {reference}"))
         else:
             return False
+
+
+    @staticmethod
+    def get_pending_references() -> list[LinkStats]:
+        now = time.time()
+        pending = []
+        for stats in LinkValidator.cache.values():
+            if stats.resolved or stats.access_count == 0:
+                continue
+            if stats.valid and now - stats.checked_at < LinkValidator.cache_ttl_seconds:
+                # Cached and still fresh
+                stats.resolved = True
+                continue
+            pending.append(stats)
+        return pending
+
+
+    @staticmethod
+    def resolve_references() -> None:
+        # Phase two
+        pending = LinkValidator.get_pending_references()
+        if len(pending) == 0:
+            return
+        start_time = time.time()
+        # The default executor of the event loop has fewer threads than max_concurrency on
+        # most machines, so the checks get a pool of their own
+        with ThreadPoolExecutor(max_workers=LinkValidator.max_concurrency) as executor:
+            asyncio.run(LinkValidator.resolve_all(pending, executor))
+        print(f"\r{'Reference Progress'.rjust(23)}: [{100:3.0f}%]...Done! Resolved [{len(pending)}] reference(s) in [{time.time() - start_time:.1f}] seconds")
+
+
+    @staticmethod
+    async def resolve_all(pending: list[LinkStats], executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        concurrency = asyncio.Semaphore(LinkValidator.max_concurrency)
+        hosts: dict[str, dict] = {}
+        completed = 0
+
+        def get_host(reference: str) -> dict:
+            host = urllib.parse.urlsplit(reference).netloc.lower()
+            if host not in hosts:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=LinkValidator.max_per_host)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                hosts[host] = {"session": session, "semaphore": asyncio.Semaphore(LinkValidator.max_per_host),
+                               "lock": asyncio.Lock(), "next_request": 0.0}
+            return hosts[host]
+
+        async def resolve(stats: LinkStats) -> None:
+            nonlocal completed
+            host = get_host(stats.reference)
+            async with concurrency, host["semaphore"]:
+                async with host["lock"]:
+                    delay = host["next_request"] - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    host["next_request"] = time.monotonic() + LinkValidator.min_host_interval_seconds
+                await loop.run_in_executor(executor, stats.check_reference, host["session"])
+            completed += 1
+            if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
+                print(f"\r{'Reference Progress'.rjust(23)}: [{(completed/len(pending))*100:3.0f}%]...", end="", flush=True)
+
+        try:
+            await asyncio.gather(*[resolve(stats) for stats in pending])
+        finally:
+            for host in hosts.values():
+                host["session"].close()
+
+
     @staticmethod
     def print_link_validation_errors():
-        failures = [LinkValidator.cache[k] for k in LinkValidator.cache if LinkValidator.cache[k].valid is False]
+        failures = [LinkValidator.cache[k] for k in LinkValidator.cache if LinkValidator.cache[k].resolved and LinkValidator.cache[k].valid is False]
         failures.sort(key=lambda d: d.status_code)
         for failure in failures:
             print(f"Link {failure.reference} invalid with HTTP Status Code [{failure.status_code}] and referenced by the following files:")
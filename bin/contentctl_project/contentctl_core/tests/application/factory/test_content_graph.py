@@ -0,0 +1,65 @@
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_graph import ContentGraph
+from bin.contentctl_project.contentctl_core.domain.entities.baseline import Baseline
+from bin.contentctl_project.contentctl_core.domain.entities.baseline_tags import BaselineTags
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
+from bin.contentctl_project.contentctl_core.domain.entities.detection_tags import DetectionTags
+from bin.contentctl_project.contentctl_core.domain.entities.lookup import Lookup
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+
+
+def build_graph() -> ContentGraph:
+    cloudtrail = Macro.construct(name="cloudtrail", definition="sourcetype=aws:cloudtrail")
+    regions = Lookup.construct(name="previously_seen_aws_regions")
+    wrapper = Macro.construct(name="cloudtrail_regions", definition="`cloudtrail` | lookup previously_seen_aws_regions awsRegion")
+    detections = [
+        Detection.construct(name="First", data_source=["AWS CloudTrail"], macros=[wrapper], lookups=[],
+                            tags=DetectionTags.construct(analytic_story=["AWS Story"])),
+        Detection.construct(name="Second", data_source=[], macros=[cloudtrail], lookups=[regions],
+                            tags=DetectionTags.construct(analytic_story=["AWS Story", "Other Story"])),
+    ]
+    baselines = [Baseline.construct(name="Baseline", tags=BaselineTags.construct(analytic_story=[], detections=["First"]))]
+    return ContentGraph.build({
+        SecurityContentType.macros: [cloudtrail, wrapper],
+        SecurityContentType.lookups: [regions],
+        SecurityContentType.baselines: baselines,
+        SecurityContentType.detections: detections,
+    })
+
+
+def test_content_graph_direct():
+    graph = build_graph()
+    assert graph.get_dependents(SecurityContentType.macros, "cloudtrail") == [
+        (SecurityContentType.macros, "cloudtrail_regions"), (SecurityContentType.detections, "Second")]
+    assert graph.get_dependents(SecurityContentType.stories, "AWS Story", SecurityContentType.detections) == [
+        (SecurityContentType.detections, "First"), (SecurityContentType.detections, "Second")]
+    assert graph.get_dependents(SecurityContentType.lookups, "previously_seen_aws_regions", SecurityContentType.detections) == [
+        (SecurityContentType.detections, "Second")]
+    assert graph.get_dependencies(SecurityContentType.detections, "First", SecurityContentType.data_sources) == [
+        (SecurityContentType.data_sources, "AWS CloudTrail")]
+    # Stories are nodes even though no story objects were loaded
+    assert graph.get_object(SecurityContentType.stories, "Other Story") is None
+    assert graph.get_object(SecurityContentType.detections, "First").name == "First"
+    assert graph.get_dependents(SecurityContentType.macros, "missing") == []
+
+
+def test_content_graph_transitive():
+    graph = build_graph()
+    assert graph.get_dependents(SecurityContentType.macros, "cloudtrail", SecurityContentType.detections) == [
+        (SecurityContentType.detections, "Second")]
+    assert graph.get_dependents(SecurityContentType.macros, "cloudtrail", SecurityContentType.detections, transitive=True) == [
+        (SecurityContentType.detections, "Second"), (SecurityContentType.detections, "First")]
+    assert (SecurityContentType.baselines, "Baseline") in graph.get_dependents(SecurityContentType.lookups, "previously_seen_aws_regions", transitive=True)
+    assert graph.get_dependencies(SecurityContentType.detections, "First", SecurityContentType.lookups, transitive=True) == [
+        (SecurityContentType.lookups, "previously_seen_aws_regions")]
+
+
+def test_content_graph_from_references():
+    graph = build_graph()
+    references = [(source[0].name, source[1], target[0].name, target[1])
+                  for source, targets in graph.dependencies.items() for target in targets]
+    nodes = [(type.name, name) for type, name in graph.get_nodes()]
+    loaded = ContentGraph.from_references(references, nodes)
+    assert loaded.get_nodes() == graph.get_nodes()
+    for type, name in graph.get_nodes():
+        assert loaded.get_dependents(type, name, transitive=True) == graph.get_dependents(type, name, transitive=True)
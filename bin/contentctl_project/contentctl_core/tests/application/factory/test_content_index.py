@@ -0,0 +1,50 @@
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.domain.entities.baseline import Baseline
+from bin.contentctl_project.contentctl_core.domain.entities.baseline_tags import BaselineTags
+from bin.contentctl_project.contentctl_core.domain.entities.deployment import Deployment
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+
+
+def test_content_index_by_name():
+    macros = [Macro.construct(name="cloudtrail"), Macro.construct(name="sysmon"), Macro.construct(name="cloudtrail")]
+    index = ContentIndex(macros)
+    assert index.get_by_name("cloudtrail") == [macros[0], macros[2]]
+    assert index.get_by_name("missing") == []
+    assert ContentIndex.of(index) is index
+    assert list(ContentIndex.of(macros)) == macros
+
+
+def test_content_index_by_detection():
+    baselines = [
+        Baseline.construct(name="first", tags=BaselineTags.construct(detections=["A", "B"])),
+        Baseline.construct(name="second", tags=BaselineTags.construct(detections=["B", "B"])),
+    ]
+    index = ContentIndex(baselines)
+    assert index.get_by_detection("A") == [baselines[0]]
+    assert index.get_by_detection("B") == [baselines[0], baselines[1], baselines[1]]
+    assert index.get_by_detection("C") == []
+
+
+def test_content_index_get_deployment():
+    deployments = [
+        Deployment.construct(name="ttp", tags={"type": "TTP"}),
+        Deployment.construct(name="anomaly", tags={"type": "Anomaly"}),
+        Deployment.construct(name="ttp_override", tags={"type": "TTP"}),
+    ]
+    index = ContentIndex(deployments)
+    # The last matching deployment wins, as it did with a linear scan
+    assert index.get_deployment(Detection.construct(name="detection", type="TTP")) is deployments[2]
+    assert index.get_deployment(Detection.construct(name="detection", type="Anomaly")) is deployments[1]
+    assert index.get_deployment(Detection.construct(name="detection", type="Hunting")) is None
+
+
+def test_content_index_by_analytic_story():
+    baselines = [
+        Baseline.construct(name="first", tags=BaselineTags.construct(analytic_story=["Story A"])),
+        Baseline.construct(name="second", tags=BaselineTags.construct(analytic_story=["Story A", "Story B"])),
+    ]
+    index = ContentIndex(baselines)
+    assert index.get_by_analytic_story("Story A") == baselines
+    assert index.get_by_analytic_story("Story B") == [baselines[1]]
+    assert index.get_by_analytic_story("Story C") == []
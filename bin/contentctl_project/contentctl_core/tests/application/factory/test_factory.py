@@ -1,10 +1,12 @@
 import os
+import pathlib
 from re import A
 from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
 
 from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto
 from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryOutputDto
 from bin.contentctl_project.contentctl_core.application.factory.factory import Factory
+from bin.contentctl_project.contentctl_core.application.factory.utils.utils import Utils
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
@@ -36,3 +38,33 @@ def test_factory_ESCU():
     factory = Factory(output_dto)
     factory.execute(input_dto)
 
+
+
+def test_factory_parse_detections_parallel():
+    input_path = os.path.join(os.path.dirname(__file__), '../../../../../..')
+    detection_files = Utils.get_all_yml_files_from_directory(os.path.join(input_path, 'detections', 'endpoint'))[:12]
+    # This fixture predates the 'status' field, so it must come back as an error and not abort the map
+    detection_files.append(pathlib.Path(os.path.join(os.path.dirname(__file__), 
+        '../../../../contentctl_infrastructure/tests/builder/test_data/detection/valid.yml')))
+
+    parsed = {}
+    for workers in [1, 2]:
+        input_dto = FactoryInputDto(
+            os.path.abspath(input_path),
+            SecurityContentBasicBuilder(),
+            SecurityContentDetectionBuilder(),
+            SecurityContentStoryBuilder(),
+            SecurityContentBaselineBuilder(),
+            SecurityContentInvestigationBuilder(),
+            SecurityContentPlaybookBuilder(input_path = SECURITY_CONTENT_ROOT),
+            SecurityContentDirector(),
+            {},
+            workers = workers
+        )
+        factory = Factory(FactoryOutputDto([],[],[],[],[],[],[],[]))
+        factory.input_dto = input_dto
+        parsed[workers] = factory.parseDetections([pathlib.Path(os.path.abspath(f)) for f in detection_files])
+
+    assert [d.name for d in parsed[1][:-1]] == [d.name for d in parsed[2][:-1]]
+    assert isinstance(parsed[1][-1], Exception)
+    assert isinstance(parsed[2][-1], Exception)
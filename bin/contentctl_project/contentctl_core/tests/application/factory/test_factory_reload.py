@@ -0,0 +1,156 @@
+import os
+import shutil
+
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+
+from bin.contentctl_project.contentctl_core.application.factory.factory import FactoryInputDto, FactoryOutputDto, Factory
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_core.domain.entities.link_validator import LinkValidator, LinkStats
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_story_builder import SecurityContentStoryBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_investigation_builder import SecurityContentInvestigationBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_baseline_builder import SecurityContentBaselineBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_playbook_builder import SecurityContentPlaybookBuilder
+
+CONTENT_FILES = [
+    'macros/azuread.yml',
+    'lookups/privileged_azure_ad_roles.yml',
+    'lookups/privileged_azure_ad_roles.csv',
+    'detections/cloud/azure_ad_privileged_role_assigned.yml',
+    'stories/azure_active_directory_persistence.yml',
+]
+DETECTION = 'detections/cloud/azure_ad_privileged_role_assigned.yml'
+
+
+def load_content(path) -> Factory:
+    for file in CONTENT_FILES:
+        os.makedirs(os.path.dirname(path / file), exist_ok=True)
+        shutil.copy(os.path.join(SECURITY_CONTENT_ROOT, file), path / file)
+    shutil.copytree(os.path.join(SECURITY_CONTENT_ROOT, 'deployments'), path / 'deployments')
+    factory = Factory(FactoryOutputDto([],[],[],[],[],[],[],[]))
+    factory.execute(factory_input(path))
+    return factory
+
+
+def factory_input(path) -> FactoryInputDto:
+    return FactoryInputDto(
+        str(path),
+        SecurityContentBasicBuilder(),
+        SecurityContentDetectionBuilder(force_cached_or_offline=True, skip_enrichment=True),
+        SecurityContentStoryBuilder(),
+        SecurityContentBaselineBuilder(),
+        SecurityContentInvestigationBuilder(),
+        SecurityContentPlaybookBuilder(input_path=str(path)),
+        SecurityContentDirector(),
+        {}
+    )
+
+
+def rewrite(file, old: str, new: str) -> None:
+    with open(file) as f:
+        content = f.read()
+    assert old in content
+    with open(file, 'w') as f:
+        f.write(content.replace(old, new))
+
+
+def test_reload_embedding_content(tmp_path):
+    factory = load_content(tmp_path)
+    detection = factory.output_dto.detections[0]
+    assert [macro.name for macro in detection.macros][0] == 'azuread'
+    assert factory.output_dto.stories[0].detections[0]['name'] == detection.name
+
+    # A macro is embedded in the detections using it, which are embedded in their stories
+    rewrite(tmp_path / 'macros/azuread.yml', 'definition: ', 'definition: index=azure ')
+    errors = factory.reloadContent([str(tmp_path / 'macros/azuread.yml')])
+    assert sorted(errors) == sorted(str(tmp_path / file) for file in ['macros/azuread.yml', DETECTION, 'stories/azure_active_directory_persistence.yml'])
+    assert all(len(file_errors) == 0 for file_errors in errors.values())
+    assert factory.output_dto.detections[0].macros[0].definition.startswith('index=azure ')
+    assert factory.output_dto.detections[0] is not detection
+    assert len(factory.output_dto.macros) == 1
+
+
+def test_reload_invalid_and_duplicate(tmp_path):
+    factory = load_content(tmp_path)
+    detection = factory.output_dto.detections[0]
+
+    rewrite(tmp_path / DETECTION, f'id: {detection.id}', 'id: not-a-uuid')
+    errors = factory.reloadContent([str(tmp_path / DETECTION)])
+    assert len(errors[str(tmp_path / DETECTION)]) == 1
+    assert factory.output_dto.detections == []
+    assert factory.output_dto.stories[0].detections == []
+    assert factory.output_dto.graph.get_dependents(SecurityContentType.macros, 'azuread') == []
+
+    rewrite(tmp_path / DETECTION, 'id: not-a-uuid', f'id: {detection.id}')
+    copy = tmp_path / 'detections' / 'cloud' / 'copy.yml'
+    shutil.copy(tmp_path / DETECTION, copy)
+    rewrite(copy, f'name: {detection.name}', 'name: Azure AD Privileged Role Assigned Copy')
+    errors = factory.reloadContent([str(tmp_path / DETECTION), str(copy)])
+    assert 'duplicate ID' in str(errors[str(copy)][0])
+    assert 'duplicate ID' in str(errors[str(tmp_path / DETECTION)][0])
+    assert len(factory.output_dto.stories[0].detections) == 2
+
+    os.remove(copy)
+    errors = factory.reloadContent([str(copy), str(tmp_path / DETECTION)])
+    assert errors[str(copy)] == [] and errors[str(tmp_path / DETECTION)] == []
+    assert [d.name for d in factory.output_dto.detections] == [detection.name]
+
+
+def test_reload_nested_macro(tmp_path):
+    factory = load_content(tmp_path)
+    with open(tmp_path / 'macros/azure_index.yml', 'w') as f:
+        f.write('definition: index=azure\ndescription: the index of azure\nname: azure_index\n')
+    rewrite(tmp_path / 'macros/azuread.yml', 'definition: sourcetype=mscs:azure:eventhub', "definition: '`azure_index` sourcetype=mscs:azure:eventhub'")
+    factory.reloadContent([str(tmp_path / 'macros/azure_index.yml'), str(tmp_path / 'macros/azuread.yml')])
+
+    # The detection uses azure_index through azuread
+    rewrite(tmp_path / 'macros/azure_index.yml', 'index=azure', 'index=azure_ad')
+    errors = factory.reloadContent([str(tmp_path / 'macros/azure_index.yml')])
+    assert sorted(errors) == sorted(str(tmp_path / file) for file in ['macros/azure_index.yml', DETECTION, 'stories/azure_active_directory_persistence.yml'])
+
+    # A macro whose name is only part of the name of a macro the detection uses
+    with open(tmp_path / 'macros/azure.yml', 'w') as f:
+        f.write('definition: index=azure\ndescription: azure\nname: azure\n')
+    errors = factory.reloadContent([str(tmp_path / 'macros/azure.yml')])
+    assert list(errors) == [str(tmp_path / 'macros/azure.yml')]
+
+
+def test_reload_resolves_references(tmp_path, monkeypatch):
+    factory = load_content(tmp_path)
+    monkeypatch.setattr(LinkValidator, "cache", {})
+    checked = []
+    def check_reference(self, session):
+        checked.append(self.reference)
+        self.status_code = 404
+        self.resolved = True
+    monkeypatch.setattr(LinkStats, "check_reference", check_reference)
+    monkeypatch.setattr(factory.input_dto.story_builder, "check_references", True)
+
+    story = str(tmp_path / 'stories/azure_active_directory_persistence.yml')
+    errors = factory.reloadContent([story])
+    references = factory.output_dto.stories[0].references
+    assert sorted(checked) == sorted(references)
+    assert [str(error) for error in errors[story]] == [f"Reference Link Failed: {reference}" for reference in references]
+
+
+def test_reload_failed_dependent(tmp_path):
+    baseline = 'baselines/baseline_of_blocked_outbound_traffic_from_aws.yml'
+    deployment = 'deployments/00_default_baseline.yml'
+    os.makedirs(tmp_path / 'baselines')
+    os.makedirs(tmp_path / 'deployments')
+    shutil.copy(os.path.join(SECURITY_CONTENT_ROOT, baseline), tmp_path / baseline)
+    factory = Factory(FactoryOutputDto([],[],[],[],[],[],[],[]))
+    with pytest.raises(Exception):
+        factory.execute(factory_input(tmp_path))
+    assert 'No deployment found' in str(factory.validation_errors[0][1])
+
+    # The baseline is loaded again once the deployment it was missing is added
+    shutil.copy(os.path.join(SECURITY_CONTENT_ROOT, deployment), tmp_path / deployment)
+    errors = factory.reloadContent([str(tmp_path / deployment)])
+    assert errors[str(tmp_path / baseline)] == []
+    assert [b.name for b in factory.output_dto.baselines] == ['Baseline of blocked outbound traffic from AWS']
+    assert factory.failed_files[SecurityContentType.baselines] == set()
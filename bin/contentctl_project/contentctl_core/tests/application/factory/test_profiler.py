@@ -0,0 +1,48 @@
+import json
+
+from bin.contentctl_project.contentctl_core.application.factory.utils.profiler import Profiler
+
+
+class Builder():
+
+    def setObject(self, path: str) -> str:
+        return self.addMacros(path)
+
+    def addMacros(self, path: str) -> str:
+        return path.upper()
+
+    @staticmethod
+    def fetch(cve_id: str) -> list:
+        return [cve_id] * 1000
+
+
+def test_profiler(tmp_path):
+    Profiler.instrument(Builder, 'builder')
+    Profiler.instrument(Builder, 'builder')
+
+    # Instrumented methods only record spans while the profiler is enabled
+    assert Builder().setObject('a') == 'A'
+    Profiler.enable(trace_allocations=True)
+    try:
+        for path in ['a', 'b', 'c']:
+            assert Builder().setObject(path) == path.upper()
+        with Profiler.span('enrichment'):
+            assert len(Builder.fetch('CVE-2021-44228')) == 1000
+    finally:
+        Profiler.disable()
+    assert Builder().setObject('d') == 'D'
+
+    calls, wall, self_wall, cpu, allocated = Profiler.stats['Builder.setObject']
+    assert calls == 3
+    assert self_wall < wall
+    assert Profiler.stats['Builder.addMacros'][0] == 3
+    assert Profiler.stats['Builder.fetch'][4] > 0
+    assert Profiler.stats['enrichment'][2] < Profiler.stats['enrichment'][1]
+    assert 'Builder.setObject' in Profiler.summary()
+
+    Profiler.write_trace(tmp_path / 'trace.json')
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == 8
+    assert all(event['ph'] == 'X' and event['cat'] in ['builder', 'contentctl'] for event in events)
+    assert [event['name'] for event in events][:2] == ['Builder.setObject', 'Builder.addMacros']
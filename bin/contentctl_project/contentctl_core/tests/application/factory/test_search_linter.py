@@ -0,0 +1,49 @@
+from bin.contentctl_project.contentctl_core.application.factory.utils.search_linter import SearchLinter
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser, MacroExpander
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+
+
+def rules(search: str, suppress: list = []) -> list[str]:
+    return [warning['rule'] for warning in SearchLinter.lint(search, suppress)[1]]
+
+
+def test_search_linter():
+    assert SearchLinter.lint('| tstats summariesonly=true count from datamodel=Endpoint.Processes where Processes.process_name=cmd.exe by Processes.dest') == (0, [])
+    assert rules('| tstats count from datamodel=Endpoint.Processes by Processes.dest') == ['missing_summariesonly']
+    assert rules('| tstats count where index=_internal by sourcetype') == []
+    assert rules('| tstats summariesonly=t count from datamodel=Web by Web.src') == []
+    assert rules('| datamodel Endpoint Processes search | search process_name=cmd.exe') == ['datamodel_without_tstats']
+    assert rules('| from datamodel:"Web.Web" | stats count') == ['datamodel_without_tstats']
+
+    # Leading wildcards in the terms of search, not in the arguments of eval or in a trailing wildcard
+    assert rules('index=main process="*\\\\cmd.exe" | eval x="*y"') == ['leading_wildcard']
+    assert rules('index=main process=cmd* OR process=*') == []
+
+    assert rules('`cloudtrail` | transaction user maxspan=1h') == ['transaction']
+    assert rules('index=a | join max=0 user [search index=b]') == ['unbounded_join', 'subsearch']
+    # A subsearch that only reads a lookup is cheap, and so is each of several
+    assert rules('index=a [| inputlookup hosts.csv | fields dest] [| inputlookup users.csv | fields user]') == []
+    assert rules('index=a [| inputlookup hosts.csv | fields dest] [search index=b | fields user]') == ['subsearch']
+    assert rules('index=a | map search="search index=b user=$user$"') == ['map']
+
+    cost, warnings = SearchLinter.lint('index=a "*1" "*2" "*3" "*4" | transaction user')
+    assert cost == SearchLinter.RULES['leading_wildcard'].cost + SearchLinter.RULES['transaction'].cost
+    assert warnings[0]['message'].endswith(': "*1", "*2", "*3" and 1 more')
+    assert rules('index=a "*1" | transaction user', ['transaction']) == ['leading_wildcard']
+
+
+def test_expanded_escu_search():
+    # security_content_summariesonly sets summariesonly=false, which is the default
+    macros = ContentIndex([Macro(name='security_content_summariesonly', definition='summariesonly=false allow_old_summaries=true fillnull_value=null', description='')])
+    search = MacroExpander(macros).expand('| tstats `security_content_summariesonly` count from datamodel=Endpoint.Processes where Processes.process_name=cmd.exe by Processes.dest')
+    cost, warnings = SearchLinter.lint(search)
+    assert cost == SearchLinter.RULES['missing_summariesonly'].cost
+    assert warnings[0]['message'].endswith(': tstats summariesonly=false')
+
+
+def test_subsearch_numbers():
+    commands = SplParser.commands('index=a [search b | fields c] [| inputlookup d] | stats count')
+    assert [(command.name, command.depth, command.subsearch) for command in commands] == [
+        ('search', 0, 0), ('search', 1, 1), ('fields', 1, 1), ('inputlookup', 1, 2), ('stats', 0, 0)
+    ]
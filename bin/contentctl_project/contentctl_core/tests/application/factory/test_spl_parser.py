@@ -0,0 +1,47 @@
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser, MacroExpander
+from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
+
+
+SEARCH = '| tstats `security_content_summariesonly` count from datamodel=Endpoint.Processes where Processes.process_name="Change.exe" by Processes.dest ' \
+         '| `drop_dm_object_name(Processes)` | eval lookup = if(like(process, "%`%"), 1, 0) | lookup update=true is_windows_system_file filename as process_name ' \
+         '| search [| inputlookup append=t "risky_hosts.csv" | fields dest] | `security_content_ctime(firstTime, "%Y")` | `detection_filter`'
+
+
+def test_spl_parser():
+    assert SplParser.split_macro('`security_content_ctime(firstTime, "a, b", f(x, y))`') == ('security_content_ctime', ['firstTime', '"a, b"', 'f(x, y)'])
+    assert SplParser.split_macro('`cloudtrail`') == ('cloudtrail', [])
+
+    assert SplParser.macros(SEARCH) == ['security_content_summariesonly', 'drop_dm_object_name', 'security_content_ctime', 'detection_filter']
+    commands = SplParser.commands(SEARCH)
+    assert [(command.name, command.depth) for command in commands] == [
+        ('tstats', 0), ('`drop_dm_object_name(Processes)`', 0), ('eval', 0), ('lookup', 0), ('search', 0),
+        ('inputlookup', 1), ('fields', 1), ('`security_content_ctime(firstTime, "%Y")`', 0), ('`detection_filter`', 0)
+    ]
+    # Not the eval of a field named lookup, nor the Change in a string
+    assert SplParser.lookups(SEARCH) == ['is_windows_system_file', 'risky_hosts.csv']
+    assert SplParser.datamodels(SEARCH) == ['Endpoint']
+    assert SplParser.datamodels('| datamodel Network_Traffic All_Traffic search | from datamodel:"Web.Web"') == ['Network_Traffic', 'Web']
+    assert SplParser.datamodels('| from datamodel Web.Web | eval jndi=1') == ['Web']
+    assert SplParser.datamodels('| from datamodel:Endpoint.Processes') == ['Endpoint']
+
+
+def test_macro_expander():
+    macros = ContentIndex([
+        Macro(name='security_content_summariesonly', definition='summariesonly=false', description=''),
+        Macro(name='security_content_ctime', definition='convert timeformat=$format$ ctime($field$)', description='', arguments=['field', 'format']),
+        Macro(name='outer', definition='`inner` | `outer`', description=''),
+        Macro(name='inner', definition='search `security_content_summariesonly`', description=''),
+    ])
+    expander = MacroExpander(macros)
+    expanded = expander.expand(SEARCH, [Macro(name='detection_filter', definition='search *', description='')])
+    assert expanded.startswith('| tstats summariesonly=false count from datamodel=Endpoint.Processes ')
+    # Undefined macros, and a backtick that does not start a macro, are left as they are
+    assert '| `drop_dm_object_name(Processes)` | eval lookup = if(like(process, "%`%"), 1, 0) |' in expanded
+    assert expanded.endswith('| convert timeformat="%Y" ctime(firstTime) | search *')
+    assert expander.expand(SEARCH, [Macro(name='detection_filter', definition='search *', description='')]) is expanded
+
+    # Nested macros are expanded, a macro calling itself is not
+    assert expander.expand('`outer`') == 'search summariesonly=false | `outer`'
+    # A call with the wrong number of arguments is not expanded
+    assert expander.expand('`security_content_ctime(firstTime)`') == '`security_content_ctime(firstTime)`'
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+from bin.contentctl_project.contentctl_core.application.use_cases.convert import Convert, ConvertInputDto
+from bin.contentctl_project.contentctl_infrastructure.adapter.yml_writer import YmlWriter
+from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+from bin.contentctl_project.contentctl_infrastructure.builder.sigma_converter import SigmaConverterInputDto
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SigmaConverterTarget
+
+
+def test_convert_report_without_converted_detections(tmp_path):
+    detection = YmlReader.load_file(os.path.join(SECURITY_CONTENT_ROOT, 'dev', 'endpoint', '7zip_commandline_to_smb_share_path.yml'))
+    detection['tags']['required_fields'] = ['Image', 'CommandLine']
+    detection_folder = tmp_path / 'detections'
+    detection_folder.mkdir()
+    YmlWriter.writeYmlFile(str(detection_folder / 'unknown_data_source.yml'), {**detection, 'data_source': ['Missing']})
+    output_path = tmp_path / 'output'
+
+    # Nothing converts, so the report is the only file written to the output folder
+    with pytest.raises(SystemExit):
+        Convert().execute(ConvertInputDto(
+            sigma_converter_input_dto = SigmaConverterInputDto(
+                data_model = SigmaConverterTarget.RAW,
+                detection_path = None,
+                detection_folder = str(detection_folder),
+                input_path = SECURITY_CONTENT_ROOT,
+                log_source = None,
+                workers = 1
+            ),
+            output_path = str(output_path)
+        ))
+    with open(output_path / 'conversion_report.json') as f:
+        report = json.load(f)
+    assert report['converted'] == 0
+    assert report['failed'] == 1
+    assert os.listdir(output_path) == ['conversion_report.json']
@@ -0,0 +1,105 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bin.contentctl_project.contentctl_core.domain.entities.link_validator import LinkValidator
+
+
+class ReferenceHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, send_body: bool):
+        ReferenceHandler.requests_seen.append((self.command, self.path))
+        if self.path == "/ok":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+        elif self.path == "/no_head" and self.command == "HEAD":
+            self.send_response(405)
+        elif self.path == "/no_head":
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(b"ok")
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ReferenceHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def link_validator(tmp_path, monkeypatch):
+    monkeypatch.setattr(LinkValidator, "cache", {})
+    monkeypatch.setattr(LinkValidator, "reference_cache_file", str(tmp_path / "REFERENCE_CACHE.sqlite"))
+    monkeypatch.setattr(LinkValidator, "use_file_cache", False)
+    ReferenceHandler.requests_seen = []
+    return LinkValidator
+
+
+def test_resolve_references(server, link_validator):
+    # Phase one only records references
+    assert link_validator.validate_reference(f"{server}/ok", "first.yml") is True
+    assert link_validator.validate_reference(f"{server}/ok", "second.yml") is True
+    assert link_validator.validate_reference(f"{server}/no_head", "first.yml") is True
+    assert link_validator.validate_reference(f"{server}/missing", "first.yml") is True
+    assert ReferenceHandler.requests_seen == []
+
+    link_validator.resolve_references()
+    assert link_validator.cache[f"{server}/ok"].valid is True
+    assert link_validator.cache[f"{server}/ok"].referencing_files == {"first.yml", "second.yml"}
+    assert link_validator.cache[f"{server}/no_head"].valid is True
+    assert link_validator.cache[f"{server}/missing"].valid is False
+    assert link_validator.cache[f"{server}/missing"].status_code == 404
+    assert ("GET", "/no_head") in ReferenceHandler.requests_seen
+    assert ("GET", "/ok") not in ReferenceHandler.requests_seen
+
+    with pytest.raises(Exception):
+        link_validator.validate_reference(f"{server}/missing", "third.yml", raise_exception_if_failure=True)
+    with pytest.raises(ValueError):
+        link_validator.validate_reference("ftp://example.com", "first.yml")
+
+
+def test_reference_file_cache(server, link_validator):
+    link_validator.initialize_cache(True)
+    link_validator.validate_reference(f"{server}/ok", "first.yml")
+    link_validator.validate_reference(f"{server}/missing", "first.yml")
+    link_validator.resolve_references()
+    link_validator.close_cache()
+    assert len(ReferenceHandler.requests_seen) == 3
+
+    # Fresh valid references are not requested again, failures always are
+    link_validator.cache = {}
+    link_validator.initialize_cache(True)
+    link_validator.validate_reference(f"{server}/ok", "first.yml")
+    link_validator.validate_reference(f"{server}/missing", "first.yml")
+    link_validator.resolve_references()
+    assert ReferenceHandler.requests_seen[3:] == [("HEAD", "/missing"), ("GET", "/missing")]
+
+    # Once the TTL has passed the reference is revalidated with its ETag
+    link_validator.cache[f"{server}/ok"].checked_at = 0
+    link_validator.cache[f"{server}/ok"].resolved = False
+    link_validator.resolve_references()
+    assert ReferenceHandler.requests_seen[-1] == ("HEAD", "/ok")
+    assert link_validator.cache[f"{server}/ok"].valid is True
+    assert link_validator.cache[f"{server}/ok"].status_code == 200
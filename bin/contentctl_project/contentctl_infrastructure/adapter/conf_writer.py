@@ -1,23 +1,32 @@
+
 import datetime
-import os
-from jinja2 import Environment, FileSystemLoader
+import io
 
 from bin.contentctl_project.contentctl_core.domain.entities.security_content_object import SecurityContentObject
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
+
+CONF_FILE_BUFFER_SIZE = 1024 * 1024
+
+
+def open_conf_file(output_path: str, mode: str) -> io.TextIOWrapper:
+    # Characters that are not ASCII are dropped as each chunk is written, which gives
+    # the same file as output.encode('ascii', 'ignore').decode('ascii') on the whole text
+    return open(output_path, mode, encoding='ascii', errors='ignore', buffering=CONF_FILE_BUFFER_SIZE)
+
 
 class ConfWriter():
 
     @staticmethod
     def writeConfFileHeader(output_path : str) -> None:
-        utc_time = datetime.datetime.utcnow().replace(microsecond=0).isoformat()
-        j2_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')), 
-            trim_blocks=True)
+        with open_conf_file(output_path, 'w') as f:
+            f.write(ConfWriter.renderConfFileHeader())
 
-        template = j2_env.get_template('header.j2')
-        output = template.render(time=utc_time)
-        with open(output_path, 'w') as f:
-            output = output.encode('ascii', 'ignore').decode('ascii')
-            f.write(output)
+
+    @staticmethod
+    def renderConfFileHeader() -> str:
+        utc_time = datetime.datetime.utcnow().replace(microsecond=0).isoformat()
+        template = TemplateRegistry.get_template('header.j2')
+        return template.render(time=utc_time)
 
 
     @staticmethod
@@ -28,34 +37,16 @@ class ConfWriter():
 
     @staticmethod
     def writeConfFile(template_name : str, output_path : str, objects : list) -> None:
+        with open_conf_file(output_path, 'a') as f:
+            f.writelines(TemplateRegistry.get_template(template_name).generate(objects=objects))
 
-        def custom_jinja2_enrichment_filter(string, object):
-            customized_string = string
-
-            for key in dir(object):
-                if type(key) is not str:
-                    key = key.decode()
-                if not key.startswith('__') and not key == "_abc_impl" and not callable(getattr(object, key)):
-                    if hasattr(object, key):
-                        customized_string = customized_string.replace("%" + key + "%", str(getattr(object, key)))
-
-            for key in dir(object.tags):
-                if type(key) is not str:
-                    key = key.decode()
-                if not key.startswith('__') and not key == "_abc_impl" and not callable(getattr(object.tags, key)):
-                    if hasattr(object.tags, key):
-                        customized_string = customized_string.replace("%" + key + "%", str(getattr(object.tags, key)))
 
-            return customized_string
-
-        j2_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')), 
-            trim_blocks=True)
+    @staticmethod
+    def renderConfFile(template_name : str, objects : list) -> str:
+        template = TemplateRegistry.get_template(template_name)
+        return template.render(objects=objects)
 
-        j2_env.filters['custom_jinja2_enrichment_filter'] = custom_jinja2_enrichment_filter
-        template = j2_env.get_template(template_name)
-        output = template.render(objects=objects)
-        with open(output_path, 'a') as f:
-            output = output.encode('ascii', 'ignore').decode('ascii')
-            f.write(output)
 
+    @staticmethod
+    def getTemplateSource(template_name : str) -> str:
+        return TemplateRegistry.get_template_source(template_name)
@@ -1,6 +1,6 @@
-import os
 import re
-from jinja2 import Environment, FileSystemLoader
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
 
 from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
 from bin.contentctl_project.contentctl_core.domain.constants.constants import *
@@ -41,10 +41,7 @@ class FindingReportObject():
         else:
             actor_user_name = "\"Unknown\""
 
-        j2_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')), 
-            trim_blocks=True)
-        template = j2_env.get_template('finding_report.j2')
+        template = TemplateRegistry.get_template('finding_report.j2')
         body = template.render(detection=detection, attack_tactics_id_mapping=SES_ATTACK_TACTICS_ID_MAPPING, actor_user_name=actor_user_name)
 
         return body
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+from typing import Union
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import CONTENT_CACHE_DIRECTORY
+
+# Bump this whenever the manifest layout, or the way stanzas are rendered, changes.
+# A manifest written by a different version is ignored and every stanza is re-rendered.
+INCREMENTAL_MANIFEST_VERSION = 1
+
+
+class IncrementalConfWriter():
+    # Every conf template in ObjToConfAdapter renders as
+    #     prefix + stanza(object_1) + ... + stanza(object_n) + suffix
+    # where stanza(object) only depends on that object.  The manifest keeps, per template,
+    # the rendered stanza of every object along with a fingerprint of its inputs: the
+    # template source and the fully built object, which already carries its deployment,
+    # macros, lookups, baselines and (for stories) the detections that reference it.
+    # Unchanged objects are spliced back in from the manifest and only changed objects
+    # are rendered.  A conf file whose content does not change is not written at all.
+    # Whether a stanza is rendered again only depends on the fingerprint: all content is
+    # still built by the Factory and every object is serialized to fingerprint it, since
+    # a stanza also depends on enrichment and on nested macros that no file tracks.  The
+    # stories, macros, lookups, baselines and deployment of every detection are kept in
+    # the manifest too, only to report the detections whose dependencies changed.
+    manifest_path: str
+    manifest: dict
+    segments: dict[str, list]
+    templates: dict[str, dict]
+    dependencies: dict[str, dict]
+    rendered: int
+    reused: int
+
+    def __init__(self, input_path: str, output_path: str):
+        manifest_name = "generate_manifest_" + hashlib.sha256(os.path.abspath(output_path).encode('utf-8')).hexdigest()[:12] + ".json"
+        self.manifest_path = os.path.join(input_path, CONTENT_CACHE_DIRECTORY, manifest_name)
+        self.manifest = self.loadManifest()
+        self.segments = {}
+        self.templates = {}
+        self.dependencies = {}
+        self.rendered = 0
+        self.reused = 0
+
+
+    def loadManifest(self) -> dict:
+        empty_manifest = {"version": INCREMENTAL_MANIFEST_VERSION, "headers": {}, "templates": {}, "dependencies": {}}
+        if not os.path.exists(self.manifest_path):
+            print(f"No incremental generate manifest found at {self.manifest_path} - rendering every stanza.")
+            return empty_manifest
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"Failed to read the incremental generate manifest at {self.manifest_path} - rendering every stanza: {str(e)}")
+            return empty_manifest
+
+        if manifest.get("version") != INCREMENTAL_MANIFEST_VERSION:
+            return empty_manifest
+        return manifest
+
+
+    def writeConfFileHeader(self, output_path: str) -> None:
+        self.segments[output_path] = []
+
+
+    def writeConfFile(self, template_name: str, output_path: str, objects: list) -> None:
+        # Stanzas are rendered right away rather than in finalize, since ObjToConfAdapter
+        # modifies some objects (e.g. escaping investigation searches) between templates
+        if output_path not in self.segments:
+            self.segments[output_path] = []
+        self.templates[template_name] = self.renderTemplate(template_name, objects)
+        self.segments[output_path].append(template_name)
+
+
+    def addDetectionDependencies(self, detections: list) -> None:
+        for detection in detections:
+            self.dependencies[detection.name] = {
+                "stories": list(detection.tags.analytic_story),
+                "macros": [macro.name for macro in detection.macros or []],
+                "lookups": [lookup.name for lookup in detection.lookups or []],
+                "baselines": [baseline.name for baseline in detection.baselines or []],
+                "deployments": [detection.deployment.name] if detection.deployment else []
+            }
+
+
+    def finalize(self) -> None:
+        manifest_headers = {}
+        written_files = []
+
+        for output_path, segments in self.segments.items():
+            body = ""
+            for template_name in segments:
+                template_entry = self.templates[template_name]
+                body += template_entry["prefix"]
+                body += "".join(template_entry["stanzas"][key]["text"] for key in template_entry["order"])
+                body += template_entry["suffix"]
+
+            # The header carries the generation time, so it is only refreshed when the file changes
+            header = self.manifest["headers"].get(output_path)
+            if header is not None and os.path.exists(output_path):
+                with open(output_path, 'r') as f:
+                    if f.read() == (header + body).encode('ascii', 'ignore').decode('ascii'):
+                        manifest_headers[output_path] = header
+                        continue
+
+            header = ConfWriter.renderConfFileHeader()
+            manifest_headers[output_path] = header
+            with open(output_path, 'w') as f:
+                f.write((header + body).encode('ascii', 'ignore').decode('ascii'))
+            written_files.append(output_path)
+
+        changed_detections = [name for name, dependencies in self.dependencies.items()
+                              if self.manifest["dependencies"].get(name) != dependencies]
+        self.manifest = {
+            "version": INCREMENTAL_MANIFEST_VERSION,
+            "headers": manifest_headers,
+            "templates": self.templates,
+            "dependencies": self.dependencies
+        }
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f)
+
+        print(f"Incremental generate: rendered [{self.rendered}] stanza(s), reused [{self.reused}] stanza(s), "
+              f"rewrote [{len(written_files)}] conf file(s)")
+        print(f"[{len(changed_detections)}] detection(s) have different stories, macros, lookups, baselines or deployment than in the last incremental generate")
+        for name in changed_detections[:10]:
+            print(f"\t* {name}")
+        for output_path in written_files:
+            print(f"\t* {output_path}")
+
+
+    def renderTemplate(self, template_name: str, objects: list) -> dict:
+        template_digest = hashlib.sha256(ConfWriter.getTemplateSource(template_name).encode('utf-8')).hexdigest()
+        previous_entry = self.manifest["templates"].get(template_name)
+        if previous_entry is None or previous_entry["digest"] != template_digest:
+            previous_entry = None
+
+        empty = ConfWriter.renderConfFile(template_name, [])
+        split = previous_entry["split"] if previous_entry is not None else None
+
+        order = []
+        stanzas = {}
+        for obj in objects:
+            key = self.getObjectKey(obj, stanzas)
+            fingerprint = self.getObjectFingerprint(obj, template_digest)
+            order.append(key)
+
+            if previous_entry is not None and key in previous_entry["stanzas"] and previous_entry["stanzas"][key]["fingerprint"] == fingerprint:
+                stanzas[key] = previous_entry["stanzas"][key]
+                self.reused += 1
+                continue
+
+            rendered = ConfWriter.renderConfFile(template_name, [obj])
+            self.rendered += 1
+            if split is None:
+                split = self.getSplit(empty, rendered)
+            text = self.getStanza(empty, rendered, split)
+            if text is None:
+                # This object does not line up with the prefix/suffix split inferred so far,
+                # so the split cannot be trusted: render the whole template from scratch.
+                return self.renderTemplateFromScratch(template_name, objects, template_digest)
+            stanzas[key] = {"fingerprint": fingerprint, "text": text}
+
+        if split is None:
+            split = len(empty)
+        return {"digest": template_digest, "split": split, "prefix": empty[:split], "suffix": empty[split:],
+                "order": order, "stanzas": stanzas}
+
+
+    def renderTemplateFromScratch(self, template_name: str, objects: list, template_digest: str) -> dict:
+        empty = ConfWriter.renderConfFile(template_name, [])
+        rendered = [ConfWriter.renderConfFile(template_name, [obj]) for obj in objects]
+        self.rendered += len(rendered)
+
+        splits = [self.getSplit(empty, r) for r in rendered if r != empty]
+        split = min(splits) if len(splits) > 0 else len(empty)
+
+        order = []
+        stanzas = {}
+        for obj, r in zip(objects, rendered):
+            key = self.getObjectKey(obj, stanzas)
+            text = self.getStanza(empty, r, split)
+            if text is None:
+                raise(Exception(f"Template {template_name} can not be rendered incrementally - run generate without --incremental"))
+            order.append(key)
+            stanzas[key] = {"fingerprint": self.getObjectFingerprint(obj, template_digest), "text": text}
+
+        return {"digest": template_digest, "split": split, "prefix": empty[:split], "suffix": empty[split:],
+                "order": order, "stanzas": stanzas}
+
+
+    @staticmethod
+    def getSplit(empty: str, rendered: str) -> int:
+        return len(os.path.commonprefix([empty, rendered]))
+
+
+    @staticmethod
+    def getStanza(empty: str, rendered: str, split: int) -> Union[str, None]:
+        if rendered == empty:
+            # e.g. a detection whose type is filtered out by the template
+            return ""
+        prefix = empty[:split]
+        suffix = empty[split:]
+        if len(rendered) < len(empty) or not rendered.startswith(prefix) or not rendered.endswith(suffix):
+            return None
+        return rendered[len(prefix):len(rendered) - len(suffix)]
+
+
+    @staticmethod
+    def getObjectKey(obj, stanzas: dict) -> str:
+        name = getattr(obj, "name", str(obj))
+        key = name
+        occurrence = 1
+        while key in stanzas:
+            occurrence += 1
+            key = f"{name}#{occurrence}"
+        return key
+
+
+    @staticmethod
+    def getObjectFingerprint(obj, template_digest: str) -> str:
+        if hasattr(obj, "json"):
+            serialized = obj.json(sort_keys=True)
+        else:
+            serialized = repr(obj)
+        return hashlib.sha256((template_digest + serialized).encode('utf-8')).hexdigest()
@@ -1,33 +1,33 @@
 import os
 
-from jinja2 import Environment, FileSystemLoader
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
 
 
 class JinjaWriter:
 
     @staticmethod
-    def writeObjectsList(template_name : str, output_path : str, objects : list) -> None:
-
-        j2_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')), 
-            trim_blocks=False)
-
-        template = j2_env.get_template(template_name)
+    def writeObjectsList(template_name : str, output_path : str, objects : list) -> bool:
+        template = TemplateRegistry.get_template(template_name, trim_blocks=False)
         output = template.render(objects=objects)
-        with open(output_path, 'w') as f:
-            output = output.encode('ascii', 'ignore').decode('ascii')
-            f.write(output)
+        return JinjaWriter.writeIfChanged(output_path, output)
 
 
     @staticmethod
-    def writeObject(template_name : str, output_path : str, object : dict) -> None:
+    def writeObject(template_name : str, output_path : str, object : dict) -> bool:
+        template = TemplateRegistry.get_template(template_name, trim_blocks=False)
+        output = template.render(object=object)
+        return JinjaWriter.writeIfChanged(output_path, output)
 
-        j2_env = Environment(
-            loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')), 
-            trim_blocks=False)
 
-        template = j2_env.get_template(template_name)
-        output = template.render(object=object)
+    @staticmethod
+    def writeIfChanged(output_path : str, output : str) -> bool:
+        # A file that already has exactly this content is not rewritten, so its mtime
+        # only changes when its content does.  Returns whether the file was written.
+        output = output.encode('ascii', 'ignore')
+        if os.path.isfile(output_path) and os.path.getsize(output_path) == len(output):
+            with open(output_path, 'rb') as f:
+                if f.read() == output:
+                    return False
         with open(output_path, 'w') as f:
-            output = output.encode('ascii', 'ignore').decode('ascii')
-            f.write(output)
\ No newline at end of file
+            f.write(output.decode('ascii'))
+        return True
\ No newline at end of file
@@ -1,10 +1,131 @@
+import hashlib
 import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Union
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.yml_writer import YmlWriter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class JsonWriter():
 
     @staticmethod
     def writeJsonObject(file_path : str, obj) -> None:
+        # Renamed over file_path once written, as YmlWriter does
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as outfile:
+                json.dump(obj, outfile, ensure_ascii=False)
+            os.chmod(temp_path, 0o666 & ~YmlWriter.umask())
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+    @staticmethod
+    def dumps(obj, compact: bool = False) -> bytes:
+        # compact output uses orjson when it is installed.  Otherwise the formatting is
+        # the one json.dump(obj, ensure_ascii=False) has always produced.
+        if compact and orjson is not None:
+            return orjson.dumps(obj)
+        if compact:
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+
+class JsonArrayWriter():
+    # Writes {"<key>": [object, object, ...]} one object at a time, so the export never
+    # holds more than one serialized object in memory.  Optionally every object is also
+    # written as one line of <key>.ndjson and/or as its own file <key>/<id>.json.
+    # <key>.index.json then maps each object id (or name, for types without ids) to its
+    # byte offset and length in the NDJSON file and to its shard, so consumers can seek
+    # to or fetch a single object instead of loading the whole document.
+    output_path: str
+    key: str
+    compact: bool
+    document: object
+    ndjson: Union[object, None]
+    shards: bool
+    index: dict
+    # The names of the shards written so far
+    shard_names: set[str]
+    count: int
+
+    def __init__(self, output_path: str, file_name: str, key: str, compact: bool = False, ndjson: bool = False, shards: bool = False):
+        self.output_path = output_path
+        self.key = key
+        self.compact = compact
+        self.shards = shards
+        self.index = {}
+        self.shard_names = set()
+        self.count = 0
+        self.document = open(os.path.join(output_path, file_name), 'wb')
+        self.document.write(b'{' + JsonWriter.dumps(key, compact) + (b':[' if compact else b': ['))
+        self.ndjson = open(os.path.join(output_path, key + '.ndjson'), 'wb') if ndjson else None
+        if shards:
+            # Shards of objects that no longer exist must not linger
+            shutil.rmtree(os.path.join(output_path, key), ignore_errors=True)
+            os.makedirs(os.path.join(output_path, key))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def write(self, obj: dict) -> None:
+        object_key = str(obj.get('id') or obj.get('name'))
+        if (self.ndjson is not None or self.shards) and object_key in self.index:
+            raise(ValueError(f"Two {self.key} objects with the id or name [{object_key}], the index can only point to one of them"))
+        if self.count > 0:
+            self.document.write(b',' if self.compact else b', ')
+        self.document.write(JsonWriter.dumps(obj, self.compact))
+        self.count += 1
+
+        if self.ndjson is None and not self.shards:
+            return
+        entry = {}
+        if self.ndjson is not None:
+            line = JsonWriter.dumps(obj, compact=True)
+            entry['offset'] = self.ndjson.tell()
+            entry['length'] = len(line)
+            self.ndjson.write(line + b'\n')
+        if self.shards:
+            shard = os.path.join(self.key, self.getShardName(object_key) + '.json')
+            with open(os.path.join(self.output_path, shard), 'wb') as f:
+                f.write(JsonWriter.dumps(obj, compact=True))
+            entry['shard'] = shard.replace(os.sep, '/')
+        self.index[object_key] = entry
+
+
+    def getShardName(self, object_key: str) -> str:
+        # Keys that only differ in case or punctuation (Foo.Bar and foo_bar) would share a
+        # file name, so every key after the first gets a hash of the key appended
+        shard_name = re.sub(r'[^a-z0-9_\-]', '_', object_key.lower())
+        if shard_name in self.shard_names:
+            shard_name += '_' + hashlib.sha256(object_key.encode('utf-8')).hexdigest()[:8]
+        self.shard_names.add(shard_name)
+        return shard_name
+
 
-        with open(file_path, 'w') as outfile:
-            json.dump(obj, outfile, ensure_ascii=False)
\ No newline at end of file
+    def close(self) -> None:
+        self.document.write(b']}')
+        self.document.close()
+        if self.ndjson is not None:
+            self.ndjson.close()
+        if self.ndjson is not None or self.shards:
+            with open(os.path.join(self.output_path, self.key + '.index.json'), 'wb') as f:
+                f.write(JsonWriter.dumps({self.key: self.index}, compact=True))
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+from typing import Union
+
+from bin.contentctl_project.contentctl_core.application.adapter.adapter import Adapter
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_graph import ContentGraph
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter
+from bin.contentctl_project.contentctl_infrastructure.builder.content_bundle import CONTENT_BUNDLE_FILENAME, CONTENT_BUNDLE_VERSION, CONTENT_BUNDLE_SCHEMA, CONTENT_BUNDLE_INDEXES
+
+
+class ObjToBundleAdapter(Adapter):
+    # Writes all of the content into one SQLite file, read with ContentBundle.  Every
+    # object is stored once as compact JSON.  Content a detection embeds (its macros,
+    # lookups, baselines, deployment and playbooks) is stored as a reference to the
+    # object of that type instead; the references are the edges of the ContentGraph.
+    # Stories keep detection_names, but not the detection summaries the story builder
+    # adds for docgen: get_referencing returns the full detections.
+    #
+    # The bundle is written to a temporary file that replaces the previous bundle in
+    # finalize, so readers never see a partially written bundle.
+    connection: Union[sqlite3.Connection, None]
+
+    def __init__(self):
+        self.connection = None
+
+
+    def getConnection(self, output_path: str) -> sqlite3.Connection:
+        if self.connection is None:
+            os.makedirs(output_path, exist_ok=True)
+            temporary_file = os.path.join(output_path, CONTENT_BUNDLE_FILENAME + ".tmp")
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            self.connection = sqlite3.connect(temporary_file)
+            self.connection.execute("PRAGMA journal_mode=OFF")
+            self.connection.execute("PRAGMA synchronous=OFF")
+            for statement in CONTENT_BUNDLE_SCHEMA:
+                self.connection.execute(statement)
+        return self.connection
+
+
+    def writeObjects(self, objects: list, output_path: str, type: SecurityContentType = None) -> None:
+        if type == SecurityContentType.detections:
+            for detection in objects:
+                self.writeObject(output_path, type, detection, detection.dict(exclude_none=True,
+                    exclude =
+                    {
+                        "playbooks": True,
+                        "baselines": True,
+                        "macros": True,
+                        "lookups": True,
+                        "deployment": True,
+                        "test": True
+                    }
+                ))
+
+        elif type == SecurityContentType.stories:
+            for story in objects:
+                self.writeObject(output_path, type, story, story.dict(exclude_none=True,
+                    exclude =
+                    {
+                        "detections": True,
+                        "investigations": True
+                    }
+                ))
+
+        elif type == SecurityContentType.baselines:
+            for baseline in objects:
+                self.writeObject(output_path, type, baseline, baseline.dict(exclude_none=True,
+                    exclude =
+                    {
+                        "deployment": True
+                    }
+                ))
+
+        elif type == SecurityContentType.investigations:
+            for investigation in objects:
+                self.writeObject(output_path, type, investigation, investigation.dict(exclude_none=True))
+
+        elif type in [SecurityContentType.lookups, SecurityContentType.macros, SecurityContentType.deployments, SecurityContentType.playbooks]:
+            for obj in objects:
+                self.writeObject(output_path, type, obj, obj.dict(exclude_none=True))
+
+
+    def writeObject(self, output_path: str, type: SecurityContentType, obj, body: dict) -> None:
+        connection = self.getConnection(output_path)
+        # Objects of the same type and name replace each other, as they do in the conf files
+        connection.execute("INSERT OR REPLACE INTO objects (type, name, id, body) VALUES (?, ?, ?, ?)",
+            (type.name, obj.name, getattr(obj, 'id', None), JsonWriter.dumps(body, compact=True)))
+        connection.execute("DELETE FROM refs WHERE source_type = ? AND source_name = ?", (type.name, obj.name))
+        connection.executemany("INSERT OR IGNORE INTO refs (source_type, source_name, target_type, target_name) VALUES (?, ?, ?, ?)",
+            [(type.name, obj.name, target_type.name, target_name) for target_type, target_names in ContentGraph.get_references(type, obj).items() for target_name in target_names])
+
+
+    def finalize(self, output_path: str) -> None:
+        connection = self.getConnection(output_path)
+        for statement in CONTENT_BUNDLE_INDEXES:
+            connection.execute(statement)
+        counts = dict(connection.execute("SELECT type, COUNT(*) FROM objects GROUP BY type").fetchall())
+        connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+            [("format_version", CONTENT_BUNDLE_VERSION)] + [(f"count_{type}", str(count)) for type, count in sorted(counts.items())])
+        connection.commit()
+        connection.execute("VACUUM")
+        connection.close()
+        self.connection = None
+        os.replace(os.path.join(output_path, CONTENT_BUNDLE_FILENAME + ".tmp"), os.path.join(output_path, CONTENT_BUNDLE_FILENAME))
+        print(f"Wrote {sum(counts.values())} objects to {os.path.join(output_path, CONTENT_BUNDLE_FILENAME)}")
@@ -6,55 +6,68 @@ from typing import Union
 
 from bin.contentctl_project.contentctl_core.application.adapter.adapter import Adapter
 from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.incremental_conf_writer import IncrementalConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.streaming_conf_writer import StreamingConfWriter
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 
 
 class ObjToConfAdapter(Adapter):
     input_path: str
+    incremental: bool
+    conf_writer: Union[IncrementalConfWriter, StreamingConfWriter]
 
-    def __init__(self, input_path: str):
+    def __init__(self, input_path: str, incremental: bool = False):
         self.input_path = input_path
+        self.incremental = incremental
+        self.conf_writer = StreamingConfWriter()
 
     def writeHeaders(self, output_folder: str) -> None:
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/analyticstories.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/savedsearches.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/collections.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/es_investigations.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/macros.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/transforms.conf'))
-        ConfWriter.writeConfFileHeader(os.path.join(output_folder, 'default/workflow_actions.conf'))
+        if self.incremental:
+            self.conf_writer = IncrementalConfWriter(self.input_path, output_folder)
+        else:
+            self.conf_writer = StreamingConfWriter()
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/analyticstories.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/savedsearches.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/collections.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/es_investigations.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/macros.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/transforms.conf'))
+        self.conf_writer.writeConfFileHeader(os.path.join(output_folder, 'default/workflow_actions.conf'))
 
 
     def writeObjects(self, objects: list, output_path: str, type: SecurityContentType = None) -> None:
         if type == SecurityContentType.detections:
-            ConfWriter.writeConfFile('savedsearches_detections.j2', 
+            if self.incremental:
+                self.conf_writer.addDetectionDependencies(objects)
+
+            self.conf_writer.writeConfFile('savedsearches_detections.j2', 
             os.path.join(output_path, 'default/savedsearches.conf'), 
             objects)
 
-            ConfWriter.writeConfFile('analyticstories_detections.j2',
+            self.conf_writer.writeConfFile('analyticstories_detections.j2',
                 os.path.join(output_path, 'default/analyticstories.conf'), 
                 objects)
 
-            ConfWriter.writeConfFile('macros_detections.j2',
+            self.conf_writer.writeConfFile('macros_detections.j2',
                 os.path.join(output_path, 'default/macros.conf'), 
                 objects)
         
         elif type == SecurityContentType.stories:
-            ConfWriter.writeConfFile('analyticstories_stories.j2',
+            self.conf_writer.writeConfFile('analyticstories_stories.j2',
                 os.path.join(output_path, 'default/analyticstories.conf'), 
                 objects)
 
         elif type == SecurityContentType.baselines:
-            ConfWriter.writeConfFile('savedsearches_baselines.j2', 
+            self.conf_writer.writeConfFile('savedsearches_baselines.j2', 
                 os.path.join(output_path, 'default/savedsearches.conf'), 
                 objects)
 
         elif type == SecurityContentType.investigations:
-            ConfWriter.writeConfFile('savedsearches_investigations.j2', 
+            self.conf_writer.writeConfFile('savedsearches_investigations.j2', 
                 os.path.join(output_path, 'default/savedsearches.conf'), 
                 objects)
             
-            ConfWriter.writeConfFile('analyticstories_investigations.j2', 
+            self.conf_writer.writeConfFile('analyticstories_investigations.j2', 
                 os.path.join(output_path, 'default/analyticstories.conf'), 
                 objects)
 
@@ -72,20 +85,20 @@ class ObjToConfAdapter(Adapter):
                         'default/data/ui/panels/', str("workbench_panel_" + response_file_name_xml)),
                         [investigation.search])
 
-            ConfWriter.writeConfFile('es_investigations_investigations.j2', 
+            self.conf_writer.writeConfFile('es_investigations_investigations.j2', 
                 os.path.join(output_path, 'default/es_investigations.conf'), 
                 workbench_panels)
 
-            ConfWriter.writeConfFile('workflow_actions.j2', 
+            self.conf_writer.writeConfFile('workflow_actions.j2', 
                 os.path.join(output_path, 'default/workflow_actions.conf'), 
                 workbench_panels)   
 
         elif type == SecurityContentType.lookups:
-            ConfWriter.writeConfFile('collections.j2', 
+            self.conf_writer.writeConfFile('collections.j2', 
                 os.path.join(output_path, 'default/collections.conf'), 
                 objects)
 
-            ConfWriter.writeConfFile('transforms.j2', 
+            self.conf_writer.writeConfFile('transforms.j2', 
                 os.path.join(output_path, 'default/transforms.conf'), 
                 objects)
 
@@ -99,7 +112,10 @@ class ObjToConfAdapter(Adapter):
                     shutil.copy(file, os.path.join(output_path, 'lookups'))
 
         elif type == SecurityContentType.macros:
-            ConfWriter.writeConfFile('macros.j2', 
+            self.conf_writer.writeConfFile('macros.j2', 
                 os.path.join(output_path, 'default/macros.conf'), 
                 objects)
 
+
+    def finalize(self, output_path: str) -> None:
+        self.conf_writer.finalize()
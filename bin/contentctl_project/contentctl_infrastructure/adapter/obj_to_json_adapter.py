@@ -1,19 +1,27 @@
-import os
-
-
 from bin.contentctl_project.contentctl_core.application.adapter.adapter import Adapter
-from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonArrayWriter
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 
 
 class ObjToJsonAdapter(Adapter):
+    # Every type is exported as {"<key>": [...]} in <file name>, streamed one object at a
+    # time.  compact writes that document with orjson (when installed) instead of in the
+    # json module's formatting; ndjson and shards add the per object exports described
+    # in JsonArrayWriter.
+    compact: bool
+    ndjson: bool
+    shards: bool
+
+    def __init__(self, compact: bool = False, ndjson: bool = False, shards: bool = False):
+        self.compact = compact
+        self.ndjson = ndjson
+        self.shards = shards
 
 
     def writeObjects(self, objects: list, output_path: str, type: SecurityContentType = None) -> None:
         if type == SecurityContentType.detections:
-            obj_array = []
-            for detection in objects:
-                obj_array.append(detection.dict(exclude_none=True, 
+            self.writeJsonArray(output_path, 'detections.json', 'detections',
+                (detection.dict(exclude_none=True, 
                     exclude =
                     {
                         "deprecated": True,
@@ -24,61 +32,48 @@ class ObjToJsonAdapter(Adapter):
                         "baselines": True,
                         "mappings": True,
                         "test": True,
-                        "deployment": True
+                        "deployment": True,
+                        "search_cost": True,
+                        "search_warnings": True
                     }
-                ))
-            
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'detections.json'), {'detections': obj_array })
+                ) for detection in objects))
         
         elif type == SecurityContentType.stories:
-            obj_array = []
-            for story in objects:
-                obj_array.append(story.dict(exclude_none=True,
+            self.writeJsonArray(output_path, 'stories.json', 'stories',
+                (story.dict(exclude_none=True,
                     exclude =
                     {
                         "investigations": True
                     }
-                ))
-
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'stories.json'), {'stories': obj_array })
+                ) for story in objects))
 
         elif type == SecurityContentType.baselines:
-            obj_array = []
-            for baseline in objects:
-                obj_array.append(baseline.dict(
+            self.writeJsonArray(output_path, 'baselines.json', 'baselines',
+                (baseline.dict(
                     exclude =
                     {
                         "deployment": True
                     }
-                ))
-
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'baselines.json'), {'baselines': obj_array })
+                ) for baseline in objects))
 
         elif type == SecurityContentType.investigations:
-            obj_array = []
-            for investigation in objects:
-                obj_array.append(investigation.dict(exclude_none=True))
-
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'response_tasks.json'), {'response_tasks': obj_array })
+            self.writeJsonArray(output_path, 'response_tasks.json', 'response_tasks',
+                (investigation.dict(exclude_none=True) for investigation in objects))
         
         elif type == SecurityContentType.lookups:
-            obj_array = []
-            for lookup in objects:
-                obj_array.append(lookup.dict(exclude_none=True))
-
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'lookups.json'), {'lookups': obj_array })
+            self.writeJsonArray(output_path, 'lookups.json', 'lookups',
+                (lookup.dict(exclude_none=True) for lookup in objects))
 
         elif type == SecurityContentType.macros:      
-            obj_array = []
-            for macro in objects:
-                obj_array.append(macro.dict(exclude_none=True))
-
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'macros.json'), {'macros': obj_array })
+            self.writeJsonArray(output_path, 'macros.json', 'macros',
+                (macro.dict(exclude_none=True) for macro in objects))
 
         elif type == SecurityContentType.deployments:
-            obj_array = []
-            for deployment in objects:
-                obj_array.append(deployment.dict(exclude_none=True))
+            self.writeJsonArray(output_path, 'deployments.json', 'deployments',
+                (deployment.dict(exclude_none=True) for deployment in objects))
 
-            JsonWriter.writeJsonObject(os.path.join(output_path, 'deployments.json'), {'deployments': obj_array })
 
+    def writeJsonArray(self, output_path: str, file_name: str, key: str, objects) -> None:
+        with JsonArrayWriter(output_path, file_name, key, compact=self.compact, ndjson=self.ndjson, shards=self.shards) as writer:
+            for obj in objects:
+                writer.write(obj)
@@ -1,18 +1,42 @@
 import os
 import asyncio
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Union
 from bin.contentctl_project.contentctl_core.application.adapter.adapter import Adapter
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 from bin.contentctl_project.contentctl_infrastructure.adapter.jinja_writer import JinjaWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
+
+
+def initialize_worker(bytecode_cache_directory: Union[str, None]) -> None:
+    # Workers load the templates the parent process already compiled into the bytecode cache
+    if bytecode_cache_directory is not None:
+        TemplateRegistry.initialize(bytecode_cache_directory)
+
+
+def write_markdown_batch(batch: list[tuple]) -> int:
+    written = 0
+    for template_name, output_file, obj in batch:
+        if JinjaWriter.writeObject(template_name, output_file, obj):
+            written += 1
+    return written
 
 
 class ObjToMdAdapter(Adapter):
     index = 0
     files_to_write = 0
-    
+    workers: int
+    written: int
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.written = 0
+
     def writeObjects(self, objects: list, output_path: str, type: SecurityContentType = None) -> None:
         self.files_to_write = sum([len(obj) for obj in objects])
         self.index = 0
+        self.written = 0
         progress_percent = ((self.index+1)/self.files_to_write) * 100
         if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
             print(f"\r{'Docgen Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
@@ -34,8 +58,8 @@ class ObjToMdAdapter(Adapter):
 
         JinjaWriter.writeObjectsList('doc_navigation.j2', os.path.join(output_path, '_data/navigation.yml'),
             {
-                'attack_tactics': sorted(list(attack_tactics)), 
-                'datamodels': sorted(list(datamodels)), 
+                'attack_tactics': sorted(list(attack_tactics)),
+                'datamodels': sorted(list(datamodels)),
                 'categories': sorted(list(categories))
             }
         )
@@ -43,17 +67,20 @@ class ObjToMdAdapter(Adapter):
         self.writeNavigationPageObjects(sorted(list(datamodels)), output_path)
         self.writeNavigationPageObjects(sorted(list(attack_tactics)), output_path)
         self.writeNavigationPageObjects(sorted(list(categories)), output_path)
-        
-        JinjaWriter.writeObjectsList('doc_story_page.j2', os.path.join(output_path, '_pages/stories.md'), sorted(objects[0], key=lambda x: x.name))
-        self.writeObjectsMd(objects[0], os.path.join(output_path, '_stories'), 'doc_stories.j2')
 
+        JinjaWriter.writeObjectsList('doc_story_page.j2', os.path.join(output_path, '_pages/stories.md'), sorted(objects[0], key=lambda x: x.name))
         JinjaWriter.writeObjectsList('doc_detection_page.j2', os.path.join(output_path, '_pages/detections.md'), sorted(objects[1], key=lambda x: x.name))
-        self.writeDetectionsMd(objects[1], os.path.join(output_path, '_posts'), 'doc_detections.j2')
-
         JinjaWriter.writeObjectsList('doc_playbooks_page.j2', os.path.join(output_path, '_pages/paybooks.md'), sorted(objects[2], key=lambda x: x.name))
-        self.writeObjectsMd(objects[2], os.path.join(output_path, '_playbooks'), 'doc_playbooks.j2')
-        
-        print("Done!")
+
+        pages = self.getObjectsMd(objects[0], os.path.join(output_path, '_stories'), 'doc_stories.j2')
+        pages += self.getDetectionsMd(objects[1], os.path.join(output_path, '_posts'), 'doc_detections.j2')
+        pages += self.getObjectsMd(objects[2], os.path.join(output_path, '_playbooks'), 'doc_playbooks.j2')
+        if self.workers > 1:
+            self.writePagesParallel(pages)
+        else:
+            self.writePages(pages)
+
+        print(f"Done! [{self.written}] of [{self.files_to_write}] page(s) written, unchanged pages were skipped")
     def writeNavigationPageObjects(self, objects: list, output_path: str) -> None:
         for obj in objects:
             JinjaWriter.writeObject('doc_navigation_pages.j2', os.path.join(output_path, '_pages', obj.lower().replace(' ', '_') + '.md'),
@@ -62,20 +89,34 @@ class ObjToMdAdapter(Adapter):
                 }
             )
 
-    def writeObjectsMd(self, objects, output_path: str, template_name: str) -> None:
-        for obj in objects:
-            progress_percent = ((self.index+1)/self.files_to_write) * 100
-            self.index+=1
-            if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
-                print(f"\r{'Docgen Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
+    def getObjectsMd(self, objects, output_path: str, template_name: str) -> list[tuple]:
+        return [(template_name, os.path.join(output_path, obj.name.lower().replace(' ', '_') + '.md'), obj) for obj in objects]
 
-            JinjaWriter.writeObject(template_name, os.path.join(output_path, obj.name.lower().replace(' ', '_') + '.md'), obj)
+    def getDetectionsMd(self, objects, output_path: str, template_name: str) -> list[tuple]:
+        return [(template_name, os.path.join(output_path, obj.date + '-' + obj.name.lower().replace(' ', '_') + '.md'), obj) for obj in objects]
 
-    def writeDetectionsMd(self, objects, output_path: str, template_name: str) -> None:
-        for obj in objects:
-            progress_percent = ((self.index+1)/self.files_to_write) * 100
-            self.index+=1
-            if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
-                print(f"\r{'Docgen Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
+    def updateProgress(self, count: int) -> None:
+        self.index += count
+        progress_percent = (self.index/self.files_to_write) * 100
+        if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
+            print(f"\r{'Docgen Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
+
+    def writePages(self, pages: list[tuple]) -> None:
+        for page in pages:
+            self.updateProgress(1)
+            self.written += write_markdown_batch([page])
 
-            JinjaWriter.writeObject(template_name, os.path.join(output_path, obj.date + '-' + obj.name.lower().replace(' ', '_') + '.md'), obj)
\ No newline at end of file
+    def writePagesParallel(self, pages: list[tuple]) -> None:
+        # When two objects map to the same file, the last one wins, as it does when the
+        # pages are written one after the other
+        pages = list({output_file: (template_name, output_file, obj) for template_name, output_file, obj in pages}.values())
+        batch_size = max(1, len(pages) // (self.workers * 4))
+        batches = [pages[start:start+batch_size] for start in range(0, len(pages), batch_size)]
+        # Compile once here so that the workers load the templates from the bytecode cache
+        TemplateRegistry.precompile()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=initialize_worker,
+                                 initargs=(TemplateRegistry.bytecode_cache_directory,)) as executor:
+            futures = {executor.submit(write_markdown_batch, batch): len(batch) for batch in batches}
+            for future in as_completed(futures):
+                self.written += future.result()
+                self.updateProgress(futures[future])
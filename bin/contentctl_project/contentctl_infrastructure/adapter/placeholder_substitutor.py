@@ -0,0 +1,101 @@
+import functools
+
+
+class PlaceholderSubstitutor():
+    # Replaces %field% placeholders (e.g. in notable rule titles) with the fields of a
+    # detection, or of its tags when the detection has no such field.
+    #
+    # This used to be a str.replace for every attribute in dir(detection) and
+    # dir(detection.tags), for every string filtered.  Now each string is tokenized
+    # once, and only the fields it references are looked up.  The old behaviour is
+    # kept by substitute_sequentially, which is still used in the rare cases where
+    # the order of the replacements could change the result (see substitute).
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def tokenize(string: str) -> tuple:
+        # (start, end, name) for every %name% between two consecutive %
+        percents = [index for index, character in enumerate(string) if character == '%']
+        return tuple((start, end + 1, string[start+1:end]) for start, end in zip(percents, percents[1:]) if end > start + 1)
+
+
+    @staticmethod
+    @functools.cache
+    def type_attributes(object_type: type) -> frozenset:
+        return frozenset(dir(object_type))
+
+
+    @staticmethod
+    def is_field(object, name: str) -> bool:
+        # The same test the dir() scan applied to every attribute
+        if name.startswith('__') or name == "_abc_impl":
+            return False
+        if name not in getattr(object, '__dict__', {}) and name not in PlaceholderSubstitutor.type_attributes(type(object)):
+            return False
+        return not callable(getattr(object, name)) and hasattr(object, name)
+
+
+    @staticmethod
+    def resolve(object, tags, name: str):
+        for source in [object, tags]:
+            if PlaceholderSubstitutor.is_field(source, name):
+                return str(getattr(source, name))
+        return None
+
+
+    @staticmethod
+    def substitute(string: str, object) -> str:
+        tags = object.tags
+        tokens = PlaceholderSubstitutor.tokenize(string)
+        if len(tokens) == 0:
+            return string
+
+        matches = []
+        for start, end, name in tokens:
+            value = PlaceholderSubstitutor.resolve(object, tags, name)
+            if value is None:
+                continue
+            if '%' in value or (len(matches) > 0 and matches[-1][1] > start):
+                # A value that brings its own placeholders, or two placeholders sharing a
+                # '%': the result depends on the order of the replacements
+                return PlaceholderSubstitutor.substitute_sequentially(string, object)
+            matches.append((start, end, value))
+
+        if len(matches) == 0:
+            return string
+        parts = []
+        position = 0
+        for start, end, value in matches:
+            parts.append(string[position:start])
+            parts.append(value)
+            position = end
+        parts.append(string[position:])
+        result = "".join(parts)
+
+        # Removing placeholders may join the text around them into a new placeholder,
+        # which the replacements one attribute at a time may or may not have resolved
+        if any(PlaceholderSubstitutor.resolve(object, tags, name) is not None
+               for _, _, name in PlaceholderSubstitutor.tokenize(result)):
+            return PlaceholderSubstitutor.substitute_sequentially(string, object)
+        return result
+
+
+    @staticmethod
+    def substitute_sequentially(string: str, object) -> str:
+        customized_string = string
+
+        for key in dir(object):
+            if type(key) is not str:
+                key = key.decode()
+            if not key.startswith('__') and not key == "_abc_impl" and not callable(getattr(object, key)):
+                if hasattr(object, key):
+                    customized_string = customized_string.replace("%" + key + "%", str(getattr(object, key)))
+
+        for key in dir(object.tags):
+            if type(key) is not str:
+                key = key.decode()
+            if not key.startswith('__') and not key == "_abc_impl" and not callable(getattr(object.tags, key)):
+                if hasattr(object.tags, key):
+                    customized_string = customized_string.replace("%" + key + "%", str(getattr(object.tags, key)))
+
+        return customized_string
@@ -0,0 +1,41 @@
+import io
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter, open_conf_file
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
+
+
+class StreamingConfWriter():
+    # Keeps one buffered handle open per conf file for the whole run, instead of reopening
+    # the file for every template, and streams each template into it with
+    # Template.generate(), so the rendered conf file is never held in memory as a whole.
+    # Handles are flushed after every template and closed by finalize().
+    handles: dict[str, io.TextIOWrapper]
+
+    def __init__(self):
+        self.handles = {}
+
+
+    def getHandle(self, output_path: str, mode: str = 'a') -> io.TextIOWrapper:
+        if output_path not in self.handles:
+            self.handles[output_path] = open_conf_file(output_path, mode)
+        return self.handles[output_path]
+
+
+    def writeConfFileHeader(self, output_path: str) -> None:
+        if output_path in self.handles:
+            self.handles.pop(output_path).close()
+        handle = self.getHandle(output_path, 'w')
+        handle.write(ConfWriter.renderConfFileHeader())
+        handle.flush()
+
+
+    def writeConfFile(self, template_name: str, output_path: str, objects: list) -> None:
+        handle = self.getHandle(output_path)
+        handle.writelines(TemplateRegistry.get_template(template_name).generate(objects=objects))
+        handle.flush()
+
+
+    def finalize(self) -> None:
+        for handle in self.handles.values():
+            handle.close()
+        self.handles = {}
@@ -0,0 +1,65 @@
+import os
+from typing import Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.placeholder_substitutor import PlaceholderSubstitutor
+
+TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'templates')
+
+
+def custom_jinja2_enrichment_filter(string, object):
+    return PlaceholderSubstitutor.substitute(string, object)
+
+
+class TemplateRegistry():
+    # Every writer renders through one jinja2 Environment per process (one for each
+    # trim_blocks setting), so a template is compiled once, not once per object written.
+    # After initialize(), compiled templates are also kept on disk by a
+    # FileSystemBytecodeCache, so later runs skip compilation entirely. Nothing is
+    # compiled or written until a template is first requested.
+    environments: dict[bool, Environment] = {}
+    bytecode_cache_directory: Union[str, None] = None
+
+    @staticmethod
+    def initialize(bytecode_cache_directory: str) -> None:
+        TemplateRegistry.bytecode_cache_directory = bytecode_cache_directory
+        TemplateRegistry.environments = {}
+
+
+    @staticmethod
+    def precompile() -> None:
+        for trim_blocks in [True, False]:
+            environment = TemplateRegistry.get_environment(trim_blocks)
+            for template_name in environment.list_templates(extensions=['j2']):
+                environment.get_template(template_name)
+
+
+    @staticmethod
+    def get_environment(trim_blocks: bool = True) -> Environment:
+        if trim_blocks not in TemplateRegistry.environments:
+            bytecode_cache = None
+            if TemplateRegistry.bytecode_cache_directory is not None:
+                # The bytecode cache key is only the template name and source, so each
+                # environment needs its own directory or they would share compiled code
+                directory = os.path.join(TemplateRegistry.bytecode_cache_directory, f"trim_blocks_{str(trim_blocks).lower()}")
+                os.makedirs(directory, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(directory)
+            environment = Environment(
+                loader=FileSystemLoader(TEMPLATE_DIRECTORY),
+                trim_blocks=trim_blocks,
+                bytecode_cache=bytecode_cache)
+            environment.filters['custom_jinja2_enrichment_filter'] = custom_jinja2_enrichment_filter
+            TemplateRegistry.environments[trim_blocks] = environment
+        return TemplateRegistry.environments[trim_blocks]
+
+
+    @staticmethod
+    def get_template(template_name: str, trim_blocks: bool = True) -> Template:
+        return TemplateRegistry.get_environment(trim_blocks).get_template(template_name)
+
+
+    @staticmethod
+    def get_template_source(template_name: str) -> str:
+        with open(os.path.join(TEMPLATE_DIRECTORY, template_name), 'r') as f:
+            return f.read()
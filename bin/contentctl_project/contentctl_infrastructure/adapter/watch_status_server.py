@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union
+from urllib.parse import urlparse, parse_qs
+
+
+class WatchStatusServer():
+    # A local HTTP endpoint for editor integrations of `contentctl watch`:
+    #
+    #   GET  /status                 revision, number of files with errors and their errors
+    #   GET  /errors?file=<path>     the errors of one file ([] when it is valid)
+    #   POST /validate               {"files": [<path>, ...]}: validate these files now,
+    #                                e.g. on save, and return their errors
+    #
+    # Paths are absolute, or relative to the content folder.  The server only listens on
+    # the given host, 127.0.0.1 by default, and runs in a daemon thread.
+    host: str
+    port: int
+    server: Union[ThreadingHTTPServer, None]
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.server = None
+
+
+    def start(self, watch) -> None:
+        class Handler(BaseHTTPRequestHandler):
+
+            def send_json(self, status: int, body) -> None:
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/status':
+                    self.send_json(200, watch.getStatus())
+                elif url.path == '/errors':
+                    files = parse_qs(url.query).get('file', [])
+                    if len(files) != 1:
+                        self.send_json(400, {'error': 'expected one file parameter'})
+                    else:
+                        self.send_json(200, {'file': files[0], 'errors': watch.getErrors(files[0])})
+                else:
+                    self.send_json(404, {'error': f'unknown path {url.path}'})
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/validate':
+                    self.send_json(404, {'error': f'unknown path {self.path}'})
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                    files = body['files']
+                except (ValueError, KeyError, TypeError):
+                    self.send_json(400, {'error': 'expected {"files": [...]}'})
+                    return
+                self.send_json(200, watch.revalidate(files))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Serving validation status on http://{self.host}:{self.port}/status")
+
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
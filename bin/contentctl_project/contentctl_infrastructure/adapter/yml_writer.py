@@ -1,3 +1,5 @@
+import os
+import tempfile
 
 import yaml
 
@@ -6,6 +8,23 @@ class YmlWriter:
 
     @staticmethod
     def writeYmlFile(file_path : str, obj : dict) -> None:
+        # Written to a temporary file next to file_path and renamed over it, so an
+        # interrupted run never leaves a truncated file behind
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as outfile:
+                yaml.dump(obj, outfile, default_flow_style=False, sort_keys=False)
+            os.chmod(temp_path, 0o666 & ~YmlWriter.umask())
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
 
-        with open(file_path, 'w') as outfile:
-            yaml.dump(obj, outfile, default_flow_style=False, sort_keys=False)
\ No newline at end of file
+
+    @staticmethod
+    def umask() -> int:
+        # mkstemp creates files readable by their owner only, open() would have applied the umask
+        umask = os.umask(0)
+        os.umask(umask)
+        return umask
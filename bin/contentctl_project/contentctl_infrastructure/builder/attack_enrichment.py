@@ -1,92 +1,280 @@
-
 import csv
 import os
+import pickle
 from posixpath import split
-from typing import Optional
+from typing import Optional, Union
 import sys
 from attackcti import attack_client
+from attackcti.attack_api import ATTACK_STIX_COLLECTIONS, ENTERPRISE_ATTACK
+from stix2 import Filter, TAXIICollectionSource
+from taxii2client.v20 import Collection
+from stix2.utils import format_datetime
+
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import CONTENT_CACHE_DIRECTORY
+from bin.contentctl_project.contentctl_infrastructure.builder.stix_bundle_reader import StixBundleReader
 
 import logging
 logging.getLogger('taxii2client').setLevel(logging.CRITICAL)
 
+ATTACK_LOOKUP_CACHE_FILENAME = "attack_lookup.pickle"
+
+# Bump this whenever the layout of the cached lookup changes.  A cache written
+# by a different version is ignored and the lookup is built again.
+ATTACK_LOOKUP_CACHE_VERSION = 1
+
 
 class AttackEnrichment():
 
     @classmethod
-    def get_attack_lookup(self, input_path: str, store_csv = None, force_cached_or_offline: bool = False, skip_enrichment:bool = False) -> dict:
+    def get_attack_lookup(self, input_path: str, store_csv = None, force_cached_or_offline: bool = False, skip_enrichment:bool = False, attack_bundle: Union[str, None] = None) -> dict:
         print("Getting MITRE Attack Enrichment Data. This may take some time...")
         attack_lookup = dict()
         file_path = os.path.join(input_path, "lookups", "mitre_enrichment.csv")
+        cache_path = os.path.join(input_path, CONTENT_CACHE_DIRECTORY, ATTACK_LOOKUP_CACHE_FILENAME)
 
         if skip_enrichment is True:
             print("Skipping enrichment")
             return attack_lookup
         try:
 
+            if attack_bundle is not None:
+                # A local bundle gives the same enrichment as the TAXII server without any network access
+                attack_lookup = self.read_attack_bundle(attack_bundle, cache_path)
+                if store_csv:
+                    self.write_csv(file_path, attack_lookup)
+                print("Done!")
+                return attack_lookup
+
             if force_cached_or_offline is True:
                 raise(Exception("WARNING - Using cached MITRE Attack Enrichment.  Attack Enrichment may be out of date. Only use this setting for offline environments and development purposes."))
-            print(f"\r{'Client'.rjust(23)}: [{0:3.0f}%]...", end="", flush=True)
-            lift = attack_client()
-            print(f"\r{'Client'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
-            
-            print(f"\r{'Enterprise'.rjust(23)}: [{0.0:3.0f}%]...", end="", flush=True)
-            all_enterprise = lift.get_enterprise(stix_format=False)
-            print(f"\r{'Enterprise'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
-            
-            print(f"\r{'Relationships'.rjust(23)}: [{0.0:3.0f}%]...", end="", flush=True)
-            enterprise_relationships = lift.get_enterprise_relationships()
-            print(f"\r{'Relationships'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
-            
-            print(f"\r{'Groups'.rjust(23)}: [{0:3.0f}%]...", end="", flush=True)
-            enterprise_groups = lift.get_enterprise_groups()
-            print(f"\r{'Groups'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
-            
-            for index, technique in enumerate(all_enterprise['techniques']):
-                progress_percent = ((index+1)/len(all_enterprise['techniques'])) * 100
-                if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
-                    print(f"\r\t{'MITRE Technique Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
-                apt_groups = []
-                for relationship in enterprise_relationships:
-                    if (relationship['target_ref'] == technique['id']) and relationship['source_ref'].startswith('intrusion-set'):
-                        for group in enterprise_groups:
-                            if relationship['source_ref'] == group['id']:
-                                apt_groups.append(group['name'])
-
-                tactics = []
-                if ('tactic' in technique):
-                    for tactic in technique['tactic']:
-                        tactics.append(tactic.replace('-',' ').title())
-
-                if not ('revoked' in technique):
-                    attack_lookup[technique['technique_id']] = {'technique': technique['technique'], 'tactics': tactics, 'groups': apt_groups}
+            # Only the (tiny) collection object of the enterprise collection is fetched to
+            # find out which version of ATT&CK is being served.  When the cached lookup was
+            # built from that same version, neither the client, the bundle nor the join are
+            # needed.
+            bundle_version = self.get_bundle_version(TAXIICollectionSource(Collection(ATTACK_STIX_COLLECTIONS + ENTERPRISE_ATTACK + "/")))
+            cached_lookup = self.load_cached_lookup(cache_path, bundle_version)
+            if cached_lookup is not None:
+                print(f"Using cached MITRE Attack Enrichment for ATT&CK version [{bundle_version}] from {cache_path}")
+                attack_lookup = cached_lookup
+            else:
+                print(f"\r{'Client'.rjust(23)}: [{0:3.0f}%]...", end="", flush=True)
+                lift = attack_client()
+                print(f"\r{'Client'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+
+                print(f"\r{'Techniques'.rjust(23)}: [{0.0:3.0f}%]...", end="", flush=True)
+                enterprise_techniques = lift.get_enterprise_techniques(stix_format=False)
+                print(f"\r{'Techniques'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+
+                print(f"\r{'Relationships'.rjust(23)}: [{0.0:3.0f}%]...", end="", flush=True)
+                enterprise_relationships = lift.get_enterprise_relationships()
+                print(f"\r{'Relationships'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+
+                print(f"\r{'Groups'.rjust(23)}: [{0:3.0f}%]...", end="", flush=True)
+                enterprise_groups = lift.get_enterprise_groups()
+                print(f"\r{'Groups'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+
+                attack_lookup = self.build_attack_lookup(enterprise_techniques, enterprise_relationships, enterprise_groups)
+                self.store_cached_lookup(cache_path, bundle_version, attack_lookup)
 
             if store_csv:
-                f = open(file_path, 'w')
-                writer = csv.writer(f)
-                writer.writerow(['mitre_id', 'technique', 'tactics' ,'groups'])
-                for key in attack_lookup.keys():
-                    if len(attack_lookup[key]['groups']) == 0:
-                        groups = 'no'
-                    else:
-                        groups = '|'.join(attack_lookup[key]['groups'])
-                    
-                    writer.writerow([
-                        key,
-                        attack_lookup[key]['technique'],
-                        '|'.join(attack_lookup[key]['tactics']),
-                        groups
-                    ])
-                
-                f.close()
+                self.write_csv(file_path, attack_lookup)
 
         except Exception as err:
+            # The committed csv, not the local cache, so that offline builds do not depend
+            # on what was cached on the machine running them
             print('Warning: ' + str(err))
             print('Use local copy lookups/mitre_enrichment.csv')
-            dict_from_csv = {}
-            with open(file_path, mode='r') as inp:
-                reader = csv.reader(inp)
-                attack_lookup = {rows[0]:{'technique': rows[1], 'tactics': rows[2].split('|'), 'groups': rows[3].split('|')} for rows in reader}
-            attack_lookup.pop('mitre_id')
+            attack_lookup = self.read_csv(file_path)
 
         print("Done!")
-        return attack_lookup
\ No newline at end of file
+        return attack_lookup
+
+
+    @staticmethod
+    def build_attack_lookup(techniques: list, relationships: list, groups: list) -> dict:
+        # Hash join of techniques -> 'uses' relationships -> intrusion sets.  Both indexes
+        # keep the order of the input lists, so every technique gets its groups in the
+        # same order (and with the same repeats) as a scan over relationships and groups.
+        group_names_by_id = {}
+        for group in groups:
+            group_names_by_id.setdefault(group['id'], []).append(group['name'])
+
+        group_refs_by_target = {}
+        for relationship in relationships:
+            if relationship['source_ref'].startswith('intrusion-set'):
+                group_refs_by_target.setdefault(relationship['target_ref'], []).append(relationship['source_ref'])
+
+        attack_lookup = dict()
+        for index, technique in enumerate(techniques):
+            progress_percent = ((index+1)/len(techniques)) * 100
+            if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
+                print(f"\r\t{'MITRE Technique Progress'.rjust(23)}: [{progress_percent:3.0f}%]...", end="", flush=True)
+
+            apt_groups = []
+            for group_ref in group_refs_by_target.get(technique['id'], []):
+                apt_groups.extend(group_names_by_id.get(group_ref, []))
+
+            tactics = []
+            if ('tactic' in technique):
+                for tactic in technique['tactic']:
+                    tactics.append(tactic.replace('-',' ').title())
+
+            if not ('revoked' in technique):
+                attack_lookup[technique['technique_id']] = {'technique': technique['technique'], 'tactics': tactics, 'groups': apt_groups}
+
+        return attack_lookup
+
+
+    @classmethod
+    def read_attack_bundle(self, bundle_path: str, cache_path: str) -> dict:
+        # Keeps only the handful of fields the join needs from each object, in the same
+        # shape attackcti returns them in, so the lookup matches the one built from TAXII
+        reader = StixBundleReader(bundle_path)
+        techniques = []
+        relationships = []
+        groups = []
+        collection_versions = []
+        matrix_versions = []
+
+        for stix_object in reader.objects():
+            if (sys.stdout.isatty() and sys.stdin.isatty() and sys.stderr.isatty()):
+                print(f"\r{'ATT&CK Bundle'.rjust(23)}: [{reader.progress():3.0f}%]...", end="", flush=True)
+
+            object_type = stix_object.get('type')
+            if object_type == 'x-mitre-collection':
+                collection_versions.append(self.get_collection_version(stix_object))
+                cached_lookup = self.load_cached_lookup(cache_path, max(collection_versions))
+                if cached_lookup is not None:
+                    print(f"\r{'ATT&CK Bundle'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+                    print(f"Using cached MITRE Attack Enrichment for ATT&CK version [{max(collection_versions)}]")
+                    return cached_lookup
+            elif object_type == 'x-mitre-matrix':
+                matrix_versions.append(self.get_matrix_version(stix_object))
+            elif object_type == 'attack-pattern':
+                if not self.is_revoked_or_deprecated(stix_object):
+                    techniques.append(self.translate_technique(stix_object))
+            elif object_type == 'relationship':
+                relationships.append({'source_ref': stix_object['source_ref'], 'target_ref': stix_object['target_ref']})
+            elif object_type == 'intrusion-set':
+                if not self.is_revoked_or_deprecated(stix_object):
+                    groups.append({'id': stix_object['id'], 'name': stix_object['name']})
+        print(f"\r{'ATT&CK Bundle'.rjust(23)}: [{100:3.0f}%]...Done!", end="\n", flush=True)
+
+        if len(techniques) == 0:
+            raise(Exception(f"No ATT&CK techniques found in {bundle_path}"))
+
+        attack_lookup = self.build_attack_lookup(techniques, relationships, groups)
+        if len(collection_versions) > 0:
+            self.store_cached_lookup(cache_path, max(collection_versions), attack_lookup)
+        elif len(matrix_versions) > 0:
+            self.store_cached_lookup(cache_path, max(matrix_versions), attack_lookup)
+        return attack_lookup
+
+
+    @staticmethod
+    def is_revoked_or_deprecated(stix_object: dict) -> bool:
+        # Same filter attackcti applies to techniques and groups
+        return stix_object.get('x_mitre_deprecated', False) is not False or stix_object.get('revoked', False) is not False
+
+
+    @staticmethod
+    def translate_technique(stix_object: dict) -> dict:
+        technique = {
+            'id': stix_object['id'],
+            'technique_id': stix_object['external_references'][0]['external_id'],
+            'technique': stix_object['name']
+        }
+        if 'kill_chain_phases' in stix_object:
+            technique['tactic'] = [phase['phase_name'] for phase in stix_object['kill_chain_phases']]
+        return technique
+
+
+    @classmethod
+    def get_bundle_version(self, enterprise_source: TAXIICollectionSource) -> str:
+        collections = enterprise_source.query([Filter("type", "=", "x-mitre-collection")])
+        if len(collections) > 0:
+            return max(self.get_collection_version(collection) for collection in collections)
+
+        # Older releases do not ship a collection object, but the matrix is updated with every release
+        matrices = enterprise_source.query([Filter("type", "=", "x-mitre-matrix")])
+        if len(matrices) == 0:
+            raise(Exception("Unable to determine the version of the ATT&CK Enterprise bundle"))
+        return max(self.get_matrix_version(matrix) for matrix in matrices)
+
+
+    @staticmethod
+    def get_collection_version(collection) -> str:
+        # collection is either a stix2 object (TAXII) or a plain dict (local bundle)
+        modified = collection['modified']
+        if not isinstance(modified, str):
+            modified = format_datetime(modified)
+        return f"{collection.get('x_mitre_version', '')}:{modified}"
+
+
+    @staticmethod
+    def get_matrix_version(matrix) -> str:
+        modified = matrix['modified']
+        if not isinstance(modified, str):
+            modified = format_datetime(modified)
+        return f"matrix:{modified}"
+
+
+    @staticmethod
+    def load_cached_lookup(cache_path: str, bundle_version: str) -> Union[dict, None]:
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except Exception as e:
+            print(f"Failed to read the cached MITRE Attack Enrichment at {cache_path}: {str(e)}")
+            return None
+
+        if cache.get("cache_version") != ATTACK_LOOKUP_CACHE_VERSION:
+            return None
+        if cache.get("bundle_version") != bundle_version:
+            return None
+        return cache["attack_lookup"]
+
+
+    @staticmethod
+    def store_cached_lookup(cache_path: str, bundle_version: str, attack_lookup: dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Written to a temporary file first so that an interrupted run never leaves a truncated cache behind
+            with open(cache_path + ".tmp", 'wb') as f:
+                pickle.dump({"cache_version": ATTACK_LOOKUP_CACHE_VERSION, "bundle_version": bundle_version, "attack_lookup": attack_lookup},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_path + ".tmp", cache_path)
+        except Exception as e:
+            print(f"Failed to cache MITRE Attack Enrichment at {cache_path}: {str(e)}")
+
+
+    @staticmethod
+    def write_csv(file_path: str, attack_lookup: dict) -> None:
+        f = open(file_path, 'w')
+        writer = csv.writer(f)
+        writer.writerow(['mitre_id', 'technique', 'tactics' ,'groups'])
+        for key in attack_lookup.keys():
+            if len(attack_lookup[key]['groups']) == 0:
+                groups = 'no'
+            else:
+                groups = '|'.join(attack_lookup[key]['groups'])
+
+            writer.writerow([
+                key,
+                attack_lookup[key]['technique'],
+                '|'.join(attack_lookup[key]['tactics']),
+                groups
+            ])
+
+        f.close()
+
+
+    @staticmethod
+    def read_csv(file_path: str) -> dict:
+        with open(file_path, mode='r') as inp:
+            reader = csv.reader(inp)
+            attack_lookup = {rows[0]:{'technique': rows[1], 'tactics': rows[2].split('|'), 'groups': rows[3].split('|')} for rows in reader}
+        attack_lookup.pop('mitre_id')
+        return attack_lookup
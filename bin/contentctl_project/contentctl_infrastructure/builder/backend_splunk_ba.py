@@ -1,3 +1,4 @@
+import functools
 import re
 from sigma.conversion.state import ConversionState
 from sigma.rule import SigmaRule
@@ -67,6 +68,16 @@ class SplunkBABackend(TextQueryBackend):
     wildcard_match_expression : ClassVar[Optional[str]] = "like({field}, {value})"
 
 
+    preamble : ClassVar[str] = """
+| from read_ba_enriched_events()
+| eval timestamp = ucast(map_get(input_event,"time"),"long", null)
+| eval metadata = ucast(map_get(input_event, "metadata"),"map<string, any>", null)
+| eval metadata_uid = ucast(map_get(metadata, "uid"),"string", null)
+""".replace("\n", " ")
+    # Read by the finding report appended to the search, see finding_report.j2
+    finding_report_fields : ClassVar[Tuple[str, ...]] = ("device", "device_hostname", "actor_user", "actor_user_name")
+
+
     def __init__(self, processing_pipeline: Optional["sigma.processing.pipeline.ProcessingPipeline"] = None, collect_errors: bool = False, min_time : str = "-30d", max_time : str = "now", detection : Detection = None, field_mapping: dict = None, **kwargs):
         super().__init__(processing_pipeline, collect_errors, **kwargs)
         self.min_time = min_time or "-30d"
@@ -87,43 +98,67 @@ class SplunkBABackend(TextQueryBackend):
         #     if not count == len(fields) - 1:
         #         fields_input_parsing = fields_input_parsing + ', '
 
-        detection_str = """
-| from read_ba_enriched_events()
-| eval timestamp = ucast(map_get(input_event,"time"),"long", null)
-| eval metadata = ucast(map_get(input_event, "metadata"),"map<string, any>", null)
-| eval metadata_uid = ucast(map_get(metadata, "uid"),"string", null)
-""".replace("\n", " ")
-
-        parsed_fields = [] 
-
-        for field in self.field_mapping["mapping"].keys():
-            mapped_field = self.field_mapping["mapping"][field]
-            parent = 'input_event'
-            i = 1
-            values = mapped_field.split('.')
-            for val in values:
-                if parent == "input_event":
-                    new_val = val
-                else:
-                    new_val = parent + '_' + val
-                if new_val in parsed_fields:
-                    parent = new_val
-                    i = i + 1
-                    continue
-                if i == len(values):
-                    parser_str = '| eval ' + new_val + '' + '=ucast(map_get(' + parent + ',"' + val + '"), "string", null) ' 
-                else:
-                    parser_str = '| eval ' + new_val + '' + '=ucast(map_get(' + parent + ',"' + val + '"), "map<string, any>", null) ' 
-                detection_str = detection_str + parser_str
-                parsed_fields.append(new_val)
-                parent = new_val
-                i = i + 1
-
+        detection_str = self.compile_preamble(self.freeze_mapping(self.field_mapping), self.referenced_fields(query))
         detection_str = detection_str + "| where " + query
         detection_str = detection_str.replace("\\\\\\\\", "\\\\")
         
 
         return detection_str
 
+    def referenced_fields(self, query: str) -> Optional[frozenset]:
+        # The fields of the search: the ones in the where clause, the observables written as
+        # the evidence of the finding report and the fields finding_report.j2 reads.  None,
+        # for every field of the mapping, when the backend converts without a detection.
+        if self.detection is None:
+            return None
+        observables = [observable["name"].replace(".", "_") for observable in self.detection.tags.observable or []]
+        return frozenset(re.findall(r"\w+", query)).union(observables, self.finding_report_fields)
+
+    @staticmethod
+    def freeze_mapping(field_mapping: dict) -> Tuple[Tuple[str, str], ...]:
+        return tuple(field_mapping["mapping"].items())
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def compile_mapping(mapping: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[Tuple[str, str, str, bool], ...], Dict[str, Tuple[str, ...]]]:
+        # The mapped OCSF fields form a trie of nested maps below input_event, every node is
+        # read with one eval however many fields are below it:
+        #   process.file.path -> process, process_file, process_file_path
+        # Returns the evals as (field, parent, key, leaf) in the order the fields first
+        # appear in the mapping, and the fields every field is read through
+        evals = []
+        paths = {}
+        for _, mapped_field in mapping:
+            parent = 'input_event'
+            path = ()
+            keys = mapped_field.split('.')
+            for i, key in enumerate(keys):
+                field = key if parent == 'input_event' else parent + '_' + key
+                path = path + (field,)
+                if field not in paths:
+                    paths[field] = path
+                    evals.append((field, parent, key, i == len(keys) - 1))
+                parent = field
+        return tuple(evals), paths
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def compile_preamble(mapping: Tuple[Tuple[str, str], ...], referenced: Optional[frozenset]) -> str:
+        # The search reading the events and the mapped fields it references, memoized per
+        # mapping and set of references, which many detections of a data source share
+        evals, paths = SplunkBABackend.compile_mapping(mapping)
+        if referenced is None:
+            needed = paths.keys()
+        else:
+            needed = set()
+            for field in referenced:
+                needed.update(paths.get(field, ()))
+
+        parsers = [
+            '| eval ' + field + '=ucast(map_get(' + parent + ',"' + key + '"), ' + ('"string"' if leaf else '"map<string, any>"') + ', null) '
+            for field, parent, key, leaf in evals if field in needed
+        ]
+        return SplunkBABackend.preamble + ''.join(parsers)
+
     def finalize_output_data_model(self, queries: List[str]) -> List[str]:
         return queries
\ No newline at end of file
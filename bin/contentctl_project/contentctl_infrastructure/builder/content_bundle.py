@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+from typing import Iterator, Union
+
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+
+CONTENT_BUNDLE_FILENAME = "security_content.bundle.sqlite"
+
+# Bump this whenever the schema or the layout of the stored objects changes.  The loader
+# refuses to open a bundle written by a different version.
+CONTENT_BUNDLE_VERSION = "1"
+
+CONTENT_BUNDLE_SCHEMA = [
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE objects (type TEXT, name TEXT, id TEXT, body BLOB, PRIMARY KEY (type, name)) WITHOUT ROWID",
+    "CREATE TABLE refs (source_type TEXT, source_name TEXT, target_type TEXT, target_name TEXT, "
+    "PRIMARY KEY (source_type, source_name, target_type, target_name)) WITHOUT ROWID",
+]
+
+# Created after the objects are inserted, which is faster than maintaining them row by row
+CONTENT_BUNDLE_INDEXES = [
+    "CREATE INDEX objects_id ON objects (id)",
+    "CREATE INDEX refs_target ON refs (target_type, target_name)",
+]
+
+
+def content_type_name(type: Union[SecurityContentType, str]) -> str:
+    return type.name if isinstance(type, SecurityContentType) else type
+
+
+class ContentBundle():
+    # Read-only access to a bundle written by `contentctl generate -pr BUNDLE`.  The bundle
+    # holds every detection, story, baseline, investigation, lookup, macro, deployment and
+    # playbook as the JSON the generate step produced, fully enriched, plus the references
+    # between them: the edges of the ContentGraph.
+    #
+    # Nothing is read until the first query, and then only the rows that query needs, so
+    # a tool that wants one detection does not pay for parsing the whole content tree.
+    #
+    #   with ContentBundle("dist/bundle/security_content.bundle.sqlite") as bundle:
+    #       detection = bundle.get(SecurityContentType.detections, "Attempted Credential Dump From Registry via Reg exe")
+    #       macros = bundle.get_references(SecurityContentType.detections, detection["name"], SecurityContentType.macros)
+    path: str
+    mmap_size: int
+    connection: Union[sqlite3.Connection, None]
+
+    def __init__(self, path: str, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.connection = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self.connection is None:
+            if not os.path.isfile(self.path):
+                raise(Exception(f"Content bundle {self.path} does not exist.  Create it with `contentctl generate -pr BUNDLE`."))
+            connection = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, check_same_thread=False)
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            row = connection.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+            if row is None or row[0] != CONTENT_BUNDLE_VERSION:
+                connection.close()
+                raise(Exception(f"Content bundle {self.path} has format version {row[0] if row else None}, "
+                                f"expected {CONTENT_BUNDLE_VERSION}.  Regenerate it with `contentctl generate -pr BUNDLE`."))
+            self.connection = connection
+        return self.connection
+
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+    def get_metadata(self) -> dict:
+        return dict(self.get_connection().execute("SELECT key, value FROM meta").fetchall())
+
+
+    def get(self, type: Union[SecurityContentType, str], name: str) -> Union[dict, None]:
+        row = self.get_connection().execute("SELECT body FROM objects WHERE type = ? AND name = ?",
+                                            (content_type_name(type), name)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+
+    def get_by_id(self, id: str) -> Union[dict, None]:
+        row = self.get_connection().execute("SELECT body FROM objects WHERE id = ?", (id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+
+    def get_names(self, type: Union[SecurityContentType, str]) -> list[str]:
+        return [row[0] for row in self.get_connection().execute(
+            "SELECT name FROM objects WHERE type = ? ORDER BY name", (content_type_name(type),))]
+
+
+    def get_objects(self, type: Union[SecurityContentType, str]) -> Iterator[dict]:
+        for row in self.get_connection().execute("SELECT body FROM objects WHERE type = ? ORDER BY name", (content_type_name(type),)):
+            yield json.loads(row[0])
+
+
+    def get_reference_names(self, type: Union[SecurityContentType, str], name: str,
+                            target_type: Union[SecurityContentType, str]) -> list[str]:
+        return [row[0] for row in self.get_connection().execute(
+            "SELECT target_name FROM refs WHERE source_type = ? AND source_name = ? AND target_type = ? ORDER BY target_name",
+            (content_type_name(type), name, content_type_name(target_type)))]
+
+
+    def get_references(self, type: Union[SecurityContentType, str], name: str,
+                       target_type: Union[SecurityContentType, str]) -> list[dict]:
+        # The objects referenced by an object, e.g. the macros of a detection.  References
+        # to objects that are not part of the bundle (stories a detection names but that do
+        # not exist, for example) are only returned by get_reference_names.
+        return [json.loads(row[0]) for row in self.get_connection().execute(
+            "SELECT objects.body FROM refs JOIN objects ON objects.type = refs.target_type AND objects.name = refs.target_name "
+            "WHERE refs.source_type = ? AND refs.source_name = ? AND refs.target_type = ? ORDER BY objects.name",
+            (content_type_name(type), name, content_type_name(target_type)))]
+
+
+    def get_referencing(self, type: Union[SecurityContentType, str], name: str,
+                        source_type: Union[SecurityContentType, str]) -> list[dict]:
+        # The reverse: the objects that reference an object, e.g. the detections of a story
+        return [json.loads(row[0]) for row in self.get_connection().execute(
+            "SELECT objects.body FROM refs JOIN objects ON objects.type = refs.source_type AND objects.name = refs.source_name "
+            "WHERE refs.target_type = ? AND refs.target_name = ? AND refs.source_type = ? ORDER BY objects.name",
+            (content_type_name(type), name, content_type_name(source_type)))]
+
+
+    def get_all_references(self) -> Iterator[tuple[str, str, str, str]]:
+        # (source type, source name, target type, target name), see ContentGraph.from_references
+        return iter(self.get_connection().execute("SELECT source_type, source_name, target_type, target_name FROM refs").fetchall())
+
+
+    def get_all_names(self) -> Iterator[tuple[str, str]]:
+        return iter(self.get_connection().execute("SELECT type, name FROM objects").fetchall())
@@ -0,0 +1,108 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+from typing import Any, Union
+
+CONTENT_CACHE_DIRECTORY = ".contentctl_cache"
+CONTENT_CACHE_FILENAME = "content_cache.sqlite"
+
+# Bump this whenever the layout of the cached values changes.  A cache written
+# by a different version is dropped when it is opened.
+CONTENT_CACHE_VERSION = "1"
+
+
+class ContentCache():
+    # Parsed YAML (and, where it is safe to do so, the validated pydantic object) for
+    # every content file, keyed by path and the sha256 of the file contents.  Only one
+    # entry is kept per (namespace, path), so the cache does not grow as files change.
+    enabled: bool = False
+    cache_file: Union[str, None] = None
+    connection: Union[sqlite3.Connection, None] = None
+    connection_pid: Union[int, None] = None
+    hits: int = 0
+    misses: int = 0
+
+    @staticmethod
+    def initialize_cache(cache_directory: str = CONTENT_CACHE_DIRECTORY) -> None:
+        try:
+            os.makedirs(cache_directory, exist_ok=True)
+        except OSError as e:
+            print(f"Failed to create the content cache directory {cache_directory}.  Content will not be cached: {str(e)}")
+            return
+
+        ContentCache.cache_file = os.path.join(cache_directory, CONTENT_CACHE_FILENAME)
+        ContentCache.enabled = True
+        connection = ContentCache.get_connection()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != CONTENT_CACHE_VERSION:
+            connection.execute("DELETE FROM content")
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (CONTENT_CACHE_VERSION,))
+
+
+    @staticmethod
+    def get_connection() -> sqlite3.Connection:
+        # Worker processes forked by Factory inherit the class attributes, but an
+        # sqlite connection must not be shared across a fork, so each process opens its own.
+        if ContentCache.connection is None or ContentCache.connection_pid != os.getpid():
+            connection = sqlite3.connect(ContentCache.cache_file, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS content (namespace TEXT, path TEXT, digest TEXT, value BLOB, PRIMARY KEY (namespace, path))")
+            ContentCache.connection = connection
+            ContentCache.connection_pid = os.getpid()
+        return ContentCache.connection
+
+
+    @staticmethod
+    def close_cache() -> None:
+        if ContentCache.connection is not None and ContentCache.connection_pid == os.getpid():
+            ContentCache.connection.close()
+        ContentCache.connection = None
+        ContentCache.connection_pid = None
+        if ContentCache.enabled:
+            print(f"Content cache: [{ContentCache.hits}] hits, [{ContentCache.misses}] misses")
+        ContentCache.enabled = False
+
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        with open(file_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+
+    @staticmethod
+    def get(namespace: str, file_path: str, digest: str) -> Any:
+        row = ContentCache.get_connection().execute("SELECT digest, value FROM content WHERE namespace = ? AND path = ?",
+            (namespace, os.path.abspath(file_path))).fetchone()
+        if row is None or row[0] != digest:
+            ContentCache.misses += 1
+            return None
+        ContentCache.hits += 1
+        # Every hit is unpickled again, so callers are free to mutate what they get back
+        return pickle.loads(row[1])
+
+
+    @staticmethod
+    def put(namespace: str, file_path: str, digest: str, value: Any) -> None:
+        ContentCache.get_connection().execute("INSERT OR REPLACE INTO content (namespace, path, digest, value) VALUES (?, ?, ?, ?)",
+            (namespace, os.path.abspath(file_path), digest, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+    @staticmethod
+    @functools.cache
+    def model_namespace(model: type, builder: type) -> str:
+        # Validated objects are only reusable while the model they were built from, its
+        # validators and the builder that parsed them are unchanged.  So the namespace
+        # includes the model's schema and the source of every entity (the validators of
+        # a model live in its module and in the entities it uses) and of the builder.
+        digest = hashlib.sha256(model.schema_json().encode('utf-8'))
+        entities_directory = os.path.dirname(inspect.getsourcefile(model))
+        source_files = sorted(os.path.join(entities_directory, name) for name in os.listdir(entities_directory) if name.endswith('.py'))
+        for source_file in source_files + [inspect.getsourcefile(builder)]:
+            with open(source_file, 'rb') as f:
+                digest.update(f.read())
+        return f"{model.__name__}:{digest.hexdigest()[:16]}"
@@ -0,0 +1,159 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Iterator, Union
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class ContentWatcher():
+    # Reports the .yml files that change below a set of directories.  On Linux the
+    # directories are watched with inotify, through libc, so a save is seen as soon as the
+    # editor writes it.  Elsewhere, or when inotify can not be used, the modification time
+    # and size of every file is compared every poll_interval_seconds.
+    #
+    # Editors often write a file in several steps (truncate, write, rename), so after the
+    # first change the watcher waits debounce_seconds for more before reporting them
+    # together.
+    directories: list[str]
+    debounce_seconds: float
+    poll_interval_seconds: float
+    inotify_fd: Union[int, None]
+    watches: dict[int, str]
+    libc: Union[ctypes.CDLL, None] = None
+
+    def __init__(self, directories: list[str], debounce_seconds: float = 0.02, poll_interval_seconds: float = 0.25, use_inotify: bool = True):
+        self.directories = [os.path.abspath(directory) for directory in directories if os.path.isdir(directory)]
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.inotify_fd = None
+        self.watches = {}
+        if use_inotify:
+            self.inotify_fd = ContentWatcher.inotify_init()
+        if self.inotify_fd is not None:
+            for directory in self.directories:
+                self.add_watches(directory)
+
+
+    @staticmethod
+    def inotify_init() -> Union[int, None]:
+        library = ctypes.util.find_library('c')
+        if library is None:
+            return None
+        try:
+            libc = ctypes.CDLL(library, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        ContentWatcher.libc = libc
+        return fd
+
+
+    def add_watches(self, directory: str) -> None:
+        for dirpath, _, _ in os.walk(directory):
+            wd = ContentWatcher.libc.inotify_add_watch(self.inotify_fd, dirpath.encode(), WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = dirpath
+
+
+    def close(self) -> None:
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+
+    def watch(self) -> Iterator[list[str]]:
+        if self.inotify_fd is not None:
+            return self.watch_inotify()
+        return self.watch_polling()
+
+
+    def read_events(self, timeout: Union[float, None]) -> Union[set[str], None]:
+        # The files changed by the events read within timeout, or None when the kernel
+        # dropped events and every file has to be considered changed
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            buffer = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0').decode()
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if wd not in self.watches:
+                continue
+            path = os.path.join(self.watches[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Watch new directories, and report the files moved in with them
+                    self.add_watches(path)
+                    changed.update(ContentWatcher.list_files(path))
+            elif name.endswith('.yml'):
+                changed.add(path)
+        return changed
+
+
+    def watch_inotify(self) -> Iterator[list[str]]:
+        while self.inotify_fd is not None:
+            changed = self.read_events(None)
+            deadline = time.monotonic() + self.debounce_seconds
+            while changed is not None and time.monotonic() < deadline:
+                more = self.read_events(max(0, deadline - time.monotonic()))
+                changed = None if more is None else changed | more
+            if changed is None:
+                changed = {file for directory in self.directories for file in ContentWatcher.list_files(directory)}
+            if changed:
+                yield sorted(changed)
+
+
+    @staticmethod
+    def list_files(directory: str) -> list[str]:
+        return [os.path.join(dirpath, file) for dirpath, _, files in os.walk(directory) for file in files if file.endswith('.yml')]
+
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for directory in self.directories:
+            for file in ContentWatcher.list_files(directory):
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+                files[file] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+
+    def watch_polling(self) -> Iterator[list[str]]:
+        previous = self.snapshot()
+        while True:
+            time.sleep(self.poll_interval_seconds)
+            current = self.snapshot()
+            changed = {file for file in previous.keys() | current.keys() if previous.get(file) != current.get(file)}
+            if changed:
+                time.sleep(self.debounce_seconds)
+                current = self.snapshot()
+                changed |= {file for file in previous.keys() | current.keys() if previous.get(file) != current.get(file)}
+                yield sorted(changed)
+            previous = current
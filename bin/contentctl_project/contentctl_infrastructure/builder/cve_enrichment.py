@@ -1,77 +1,217 @@
 
 from pycvesearch import CVESearch
-import functools
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import json
 import os
-import shelve
+import sqlite3
+import threading
 import time
-import sys
+from typing import Union
+
+from bin.contentctl_project.contentctl_infrastructure.builder.enrichment_cache import EnrichmentCache
 CVESSEARCH_API_URL = 'https://cve.circl.lu'
 
-CVE_CACHE_FILENAME = "lookups/CVE_CACHE.db"
+# Relative to the path of the content being built
+CVE_CACHE_FILENAME = os.path.join("lookups", "CVE_CACHE.sqlite")
+
+# Entries older than this are fetched again when the API is reachable.  With
+# force_cached_or_offline, entries of any age are used.
+CVE_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+
+class CveEnrichmentStore():
+    # Every CVE that has been resolved, from cve.circl.lu or from an imported NVD feed, in
+    # one SQLite file.  prefetch() takes all the CVE ids referenced by the content at once,
+    # reads what it can from the file and fetches the rest concurrently, so the per
+    # detection lookups in CveEnrichment.enrich_cve never wait on the network.
+    cache_file: str = CVE_CACHE_FILENAME
+    max_age_seconds: int = CVE_CACHE_MAX_AGE_SECONDS
+    max_workers: int = 8
+    max_api_attempts: int = 3
+    retry_sleep_seconds: int = 5
+    results: dict[str, dict] = {}
+    failures: dict[str, Exception] = {}
+    lock: threading.Lock = threading.Lock()
+    thread_local: threading.local = threading.local()
+
+    @staticmethod
+    def get_connection(input_path: str) -> sqlite3.Connection:
+        return EnrichmentCache.get_connection(os.path.join(input_path, CveEnrichmentStore.cache_file),
+            "CREATE TABLE IF NOT EXISTS cve (cve_id TEXT PRIMARY KEY, cvss REAL, summary TEXT, source TEXT, fetched_at REAL)")
+
+
+    @staticmethod
+    def load(cve_ids: list[str], input_path: str, allow_stale: bool) -> dict[str, dict]:
+        found = {}
+        oldest_allowed = 0 if allow_stale else time.time() - CveEnrichmentStore.max_age_seconds
+        connection = CveEnrichmentStore.get_connection(input_path)
+        # Stay well below SQLite's limit on the number of bound parameters
+        for start in range(0, len(cve_ids), 500):
+            batch = cve_ids[start:start+500]
+            rows = connection.execute(f"SELECT cve_id, cvss, summary FROM cve WHERE fetched_at >= ? AND cve_id IN ({','.join('?' * len(batch))})",
+                [oldest_allowed] + batch).fetchall()
+            for cve_id, cvss, summary in rows:
+                found[cve_id] = {'cvss': cvss, 'summary': summary}
+        EnrichmentCache.close_connection(connection)
+        return found
 
-NON_PERSISTENT_CACHE = {}
 
+    @staticmethod
+    def save(records: list[tuple], input_path: str) -> None:
+        connection = CveEnrichmentStore.get_connection(input_path)
+        try:
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO cve (cve_id, cvss, summary, source, fetched_at) VALUES (?, ?, ?, ?, ?)", records)
+        except sqlite3.Error as e:
+            # The records are still served from memory for the rest of the run
+            print(f"Failed to write the cache file {os.path.join(input_path, CveEnrichmentStore.cache_file)}: {str(e)}")
+        EnrichmentCache.close_connection(connection)
 
 
-@functools.cache
-def cvesearch_helper(url:str, cve_id:str, force_cached_or_offline:bool=False, max_api_attempts:int=3, retry_sleep_seconds:int=5):
-    if max_api_attempts < 1:
-            raise(Exception(f"The minimum number of CVESearch API attempts is 1.  You have passed {max_api_attempts}"))
+    @staticmethod
+    def fetch(cve_id: str) -> dict:
+        # CVESearch keeps a requests.Session, so every worker thread gets its own client
+        if not hasattr(CveEnrichmentStore.thread_local, "client"):
+            CveEnrichmentStore.thread_local.client = CVESearch(CVESSEARCH_API_URL)
 
-    if force_cached_or_offline:
-        if not os.path.exists(CVE_CACHE_FILENAME):
-            print(f"Cache at {CVE_CACHE_FILENAME} not found - Creating it.")
-        cache = shelve.open(CVE_CACHE_FILENAME, flag='c', writeback=True)
-    else:
-        cache = NON_PERSISTENT_CACHE
-    if cve_id in cache:
-        result = cache[cve_id]
-        #print(f"hit cve_enrichment:  {time.time() - start:.2f}")
-    else:
-        api_attempts_remaining = max_api_attempts
-        while api_attempts_remaining > 0:
-            
+        api_attempts_remaining = CveEnrichmentStore.max_api_attempts
+        while True:
             api_attempts_remaining -= 1
-            
-            start = time.time()
             try:
-                cve = cvesearch_id_helper(url)
-                result = cve.id(cve_id)
+                result = CveEnrichmentStore.thread_local.client.id(cve_id)
                 break
             except Exception as e:
                 if api_attempts_remaining > 0:
-                    print(f"The option 'force_cached_or_offline' was used, but {cve_id} not found in {CVE_CACHE_FILENAME} and unable to connect to {CVESSEARCH_API_URL}: {str(e)}")
-                    print(f"Retrying the CVESearch API up to {api_attempts_remaining} more times after a sleep of {retry_sleep_seconds} seconds...")
-                    time.sleep(retry_sleep_seconds)
+                    time.sleep(CveEnrichmentStore.retry_sleep_seconds)
                 else:
-                    raise(Exception(f"The option 'force_cached_or_offline' was used, but {cve_id} not found in {CVE_CACHE_FILENAME} and unable to connect to {CVESSEARCH_API_URL} after {max_api_attempts} attempts: {str(e)}"))
-            
+                    raise(Exception(f"{cve_id} not found in {CveEnrichmentStore.cache_file} and unable to connect to {CVESSEARCH_API_URL} after {CveEnrichmentStore.max_api_attempts} attempts: {str(e)}"))
+
         if result is None:
             raise(Exception(f'CveEnrichment for [ {cve_id} ] failed - CVE does not exist'))
-        cache[cve_id] = result
-        
-    if force_cached_or_offline:
-        cache.close()
+        return result
+
+
+    @staticmethod
+    def prefetch(cve_ids: list[str], input_path: str, force_cached_or_offline: bool = False) -> None:
+        with CveEnrichmentStore.lock:
+            pending = sorted(set(cve_ids) - CveEnrichmentStore.results.keys() - CveEnrichmentStore.failures.keys())
+        if len(pending) == 0:
+            return
 
-    return result
+        cached = CveEnrichmentStore.load(pending, input_path, allow_stale=force_cached_or_offline)
+        missing = [cve_id for cve_id in pending if cve_id not in cached]
 
-@functools.cache
-def cvesearch_id_helper(url:str):
-    #The initial CVESearch call takes some time.
-    #We cache it to avoid making this call each time we need to do a lookup
-    cve = CVESearch(CVESSEARCH_API_URL)
-    return cve
+        fetched = {}
+        if len(missing) > 0:
+            workers = min(CveEnrichmentStore.max_workers, len(missing))
+            print(f"\r{'CVE Enrichment'.rjust(23)}: [{len(missing)} CVE(s), {workers} workers]...", end="", flush=True)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {cve_id: executor.submit(CveEnrichmentStore.fetch, cve_id) for cve_id in missing}
+            for cve_id, future in futures.items():
+                try:
+                    fetched[cve_id] = future.result()
+                except Exception as e:
+                    fetched[cve_id] = e
+            print("Done!")
+
+            cached.update(EnrichmentCache.load_stale(lambda failed: CveEnrichmentStore.load(failed, input_path, allow_stale=True),
+                [cve_id for cve_id, result in fetched.items() if isinstance(result, Exception)], force_cached_or_offline))
+
+        now = time.time()
+        records = []
+        with CveEnrichmentStore.lock:
+            CveEnrichmentStore.results.update(cached)
+            for cve_id, result in fetched.items():
+                if cve_id in cached:
+                    continue
+                if isinstance(result, Exception):
+                    CveEnrichmentStore.failures[cve_id] = result
+                else:
+                    CveEnrichmentStore.results[cve_id] = result
+                    try:
+                        records.append((cve_id, result['cvss'], result['summary'], CVESSEARCH_API_URL, now))
+                    except (TypeError, KeyError):
+                        # Malformed answer: used as is for this run (enrich_cve reports it) but not stored
+                        pass
+        if len(records) > 0:
+            CveEnrichmentStore.save(records, input_path)
+
+
+    @staticmethod
+    def get_cve(cve_id: str, input_path: str, force_cached_or_offline: bool = False) -> dict:
+        if cve_id not in CveEnrichmentStore.results and cve_id not in CveEnrichmentStore.failures:
+            CveEnrichmentStore.prefetch([cve_id], input_path, force_cached_or_offline)
+        if cve_id in CveEnrichmentStore.failures:
+            raise(CveEnrichmentStore.failures[cve_id])
+        return CveEnrichmentStore.results[cve_id]
+
+
+    @staticmethod
+    def import_nvd_feed(feed_path: str, input_path: str) -> int:
+        # Accepts the NVD 1.1 JSON feeds (nvdcve-1.1-*.json[.gz]) as well as saved
+        # responses of the NVD 2.0 CVE API.  cve.circl.lu reports the CVSS v2 base score,
+        # so that score is preferred, and v3 is used for CVEs that only have a v3 score.
+        opener = gzip.open if feed_path.endswith(".gz") else open
+        with opener(feed_path, 'rt', encoding='utf-8') as f:
+            feed = json.load(f)
+
+        now = time.time()
+        records = []
+        if "CVE_Items" in feed:
+            for item in feed["CVE_Items"]:
+                cve_id = item["cve"]["CVE_data_meta"]["ID"]
+                descriptions = [(d["lang"], d["value"]) for d in item["cve"].get("description", {}).get("description_data", [])]
+                impact = item.get("impact", {})
+                scores = [impact.get("baseMetricV2", {}).get("cvssV2", {}).get("baseScore"),
+                          impact.get("baseMetricV3", {}).get("cvssV3", {}).get("baseScore")]
+                records.append((cve_id, CveEnrichmentStore.first_score(scores), CveEnrichmentStore.english_description(descriptions), f"nvd:{os.path.basename(feed_path)}", now))
+        elif "vulnerabilities" in feed:
+            for item in feed["vulnerabilities"]:
+                cve = item["cve"]
+                descriptions = [(d["lang"], d["value"]) for d in cve.get("descriptions", [])]
+                metrics = cve.get("metrics", {})
+                scores = [metric["cvssData"]["baseScore"] for key in ["cvssMetricV2", "cvssMetricV31", "cvssMetricV30"] for metric in metrics.get(key, [])]
+                records.append((cve["id"], CveEnrichmentStore.first_score(scores), CveEnrichmentStore.english_description(descriptions), f"nvd:{os.path.basename(feed_path)}", now))
+        else:
+            raise(Exception(f"{feed_path} is not an NVD JSON feed: expected a 'CVE_Items' or 'vulnerabilities' list"))
+
+        CveEnrichmentStore.save(records, input_path)
+        with CveEnrichmentStore.lock:
+            for cve_id, cvss, summary, _, _ in records:
+                CveEnrichmentStore.failures.pop(cve_id, None)
+                CveEnrichmentStore.results[cve_id] = {'cvss': cvss, 'summary': summary}
+        print(f"Imported [{len(records)}] CVE(s) from {feed_path} into {os.path.join(input_path, CveEnrichmentStore.cache_file)}")
+        return len(records)
+
+
+    @staticmethod
+    def first_score(scores: list) -> Union[float, None]:
+        for score in scores:
+            if score is not None:
+                return score
+        return None
+
+
+    @staticmethod
+    def english_description(descriptions: list[tuple]) -> Union[str, None]:
+        for lang, value in descriptions:
+            if lang == "en":
+                return value
+        if len(descriptions) > 0:
+            return descriptions[0][1]
+        return None
 
 
 
 class CveEnrichment():
 
     @classmethod
-    def enrich_cve(self, cve_id: str, force_cached_or_offline: bool = False) -> dict:
+    def enrich_cve(self, cve_id: str, input_path: str, force_cached_or_offline: bool = False) -> dict:
         cve_enriched = dict()
         try:
-            
-            result = cvesearch_helper(CVESSEARCH_API_URL, cve_id, force_cached_or_offline)
+
+            result = CveEnrichmentStore.get_cve(cve_id, input_path, force_cached_or_offline)
             cve_enriched['id'] = cve_id
             cve_enriched['cvss'] = result['cvss']
             cve_enriched['summary'] = result['summary']
@@ -79,8 +219,8 @@ class CveEnrichment():
             # there was a error calling the circl api lets just empty the object
             print("WARNING, issue enriching {0}, with error: {1}".format(cve_id, str(TypeErr)))
             cve_enriched = dict()
-            
+
         except Exception as e:
             print("WARNING - {0}".format(str(e)))
-    
-        return cve_enriched
\ No newline at end of file
+
+        return cve_enriched
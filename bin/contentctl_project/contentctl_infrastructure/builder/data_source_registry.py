@@ -0,0 +1,91 @@
+import os
+from typing import Callable, Union
+
+from sigma.processing.pipeline import ProcessingPipeline
+
+from bin.contentctl_project.contentctl_core.application.factory.utils.utils import Utils
+from bin.contentctl_project.contentctl_core.domain.entities.data_source import DataSource
+from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+
+
+class DataSourceRegistry():
+    # The data sources below data_sources/, loaded once for a whole conversion and indexed
+    # by name.  The field mappings of every data source are indexed too:
+    #   field_mappings          (name, "data_model", "cim"|"ocsf") -> mapping
+    #   convert_to_log_source   (name, "data_source", <log source>) -> mapping
+    # The derived mappings (CIM to OCSF, and one data source to another's data model) and
+    # the sigma ProcessingPipelines built from them only depend on the data sources, so
+    # they are computed once and shared by every detection using them.  pySigma copies a
+    # pipeline for every rule it converts, so sharing them is safe.
+    input_path: str
+    data_sources: dict[str, DataSource]
+    mappings: dict[tuple[str, str, str], dict]
+    derived_mappings: dict[tuple, dict]
+    pipelines: dict[tuple, ProcessingPipeline]
+
+    def __init__(self, input_path: str):
+        self.input_path = input_path
+        self.data_sources = {}
+        self.mappings = {}
+        self.derived_mappings = {}
+        self.pipelines = {}
+        for file in Utils.get_all_yml_files_from_directory(os.path.join(input_path, 'data_sources')):
+            self.add(DataSource.parse_obj(YmlReader.load_file(str(file))))
+
+
+    def add(self, data_source: DataSource) -> None:
+        # The first data source, and the first mapping, with a name wins, as it did when
+        # they were searched in order
+        if data_source.name in self.data_sources:
+            return
+        self.data_sources[data_source.name] = data_source
+        for object, field_mappings in [('data_model', data_source.field_mappings), ('data_source', data_source.convert_to_log_source)]:
+            for mapping in field_mappings or []:
+                if object in mapping:
+                    self.mappings.setdefault((data_source.name, object, mapping[object]), mapping)
+
+
+    def get(self, name: str) -> Union[DataSource, None]:
+        return self.data_sources.get(name)
+
+
+    def get_mapping(self, data_source: DataSource, object: str, value: str) -> dict:
+        # object is 'data_model' for field_mappings and 'data_source' for convert_to_log_source
+        mapping = self.mappings.get((data_source.name, object, value))
+        if mapping is None:
+            raise AttributeError("Couldn't find mapping.")
+        return mapping
+
+
+    def get_cim_to_ocsf_mapping(self, data_source: DataSource) -> dict:
+        key = ('cim_to_ocsf', data_source.name)
+        if key not in self.derived_mappings:
+            cim_mapping = self.get_mapping(data_source, "data_model", "cim")
+            ocsf_mapping = self.get_mapping(data_source, "data_model", "ocsf")
+            cim_to_ocsf_mapping = {"mapping": {}}
+            for key_field in cim_mapping["mapping"].keys():
+                cim_field = cim_mapping["mapping"][key_field].split(".")[1]
+                cim_to_ocsf_mapping["mapping"][cim_field] = ocsf_mapping["mapping"][key_field]
+            self.derived_mappings[key] = cim_to_ocsf_mapping
+        return self.derived_mappings[key]
+
+
+    def get_mapping_converted_data_source(self, det_ds: DataSource, det_ds_obj: str, det_ds_dm: str, con_ds: DataSource, con_ds_obj: str, con_ds_dm: str) -> dict:
+        # The fields of det_ds mapped to det_ds_dm, and from there to con_ds_dm of con_ds
+        key = ('converted', det_ds.name, det_ds_obj, det_ds_dm, con_ds.name, con_ds_obj, con_ds_dm)
+        if key not in self.derived_mappings:
+            det_ds_mapping = self.get_mapping(det_ds, det_ds_obj, det_ds_dm)
+            con_ds_mapping = self.get_mapping(con_ds, con_ds_obj, con_ds_dm)
+            mapping = {"mapping": {}}
+            for field in det_ds_mapping["mapping"].keys():
+                mapping["mapping"][field] = con_ds_mapping["mapping"][det_ds_mapping["mapping"][field]]
+            self.derived_mappings[key] = mapping
+        return self.derived_mappings[key]
+
+
+    def get_pipeline(self, data_source: DataSource, target: str, log_source: Union[str, None], build: Callable[[], ProcessingPipeline]) -> ProcessingPipeline:
+        # build is only called the first time a (data source, target, log source) is converted
+        key = (data_source.name, target, log_source)
+        if key not in self.pipelines:
+            self.pipelines[key] = build()
+        return self.pipelines[key]
@@ -0,0 +1,45 @@
+import os
+import sqlite3
+from typing import Callable
+
+
+class EnrichmentCache():
+    # The SQLite files that the CVE and Splunkbase enrichment are cached in live under
+    # the lookups directory of the content being built.  When a file cannot be opened
+    # (no lookups directory, a read only checkout, ...) the enrichment is cached in memory
+    # for the rest of the run instead.
+    memory_connections: dict[str, sqlite3.Connection] = {}
+
+    @staticmethod
+    def get_connection(cache_path: str, schema: str) -> sqlite3.Connection:
+        if cache_path in EnrichmentCache.memory_connections:
+            return EnrichmentCache.memory_connections[cache_path]
+        try:
+            if not os.path.exists(cache_path):
+                print(f"Cache at {cache_path} not found - Creating it.")
+            connection = sqlite3.connect(cache_path, timeout=60)
+            connection.execute(schema)
+            return connection
+        except sqlite3.Error as e:
+            print(f"Failed to open the cache file {cache_path}.  Enrichment will only be cached in memory: {str(e)}")
+            connection = sqlite3.connect(":memory:", check_same_thread=False)
+            connection.execute(schema)
+            EnrichmentCache.memory_connections[cache_path] = connection
+            return connection
+
+
+    @staticmethod
+    def close_connection(connection: sqlite3.Connection) -> None:
+        # The in memory cache is gone once its connection is closed, so it is kept open
+        if connection not in EnrichmentCache.memory_connections.values():
+            connection.close()
+
+
+    @staticmethod
+    def load_stale(load: Callable[[list[str]], dict], failed: list[str], force_cached_or_offline: bool) -> dict:
+        # Entries that could not be fetched again are served from the cache regardless of
+        # their age.  load is called with the keys that failed and must return entries of
+        # any age.  With force_cached_or_offline the first load already did this.
+        if force_cached_or_offline or len(failed) == 0:
+            return {}
+        return load(failed)
@@ -1,16 +1,19 @@
 import sys
-import re
 import os
+from typing import Union
 
 from pydantic import ValidationError
 
 from bin.contentctl_project.contentctl_core.application.builder.detection_builder import DetectionBuilder
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_index import ContentIndex
+from bin.contentctl_project.contentctl_core.application.factory.utils.spl_parser import SplParser
 from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import ContentCache
 from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
 from bin.contentctl_project.contentctl_core.domain.entities.security_content_object import SecurityContentObject
 from bin.contentctl_project.contentctl_core.domain.entities.macro import Macro
 from bin.contentctl_project.contentctl_core.domain.entities.mitre_attack_enrichment import MitreAttackEnrichment
-from bin.contentctl_project.contentctl_infrastructure.builder.cve_enrichment import CveEnrichment
+from bin.contentctl_project.contentctl_infrastructure.builder.cve_enrichment import CveEnrichment, CveEnrichmentStore
 from bin.contentctl_project.contentctl_infrastructure.builder.splunk_app_enrichment import SplunkAppEnrichment
 from bin.contentctl_project.contentctl_core.domain.constants.constants import *
 
@@ -21,47 +24,59 @@ class SecurityContentDetectionBuilder(DetectionBuilder):
     force_cached_or_offline: bool 
     check_references: bool
     skip_enrichment: bool
+    # Replace the search of every detection with its expanded search (--expand_macros)
+    expand_macros: bool
+    # The search of the detection with its macros expanded, set by addMacros.  Its
+    # lookups and data models are found in it.
+    expanded_search: Union[str, None]
 
-    def __init__(self, force_cached_or_offline: bool = False, check_references: bool = False, skip_enrichment:bool = False):
+    def __init__(self, force_cached_or_offline: bool = False, check_references: bool = False, skip_enrichment:bool = False, expand_macros: bool = False):
         self.force_cached_or_offline = force_cached_or_offline
         self.check_references = check_references
         self.skip_enrichment = skip_enrichment
+        self.expand_macros = expand_macros
+        self.expanded_search = None
 
     def setObject(self, path: str) -> None:
+        self.security_content_obj = self.parseObject(path)
+        self.expanded_search = None
+
+
+    def parseObject(self, path: str) -> Detection:
+        # Parsing and validation do not depend on any other content, so this is the
+        # part of the build that Factory can run in worker processes
+        use_cache = ContentCache.enabled and not self.check_references
+        if use_cache:
+            # Reference checking happens during validation, so a cached object is
+            # only reused when references are not being checked
+            digest = ContentCache.file_digest(path)
+            detection = ContentCache.get(ContentCache.model_namespace(Detection, type(self)), path, digest)
+            if detection is not None:
+                return detection
+
         yml_dict = YmlReader.load_file(path)
         yml_dict["tags"]["name"] = yml_dict["name"]
         yml_dict["check_references"] = self.check_references
-        self.security_content_obj = Detection.parse_obj(yml_dict)
+        detection = Detection.parse_obj(yml_dict)
         del(yml_dict["check_references"])
-        self.security_content_obj.source = os.path.split(os.path.dirname(self.security_content_obj.file_path))[-1]      
+        detection.source = os.path.split(os.path.dirname(detection.file_path))[-1]
+
+        if use_cache:
+            ContentCache.put(ContentCache.model_namespace(Detection, type(self)), path, digest, detection)
+        return detection
+
+
+    def setParsedObject(self, detection: Detection) -> None:
+        self.security_content_obj = detection
+        self.expanded_search = None
 
 
-    def addDeployment(self, deployments: list) -> None:
+    def addDeployment(self, deployments: Union[list, ContentIndex]) -> None:
         if self.security_content_obj:
 
             if not self.security_content_obj.deployment:
-
-                matched_deployments = []
-
-                for d in deployments:
-                    d_tags = dict(d.tags)
-                    for d_tag in d_tags.keys():
-                        for attr in dir(self.security_content_obj):
-                            if not (attr.startswith('__') or attr.startswith('_')):
-                                if attr == d_tag:
-                                    if type(self.security_content_obj.__getattribute__(attr)) is str:
-                                        attr_values = [self.security_content_obj.__getattribute__(attr)]
-                                    else:
-                                        attr_values = self.security_content_obj.__getattribute__(attr)
-                                    
-                                    for attr_value in attr_values:
-                                        if attr_value == d_tags[d_tag]:
-                                            matched_deployments.append(d)
-
-                if len(matched_deployments) == 0:
-                    self.security_content_obj.deployment = None
-                else:
-                    self.security_content_obj.deployment = matched_deployments[-1]
+                # The last deployment with a tag matching an attribute of the detection wins
+                self.security_content_obj.deployment = ContentIndex.of(deployments).get_deployment(self.security_content_obj)
 
 
     def addRBA(self) -> None:
@@ -157,27 +172,14 @@ class SecurityContentDetectionBuilder(DetectionBuilder):
             self.security_content_obj.annotations = annotations    
 
 
-    def addPlaybook(self, playbooks: list) -> None:
+    def addPlaybook(self, playbooks: Union[list, ContentIndex]) -> None:
         if self.security_content_obj:
-            matched_playbooks = []
-            for playbook in playbooks:
-                if playbook.tags.detections:
-                    for detection in playbook.tags.detections:
-                        if detection == self.security_content_obj.name:
-                            matched_playbooks.append(playbook)
-
-            self.security_content_obj.playbooks = matched_playbooks
+            self.security_content_obj.playbooks = list(ContentIndex.of(playbooks).get_by_detection(self.security_content_obj.name))
 
 
-    def addBaseline(self, baselines: list) -> None:
+    def addBaseline(self, baselines: Union[list, ContentIndex]) -> None:
         if self.security_content_obj:
-            matched_baselines = []
-            for baseline in baselines:
-                for detection in baseline.tags.detections:
-                    if detection == self.security_content_obj.name:
-                        matched_baselines.append(baseline)
-
-            self.security_content_obj.baselines = matched_baselines
+            self.security_content_obj.baselines = list(ContentIndex.of(baselines).get_by_detection(self.security_content_obj.name))
 
 
     def addUnitTest(self) -> None:
@@ -210,58 +212,61 @@ class SecurityContentDetectionBuilder(DetectionBuilder):
                             raise ValueError("mitre_attack_id " + mitre_attack_id + " doesn't exist for detection " + self.security_content_obj.name)
 
 
-    def addMacros(self, macros: list) -> None:
+    def addMacros(self, macros: Union[list, ContentIndex]) -> None:
         if self.security_content_obj:
-            macros_found = re.findall(r'`([^\s]+)`', self.security_content_obj.search)
-            macros_filtered = set()
+            search = self.security_content_obj.search if isinstance(self.security_content_obj.search, str) else ''
             self.security_content_obj.macros = []
 
-            for macro in macros_found:
-                if not '_filter' in macro and not 'drop_dm_object_name' in macro:
-                    start = macro.find('(')
-                    if start != -1:
-                        macros_filtered.add(macro[:start])
-                    else:
-                        macros_filtered.add(macro)
-
-            for macro_name in macros_filtered:
-                for macro in macros:
-                    if macro_name == macro.name:
-                        self.security_content_obj.macros.append(macro)
+            macros = ContentIndex.of(macros)
+            for macro_name in SplParser.macros(search):
+                if not '_filter' in macro_name and not 'drop_dm_object_name' in macro_name:
+                    self.security_content_obj.macros.extend(macros.get_by_name(macro_name))
 
             name = self.security_content_obj.name.replace(' ', '_').replace('-', '_').replace('.', '_').replace('/', '_').lower() + '_filter'
             macro = Macro(name=name, definition='search *', description='Update this macro to limit the output results to filter out false positives.')
             
             self.security_content_obj.macros.append(macro)
 
+            self.expanded_search = macros.macro_expander.expand(search, [macro])
+            if self.expand_macros and isinstance(self.security_content_obj.search, str):
+                self.security_content_obj.search = self.expanded_search
+
 
-    def addLookups(self, lookups: list) -> None:
+    def addLookups(self, lookups: Union[list, ContentIndex]) -> None:
         if self.security_content_obj:
-            lookups_found = re.findall(r'lookup (?:update=true)?(?:append=t)?\s*([^\s]*)', self.security_content_obj.search)
+            lookups_found = SplParser.lookups(self.getExpandedSearch())
             self.security_content_obj.lookups = []
+            lookups = ContentIndex.of(lookups)
             for lookup_name in lookups_found:
-                for lookup in lookups:
-                    if lookup.name == lookup_name:
-                        self.security_content_obj.lookups.append(lookup)
+                self.security_content_obj.lookups.extend(lookups.get_by_name(lookup_name))
+
+
+    def prefetchEnrichment(self, detections: list[Detection], input_path: str) -> None:
+        if self.skip_enrichment:
+            return None
+        cves = [cve for detection in detections if detection.tags.cve for cve in detection.tags.cve]
+        CveEnrichmentStore.prefetch(cves, input_path, force_cached_or_offline=self.force_cached_or_offline)
+        splunk_tas = [splunk_app for detection in detections if detection.tags.supported_tas for splunk_app in detection.tags.supported_tas]
+        SplunkAppEnrichment.prefetch(splunk_tas, input_path, force_cached_or_offline=self.force_cached_or_offline)
 
 
-    def addCve(self) -> None:
+    def addCve(self, input_path: str) -> None:
         if self.skip_enrichment:
             return None
         if self.security_content_obj:
             self.security_content_obj.cve_enrichment = []
             if self.security_content_obj.tags.cve:
                 for cve in self.security_content_obj.tags.cve:
-                    self.security_content_obj.cve_enrichment.append(CveEnrichment.enrich_cve(cve, force_cached_or_offline = self.force_cached_or_offline))
+                    self.security_content_obj.cve_enrichment.append(CveEnrichment.enrich_cve(cve, input_path, force_cached_or_offline = self.force_cached_or_offline))
 
-    def addSplunkApp(self) -> None:
+    def addSplunkApp(self, input_path: str) -> None:
         if self.skip_enrichment:
             return None
         if self.security_content_obj:
             self.security_content_obj.splunk_app_enrichment = []
             if self.security_content_obj.tags.supported_tas:
                 for splunk_app in self.security_content_obj.tags.supported_tas:
-                    self.security_content_obj.splunk_app_enrichment.append(SplunkAppEnrichment.enrich_splunk_app(splunk_app, force_cached_or_offline=self.force_cached_or_offline))
+                    self.security_content_obj.splunk_app_enrichment.append(SplunkAppEnrichment.enrich_splunk_app(splunk_app, input_path, force_cached_or_offline=self.force_cached_or_offline))
 
     def addCIS(self) -> None:
         if self.security_content_obj:
@@ -307,13 +312,22 @@ class SecurityContentDetectionBuilder(DetectionBuilder):
                 "Vulnerabilities", 
                 "Web"
             ]
+            data_models_found = SplParser.datamodels(self.getExpandedSearch())
             for data_model in data_models:
-                if data_model in self.security_content_obj.search:
+                if data_model in data_models_found:
                     self.security_content_obj.datamodel.append(data_model)
 
 
+    def getExpandedSearch(self) -> str:
+        # The search itself when addMacros has not expanded it
+        if self.expanded_search is not None:
+            return self.expanded_search
+        return self.security_content_obj.search if isinstance(self.security_content_obj.search, str) else ''
+
+
     def reset(self) -> None:
         self.security_content_obj = None
+        self.expanded_search = None
 
 
     def getObject(self) -> SecurityContentObject:
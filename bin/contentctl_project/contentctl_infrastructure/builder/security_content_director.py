@@ -9,18 +9,22 @@ from bin.contentctl_project.contentctl_core.application.builder.baseline_builder
 from bin.contentctl_project.contentctl_core.application.builder.playbook_builder import PlaybookBuilder
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentProduct
+from bin.contentctl_project.contentctl_core.domain.entities.security_content_object import SecurityContentObject
 
 class SecurityContentDirector(Director):
 
-    def constructDetection(self, builder: DetectionBuilder, path: str, deployments: list, playbooks: list, baselines: list, attack_enrichment: dict, macros: list, lookups: list, force_cached_or_offline: bool = False) -> None:
+    def constructDetection(self, builder: DetectionBuilder, path: str, deployments: list, playbooks: list, baselines: list, attack_enrichment: dict, macros: list, lookups: list, input_path: str, force_cached_or_offline: bool = False, detection: SecurityContentObject = None) -> None:
         builder.reset()
-        builder.setObject(os.path.join(os.path.dirname(__file__), path))
+        if detection is None:
+            builder.setObject(os.path.join(os.path.dirname(__file__), path))
+        else:
+            # Already parsed and validated by Factory.parseDetections
+            builder.setParsedObject(detection)
         builder.addDeployment(deployments)
         builder.addMitreAttackEnrichment(attack_enrichment)
         builder.addKillChainPhase()
         builder.addCIS()
         builder.addNist()
-        builder.addDatamodel()
         builder.addRBA()
         builder.addProvidingTechnologies()
         builder.addNesFields()
@@ -31,8 +35,11 @@ class SecurityContentDirector(Director):
         builder.addUnitTest()
         builder.addMacros(macros)
         builder.addLookups(lookups)
-        builder.addCve()
-        builder.addSplunkApp()
+        # Found in the search with its macros expanded by addMacros
+        builder.addDatamodel()
+        # The enrichment caches are kept under input_path
+        builder.addCve(input_path)
+        builder.addSplunkApp(input_path)
 
 
     def constructStory(self, builder: StoryBuilder, path: str, detections: list, baselines: list, investigations: list) -> None:
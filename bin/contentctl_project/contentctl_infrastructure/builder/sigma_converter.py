@@ -1,8 +1,11 @@
 import os
 import sys
 import copy
+import functools
 
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Union
 from jinja2 import Environment, FileSystemLoader
 
 from sigma.processing.conditions import LogsourceCondition
@@ -18,6 +21,7 @@ from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import
 from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
 from bin.contentctl_project.contentctl_core.domain.entities.data_source import DataSource
 from bin.contentctl_project.contentctl_infrastructure.builder.backend_splunk_ba import SplunkBABackend
+from bin.contentctl_project.contentctl_infrastructure.builder.data_source_registry import DataSourceRegistry
 from bin.contentctl_project.contentctl_core.application.factory.utils.utils import Utils
 from bin.contentctl_project.contentctl_core.domain.constants.constants import *
 
@@ -28,24 +32,46 @@ class SigmaConverterInputDto:
     detection_folder : str
     input_path: str
     log_source: str
+    workers: int = 1
 
 
 @dataclass(frozen=True)
 class SigmaConverterOutputDto:
     detections: list
+    # One {"file", "detection", "error"} per file that could not be converted
+    errors: list = field(default_factory=list)
+
+
+# The SigmaConverter of a worker process.  It is created once per worker, so its data
+# sources, pipelines and backends are shared by every file the worker converts.
+worker_sigma_converter = None
+
+
+def initialize_worker() -> None:
+    global worker_sigma_converter
+    worker_sigma_converter = SigmaConverter(SigmaConverterOutputDto([]))
+
+
+def convert_detection_file(input_dto: 'SigmaConverterInputDto', detection_file: str) -> Union[Detection, dict]:
+    return worker_sigma_converter.convert_file(input_dto, detection_file)
 
 
 class SigmaConverter():
     output_dto : SigmaConverterOutputDto
+    # Data sources, their mappings and pipelines, loaded once for all detections
+    data_source_registry : Union[DataSourceRegistry, None]
+    # (data source, target, log source) -> the backend converting with its pipeline
+    backends : dict[tuple, SplunkBackend]
 
     def __init__(self, output_dto: SigmaConverterOutputDto) -> None:
         self.output_dto = output_dto
+        self.data_source_registry = None
+        self.backends = {}
 
 
     def execute(self, input_dto: SigmaConverterInputDto) -> None:
         
         detection_files = []
-        errors = []
 
         if input_dto.detection_path:
             detection_files.append(input_dto.detection_path)
@@ -55,162 +81,159 @@ class SigmaConverter():
             print("ERROR: --detection_path or --detection_folder needed.") 
             sys.exit(1)
 
-        for detection_file in detection_files:
-            try:
-                detection = self.read_detection(str(detection_file))
-                print("Converting detection: " + detection.name)
-                data_source = self.load_data_source(input_dto.input_path, detection.data_source[0])
-                if not data_source:
-                    print("ERROR: Didn't find data source with name: " + detection.data_source[0] + " for detection " + detection.name)
-                    sys.exit(1)
-
-                file_name = detection.name.replace(' ', '_').replace('-','_').replace('.','_').replace('/','_').lower()
-                
-
-                if input_dto.data_model == SigmaConverterTarget.RAW:
-                    if input_dto.log_source and input_dto.log_source != detection.data_source[0][0]:
-                        try:
-                            field_mapping = self.find_mapping(data_source.convert_to_log_source, 'data_source', input_dto.log_source)
-                        except Exception as e:
-                            print(e)
-                            print("ERROR: Couldn't find data source mapping for log source " + input_dto.log_source + " for detection: " + detection.name)
-                            sys.exit(1)
-
-                        detection = self.convert_detection_fields(detection, field_mapping)
-
-                        logsource_condition = self.get_logsource_condition(data_source)
-                        processing_item = self.get_field_transformation_processing_item(
+        detection_files = [str(detection_file) for detection_file in detection_files]
+        if input_dto.workers <= 1 or len(detection_files) < 2:
+            self.collect_results(map(functools.partial(self.convert_file, input_dto), detection_files))
+        else:
+            print(f"Converting [{len(detection_files)}] detections with [{input_dto.workers}] workers...")
+            # executor.map preserves the input order, so the detections and errors are
+            # reported in the same order as by a single process
+            chunksize = max(1, len(detection_files) // (input_dto.workers * 4))
+            with ProcessPoolExecutor(max_workers=input_dto.workers, initializer=initialize_worker) as executor:
+                self.collect_results(executor.map(functools.partial(convert_detection_file, input_dto), detection_files, chunksize=chunksize))
+
+        print()
+        for error in self.output_dto.errors:
+            print("ERROR: Converting detection " + (error["detection"] or error["file"]) + ": " + error["error"])
+        print()
+        print(f"Converted [{len(self.output_dto.detections)}] detections, [{len(self.output_dto.errors)}] failed")
+
+
+    def collect_results(self, results) -> None:
+        for result in results:
+            if isinstance(result, dict):
+                self.output_dto.errors.append(result)
+            else:
+                print("Converting detection: " + result.name)
+                self.output_dto.detections.append(result)
+
+
+    def convert_file(self, input_dto: SigmaConverterInputDto, detection_file: str) -> Union[Detection, dict]:
+        # A file that cannot be converted returns its error instead of raising it, so
+        # that it does not stop the conversion of the other files
+        detection = None
+        try:
+            detection = self.read_detection(detection_file)
+            return self.convert_detection(input_dto, detection)
+        except Exception as e:
+            return {
+                "file": detection_file,
+                "detection": None if detection is None else detection.name,
+                "error": str(e)
+            }
+
+
+    def convert_detection(self, input_dto: SigmaConverterInputDto, detection: Detection) -> Detection:
+        data_source = self.load_data_source(input_dto.input_path, detection.data_source[0])
+        if not data_source:
+            raise(Exception("Didn't find data source with name: " + detection.data_source[0]))
+
+        file_name = detection.name.replace(' ', '_').replace('-','_').replace('.','_').replace('/','_').lower()
+
+        if input_dto.data_model == SigmaConverterTarget.RAW:
+            if input_dto.log_source and input_dto.log_source != detection.data_source[0][0]:
+                try:
+                    field_mapping = self.data_source_registry.get_mapping(data_source, 'data_source', input_dto.log_source)
+                except Exception as e:
+                    raise Exception("Couldn't find data source mapping for log source " + input_dto.log_source + ": " + str(e)) from e
+
+                detection = self.convert_detection_fields(detection, field_mapping)
+
+                splunk_backend = self.get_splunk_backend(data_source, 'raw', input_dto.log_source,
+                    lambda: self.get_pipeline_from_processing_items([
+                        self.get_field_transformation_processing_item(
                             field_mapping['mapping'],
-                            logsource_condition
+                            self.get_logsource_condition(data_source)
                         )
-                        sigma_processing_pipeline = self.get_pipeline_from_processing_items([processing_item])
-                        splunk_backend = SplunkBackend(processing_pipeline=sigma_processing_pipeline)
-                        data_source = self.load_data_source(input_dto.input_path, input_dto.log_source) 
-
-                    else:
-                        splunk_backend = SplunkBackend()
-                    
-                    sigma_rule = self.get_sigma_rule(detection, data_source)
-                    search = splunk_backend.convert(sigma_rule)[0]
-                    search = self.add_source_macro(search, data_source.type)
-                    search = self.add_stats_count(search, data_source.raw_fields)
-                    search = self.add_timeformat_conversion(search)
-                    search = self.add_filter_macro(search, file_name)
-
-                    detection.file_path = file_name + '.yml'
-
-                elif input_dto.data_model == SigmaConverterTarget.CIM:
-                    logsource_condition = self.get_logsource_condition(data_source)
-                    try:
-                        field_mapping = self.find_mapping(data_source.field_mappings, 'data_model', 'cim')
-                    except Exception as e:
-                        print(e)
-                        print("ERROR: Couldn't find data source mapping to cim for log source " + detection.data_source[0] + " and detection " + detection.name)
-                        sys.exit(1)
-
-                    detection = self.convert_detection_fields(detection, field_mapping)
-                    sigma_rule = self.get_sigma_rule(detection, data_source)
-                    
-                    sigma_transformation_processing_item = self.get_field_transformation_processing_item(
-                        field_mapping['mapping'],
-                        logsource_condition
-                    )
-
-                    sigma_state_fields_processing_item = self.get_state_fields_processing_item(
-                        field_mapping['mapping'].values(),
-                        logsource_condition
-                    )
-                    sigma_state_data_model_processing_item = self.get_state_data_model_processing_item(
-                        field_mapping['data_set'],
-                        logsource_condition
-                    )
-                    sigma_processing_pipeline = self.get_pipeline_from_processing_items([
-                        sigma_transformation_processing_item,
-                        sigma_state_fields_processing_item,
-                        sigma_state_data_model_processing_item
                     ])
-                    splunk_backend = SplunkBackend(processing_pipeline=sigma_processing_pipeline)
-                    search = splunk_backend.convert(sigma_rule, "data_model")[0]
-                    search = self.add_filter_macro(search, file_name)
-
-                    detection.file_path = file_name + '.yml'
+                )
+                data_source = self.load_data_source(input_dto.input_path, input_dto.log_source) 
 
-                elif input_dto.data_model == SigmaConverterTarget.OCSF:
+            else:
+                splunk_backend = self.get_splunk_backend(data_source, 'raw', None)
 
-                    processing_items = list()
-                    logsource_condition = self.get_logsource_condition(data_source)
-                    if input_dto.log_source and input_dto.log_source != detection.data_source[0]:
-                        data_source_new = self.load_data_source(input_dto.input_path, input_dto.log_source) 
+            sigma_rule = self.get_sigma_rule(detection, data_source)
+            search = splunk_backend.convert(sigma_rule)[0]
+            search = self.add_source_macro(search, data_source.type)
+            search = self.add_stats_count(search, data_source.raw_fields)
+            search = self.add_timeformat_conversion(search)
+            search = self.add_filter_macro(search, file_name)
 
-                        try:
-                            field_mapping = self.get_mapping_converted_data_source(
-                                data_source,
-                                "data_source",
-                                input_dto.log_source,
-                                data_source_new,
-                                "data_model",
-                                "ocsf"
-                            )
-                        except Exception as e:
-                            print(e)
-                            print("ERROR: Couldn't find data source mapping for log source " + input_dto.log_source + " and detection " + detection.name)
-                            sys.exit(1)
+            detection.file_path = file_name + '.yml'
 
-                        cim_to_ocsf_mapping = self.get_cim_to_ocsf_mapping(data_source_new)
+        elif input_dto.data_model == SigmaConverterTarget.CIM:
+            try:
+                field_mapping = self.data_source_registry.get_mapping(data_source, 'data_model', 'cim')
+            except Exception as e:
+                raise Exception("Couldn't find data source mapping to cim for log source " + detection.data_source[0] + ": " + str(e)) from e
 
-                    # elif input_dto.cim_to_ocsf:
-                    #     field_mapping = self.get_cim_to_ocsf_mapping(data_source)
-                    #     cim_to_ocsf_mapping = field_mapping
+            detection = self.convert_detection_fields(detection, field_mapping)
+            sigma_rule = self.get_sigma_rule(detection, data_source)
 
-                    else:
-                        field_mapping = self.find_mapping(data_source.field_mappings, 'data_model', 'ocsf')
-                        cim_to_ocsf_mapping = self.get_cim_to_ocsf_mapping(data_source)
+            splunk_backend = self.get_splunk_backend(data_source, 'cim', None,
+                lambda: self.get_cim_pipeline(field_mapping, self.get_logsource_condition(data_source)))
+            search = splunk_backend.convert(sigma_rule, "data_model")[0]
+            search = self.add_filter_macro(search, file_name)
 
-                    field_mapping_underline = copy.deepcopy(field_mapping)
-                    for field in field_mapping_underline["mapping"].keys():
-                        field_mapping_underline["mapping"][field] = field_mapping_underline["mapping"][field].replace(".", "_")     
+            detection.file_path = file_name + '.yml'
 
-                    self.add_required_fields(cim_to_ocsf_mapping, detection)
-                    self.add_mappings(cim_to_ocsf_mapping, detection)
+        elif input_dto.data_model == SigmaConverterTarget.OCSF:
 
-                    self.update_observables(detection)
+            if input_dto.log_source and input_dto.log_source != detection.data_source[0]:
+                data_source_new = self.load_data_source(input_dto.input_path, input_dto.log_source) 
 
-                    processing_items.append(
-                        self.get_field_transformation_processing_item(
-                            field_mapping_underline['mapping'],
-                            logsource_condition
-                        )
-                    )
-                    processing_items.append(
-                        self.get_state_fields_processing_item(
-                            field_mapping_underline['mapping'].values(),
-                            logsource_condition
-                        )
+                try:
+                    field_mapping = self.data_source_registry.get_mapping_converted_data_source(
+                        data_source,
+                        "data_source",
+                        input_dto.log_source,
+                        data_source_new,
+                        "data_model",
+                        "ocsf"
                     )
+                except Exception as e:
+                    raise Exception("Couldn't find data source mapping for log source " + input_dto.log_source + ": " + str(e)) from e
 
-                    detection = self.convert_detection_fields(detection)
-                    sigma_rule = self.get_sigma_rule(detection, data_source)
-                    sigma_processing_pipeline = self.get_pipeline_from_processing_items(processing_items)
+                cim_to_ocsf_mapping = self.data_source_registry.get_cim_to_ocsf_mapping(data_source_new)
 
-                    splunk_backend = SplunkBABackend(processing_pipeline=sigma_processing_pipeline, detection=detection, field_mapping=field_mapping)
-                    search = splunk_backend.convert(sigma_rule, "data_model")[0]
+            # elif input_dto.cim_to_ocsf:
+            #     field_mapping = self.get_cim_to_ocsf_mapping(data_source)
+            #     cim_to_ocsf_mapping = field_mapping
 
-                    search = search + ' --finding_report--'
-                    detection.file_path = 'ssa___' + file_name + '.yml'                    
+            else:
+                field_mapping = self.data_source_registry.get_mapping(data_source, 'data_model', 'ocsf')
+                cim_to_ocsf_mapping = self.data_source_registry.get_cim_to_ocsf_mapping(data_source)
 
-                detection.search = search
-                
-                self.output_dto.detections.append(detection)
+            self.add_required_fields(cim_to_ocsf_mapping, detection)
+            self.add_mappings(cim_to_ocsf_mapping, detection)
 
-            except Exception as e:
-                print(e)
-                errors.append("ERROR: Converting detection " + detection.name)
+            self.update_observables(detection)
+
+            detection = self.convert_detection_fields(detection)
+            sigma_rule = self.get_sigma_rule(detection, data_source)
+            sigma_processing_pipeline = self.data_source_registry.get_pipeline(data_source, 'ocsf', input_dto.log_source,
+                lambda: self.get_ocsf_pipeline(field_mapping, self.get_logsource_condition(data_source)))
+
+            splunk_backend = SplunkBABackend(processing_pipeline=sigma_processing_pipeline, detection=detection, field_mapping=field_mapping)
+            search = splunk_backend.convert(sigma_rule, "data_model")[0]
+
+            search = search + ' --finding_report--'
+            detection.file_path = 'ssa___' + file_name + '.yml'                    
+
+        detection.search = search
+        return detection
+
+
+    def get_splunk_backend(self, data_source: DataSource, target: str, log_source: Union[str, None], build_pipeline=None) -> SplunkBackend:
+        # One backend per pipeline, created the first time it converts a detection
+        key = (data_source.name, target, log_source)
+        if key not in self.backends:
+            pipeline = None
+            if build_pipeline is not None:
+                pipeline = self.data_source_registry.get_pipeline(data_source, target, log_source, build_pipeline)
+            self.backends[key] = SplunkBackend(processing_pipeline=pipeline)
+        return self.backends[key]
 
-        print()
-        for error in errors:
-            print(error)
-        
-        print()
 
     def read_detection(self, detection_path : str) -> Detection:
         yml_dict = YmlReader.load_file(detection_path)
@@ -221,18 +244,10 @@ class SigmaConverter():
 
 
     def load_data_source(self, input_path: str, data_source_name: str) -> DataSource:
-        data_sources = list()
-        files = Utils.get_all_yml_files_from_directory(os.path.join(input_path, 'data_sources'))
-        for file in files:
-           data_sources.append(DataSource.parse_obj(YmlReader.load_file(str(file))))
-
-        data_source = None
-
-        for obj in data_sources:
-            if obj.name == data_source_name:
-                return obj
-
-        return None
+        if self.data_source_registry is None or self.data_source_registry.input_path != input_path:
+            self.data_source_registry = DataSourceRegistry(input_path)
+            self.backends = {}
+        return self.data_source_registry.get(data_source_name)
 
 
     def get_sigma_rule(self, detection: Detection, data_source: DataSource) -> SigmaCollection:
@@ -317,6 +332,41 @@ class SigmaConverter():
             items=processing_items
         )
 
+
+    def get_cim_pipeline(self, field_mapping: dict, logsource_condition: LogsourceCondition) -> ProcessingPipeline:
+        return self.get_pipeline_from_processing_items([
+            self.get_field_transformation_processing_item(
+                field_mapping['mapping'],
+                logsource_condition
+            ),
+            self.get_state_fields_processing_item(
+                field_mapping['mapping'].values(),
+                logsource_condition
+            ),
+            self.get_state_data_model_processing_item(
+                field_mapping['data_set'],
+                logsource_condition
+            )
+        ])
+
+
+    def get_ocsf_pipeline(self, field_mapping: dict, logsource_condition: LogsourceCondition) -> ProcessingPipeline:
+        # OCSF fields are referenced with underscores instead of dots in the search
+        field_mapping_underline = copy.deepcopy(field_mapping)
+        for field in field_mapping_underline["mapping"].keys():
+            field_mapping_underline["mapping"][field] = field_mapping_underline["mapping"][field].replace(".", "_")
+
+        return self.get_pipeline_from_processing_items([
+            self.get_field_transformation_processing_item(
+                field_mapping_underline['mapping'],
+                logsource_condition
+            ),
+            self.get_state_fields_processing_item(
+                field_mapping_underline['mapping'].values(),
+                logsource_condition
+            )
+        ])
+
     def add_source_macro(self, search: str, data_source_type: str) -> str:
         return "`" + data_source_type + "` " + search
 
@@ -338,14 +388,6 @@ class SigmaConverter():
                 return os.path.join(root, name)
         return None
 
-    def find_mapping(self, field_mappings: list, object: str, data_model: str) -> dict:
-        for mapping in field_mappings:
-            if mapping[object] == data_model:
-                return mapping
-        
-        raise AttributeError("ERROR: Couldn't find mapping.")
-
-
     def add_required_fields(self, field_mapping: dict, detection: Detection) -> None:
         required_fields = list()
 #        required_fields = ["process.user.name", "device.hostname"]
@@ -392,28 +434,3 @@ class SigmaConverter():
 
         detection.tags.observable = observables
 
-
-    def get_cim_to_ocsf_mapping(self, data_source : DataSource) -> dict:
-        cim_to_ocsf_mapping = dict()
-        cim_to_ocsf_mapping["mapping"] = dict()
-        cim_mapping = self.find_mapping(data_source.field_mappings, "data_model", "cim")
-        ocsf_mapping = self.find_mapping(data_source.field_mappings, "data_model", "ocsf")
-
-        for key in cim_mapping["mapping"].keys():
-            cim_field = cim_mapping["mapping"][key].split(".")[1]
-            cim_to_ocsf_mapping["mapping"][cim_field] = ocsf_mapping["mapping"][key]
-
-        return cim_to_ocsf_mapping
-
-
-    def get_mapping_converted_data_source(self, det_ds: DataSource, det_ds_obj: str, det_ds_dm: str,  con_ds: DataSource, con_ds_obj: str, con_ds_dm: str) -> dict:
-        mapping = dict()
-        mapping["mapping"] = dict()
-        det_ds_mapping = self.find_mapping(det_ds.convert_to_log_source, det_ds_obj, det_ds_dm)
-        con_ds_mapping = self.find_mapping(con_ds.field_mappings, con_ds_obj, con_ds_dm)
-
-        for key in det_ds_mapping["mapping"].keys():
-            mapped_field = con_ds_mapping["mapping"][det_ds_mapping["mapping"][key]]
-            mapping["mapping"][key] = mapped_field
-
-        return mapping
\ No newline at end of file
@@ -1,83 +1,156 @@
 import requests
+import requests.adapters
 import xmltodict
 import json
-import functools
-import pickle
-import shelve
 import os
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bin.contentctl_project.contentctl_infrastructure.builder.enrichment_cache import EnrichmentCache
 
 SPLUNKBASE_API_URL = "https://apps.splunk.com/api/apps/entriesbyid/"
 
-APP_ENRICHMENT_CACHE_FILENAME = "lookups/APP_ENRICHMENT_CACHE.db"
-
-NON_PERSISTENT_CACHE = {}
-
-@functools.cache
-def requests_get_helper(url:str, force_cached_or_offline:bool = False)->bytes:
-    if force_cached_or_offline:
-        if not os.path.exists(APP_ENRICHMENT_CACHE_FILENAME):
-            print(f"Cache at {APP_ENRICHMENT_CACHE_FILENAME} not found - Creating it.")
-        cache = shelve.open(APP_ENRICHMENT_CACHE_FILENAME, flag='c', writeback=True)
-    else:
-        cache = NON_PERSISTENT_CACHE
-    
-    if url in cache:
-        req_content = cache[url]
-    else:
-        try:
-            req = requests.get(url)
-            req_content = req.content
-            cache[url] = req_content
-        except Exception as e:
-            raise(Exception(f"ERROR - Failed to get Splunk App Enrichment at {SPLUNKBASE_API_URL}"))
-    
-    if force_cached_or_offline:
-        cache.close()
-    
-    return req_content
+# Relative to the path of the content being built
+APP_ENRICHMENT_CACHE_FILENAME = os.path.join("lookups", "APP_ENRICHMENT_CACHE.sqlite")
+
+# Entries older than this are fetched again when Splunkbase is reachable.  With
+# force_cached_or_offline, entries of any age are used.
+APP_ENRICHMENT_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
 
 
 class SplunkAppEnrichment():
+    # prefetch() takes every TA referenced by the content at once and fetches the ones
+    # that are not in the cache concurrently over one pooled session.  Only the enriched
+    # dict is kept for each TA, not the Splunkbase XML, so enrich_splunk_app is a lookup.
+    cache_file: str = APP_ENRICHMENT_CACHE_FILENAME
+    max_age_seconds: int = APP_ENRICHMENT_CACHE_MAX_AGE_SECONDS
+    max_workers: int = 8
+    results: dict[str, dict] = {}
+    failures: dict[str, Exception] = {}
+    lock: threading.Lock = threading.Lock()
 
-    @classmethod
-    def enrich_splunk_app(self, splunk_ta: str, force_cached_or_offline: bool = False) -> dict:
-        
-        appurl = SPLUNKBASE_API_URL + splunk_ta
-        splunk_app_enriched = dict()
-        
+    @staticmethod
+    def get_connection(input_path: str) -> sqlite3.Connection:
+        return EnrichmentCache.get_connection(os.path.join(input_path, SplunkAppEnrichment.cache_file),
+            "CREATE TABLE IF NOT EXISTS splunk_app (splunk_ta TEXT PRIMARY KEY, enrichment TEXT, fetched_at REAL)")
+
+
+    @staticmethod
+    def load(splunk_tas: list[str], input_path: str, force_cached_or_offline: bool) -> dict[str, dict]:
+        found = {}
+        oldest_allowed = 0 if force_cached_or_offline else time.time() - SplunkAppEnrichment.max_age_seconds
+        connection = SplunkAppEnrichment.get_connection(input_path)
+        for start in range(0, len(splunk_tas), 500):
+            batch = splunk_tas[start:start+500]
+            rows = connection.execute(f"SELECT splunk_ta, enrichment FROM splunk_app WHERE fetched_at >= ? AND splunk_ta IN ({','.join('?' * len(batch))})",
+                [oldest_allowed] + batch).fetchall()
+            for splunk_ta, enrichment in rows:
+                found[splunk_ta] = json.loads(enrichment)
+        EnrichmentCache.close_connection(connection)
+        return found
+
+
+    @staticmethod
+    def save(results: dict[str, dict], input_path: str) -> None:
+        now = time.time()
+        connection = SplunkAppEnrichment.get_connection(input_path)
         try:
-            
-            content = requests_get_helper(appurl, force_cached_or_offline)
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO splunk_app (splunk_ta, enrichment, fetched_at) VALUES (?, ?, ?)",
+                    [(splunk_ta, json.dumps(enrichment, separators=(',', ':')), now) for splunk_ta, enrichment in results.items()])
+        except sqlite3.Error as e:
+            # The enrichment is still served from memory for the rest of the run
+            print(f"Failed to write the cache file {os.path.join(input_path, SplunkAppEnrichment.cache_file)}: {str(e)}")
+        EnrichmentCache.close_connection(connection)
+
+
+    @staticmethod
+    def fetch(splunk_ta: str, session: requests.Session) -> dict:
+        splunk_app_enriched = dict()
+        content = SplunkAppEnrichment.requests_get(SPLUNKBASE_API_URL + splunk_ta, session)
+        response_dict = xmltodict.parse(content)
+
+        # check if list since data changes depending on answer
+        url, results = SplunkAppEnrichment._parse_splunkbase_response(response_dict)
+        # grab the app name
+        for i in results:
+            if i['@name'] == 'appName':
+                splunk_app_enriched['name'] = i['#text']
+        # grab out the splunkbase url
+        if 'entriesbyid' in url:
+            content = SplunkAppEnrichment.requests_get(url, session)
             response_dict = xmltodict.parse(content)
-            
-            # check if list since data changes depending on answer
-            url, results = self._parse_splunkbase_response(response_dict)
-            # grab the app name
-            for i in results:
-                if i['@name'] == 'appName':
-                    splunk_app_enriched['name'] = i['#text']
-            # grab out the splunkbase url  
-            if 'entriesbyid' in url:
-                content = requests_get_helper(url, force_cached_or_offline)
-                response_dict = xmltodict.parse(content)
-                
-                #print(json.dumps(response_dict, indent=2))
-                url, results = self._parse_splunkbase_response(response_dict)
-                # chop the url so we grab the splunkbase portion but not direct download
-                splunk_app_enriched['url'] = url.rsplit('/', 4)[0]
-        except requests.exceptions.ConnectionError as connErr:
-            print(f"There was a connErr for ta {splunk_ta}: {connErr}")
-            # there was a connection error lets just capture the name
-            splunk_app_enriched['name'] = splunk_ta
-            splunk_app_enriched['url'] = ''
+
+            #print(json.dumps(response_dict, indent=2))
+            url, results = SplunkAppEnrichment._parse_splunkbase_response(response_dict)
+            # chop the url so we grab the splunkbase portion but not direct download
+            splunk_app_enriched['url'] = url.rsplit('/', 4)[0]
+        return splunk_app_enriched
+
+
+    @staticmethod
+    def requests_get(url: str, session: requests.Session) -> bytes:
+        try:
+            return session.get(url).content
         except Exception as e:
-            print(f"There was an unknown error enriching the Splunk TA [{splunk_ta}]: {str(e)}")
-            splunk_app_enriched['name'] = splunk_ta
-            splunk_app_enriched['url'] = ''
+            raise(Exception(f"ERROR - Failed to get Splunk App Enrichment at {SPLUNKBASE_API_URL}"))
 
 
-        return splunk_app_enriched
+    @staticmethod
+    def prefetch(splunk_tas: list[str], input_path: str, force_cached_or_offline: bool = False) -> None:
+        with SplunkAppEnrichment.lock:
+            pending = sorted(set(splunk_tas) - SplunkAppEnrichment.results.keys() - SplunkAppEnrichment.failures.keys())
+        if len(pending) == 0:
+            return
+
+        cached = SplunkAppEnrichment.load(pending, input_path, force_cached_or_offline)
+        missing = [splunk_ta for splunk_ta in pending if splunk_ta not in cached]
+
+        fetched = {}
+        failures = {}
+        if len(missing) > 0:
+            workers = min(SplunkAppEnrichment.max_workers, len(missing))
+            print(f"\r{'Splunk App Enrichment'.rjust(23)}: [{len(missing)} TA(s), {workers} workers]...", end="", flush=True)
+            with requests.Session() as session:
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+                session.mount("https://", adapter)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {splunk_ta: executor.submit(SplunkAppEnrichment.fetch, splunk_ta, session) for splunk_ta in missing}
+                for splunk_ta, future in futures.items():
+                    try:
+                        fetched[splunk_ta] = future.result()
+                    except Exception as e:
+                        failures[splunk_ta] = e
+            print("Done!")
+
+            # A TA that Splunkbase did not answer for keeps its last known name and url
+            stale = EnrichmentCache.load_stale(lambda failed: SplunkAppEnrichment.load(failed, input_path, True), list(failures.keys()), force_cached_or_offline)
+            cached.update(stale)
+            for splunk_ta in stale:
+                del failures[splunk_ta]
+
+        with SplunkAppEnrichment.lock:
+            SplunkAppEnrichment.results.update(cached)
+            SplunkAppEnrichment.results.update(fetched)
+            SplunkAppEnrichment.failures.update(failures)
+        if len(fetched) > 0:
+            SplunkAppEnrichment.save(fetched, input_path)
+
+
+    @classmethod
+    def enrich_splunk_app(self, splunk_ta: str, input_path: str, force_cached_or_offline: bool = False) -> dict:
+        if splunk_ta not in self.results and splunk_ta not in self.failures:
+            self.prefetch([splunk_ta], input_path, force_cached_or_offline)
+
+        if splunk_ta in self.results:
+            # Every detection gets its own copy
+            return dict(self.results[splunk_ta])
+
+        print(f"There was an unknown error enriching the Splunk TA [{splunk_ta}]: {str(self.failures[splunk_ta])}")
+        # there was an error lets just capture the name
+        return {'name': splunk_ta, 'url': ''}
 
     def _parse_splunkbase_response(response_dict):
         if isinstance(response_dict['feed']['entry'], list):
@@ -87,4 +160,3 @@ class SplunkAppEnrichment():
             url = response_dict['feed']['entry']['link']['@href']
             results = response_dict['feed']['entry']['content']['s:dict']['s:key']
         return url, results
-
@@ -0,0 +1,111 @@
+import json
+import os
+from typing import Iterator
+
+STIX_BUNDLE_CHUNK_SIZE = 1024 * 1024
+
+
+class StixBundleReader():
+    # Streams the objects of a STIX bundle (e.g. enterprise-attack.json from
+    # https://github.com/mitre-attack/attack-stix-data) one at a time.  Only the
+    # current object and one chunk of the file are held in memory, instead of the
+    # whole bundle, which is several hundred megabytes once parsed.
+    file_path: str
+    file_size: int
+    bytes_read: int
+    decoder: json.JSONDecoder
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+        self.bytes_read = 0
+        self.decoder = json.JSONDecoder()
+
+
+    def objects(self) -> Iterator[dict]:
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            self.file = f
+            self.buffer = ""
+            self.position = 0
+
+            self.expect('{')
+            if self.peek() == '}':
+                return
+            while True:
+                key = self.decode()
+                self.expect(':')
+                if key == "objects":
+                    yield from self.array()
+                else:
+                    self.decode()
+                if self.next_token() == '}':
+                    return
+                self.position -= 1
+                self.expect(',')
+
+
+    def progress(self) -> float:
+        if self.file_size == 0:
+            return 100.0
+        return (self.bytes_read / self.file_size) * 100
+
+
+    def array(self) -> Iterator[dict]:
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.decode()
+            token = self.next_token()
+            if token == ']':
+                return
+            if token != ',':
+                raise(Exception(f"Malformed STIX bundle {self.file_path}: expected ',' or ']' but found '{token}'"))
+
+
+    def fill(self) -> bool:
+        # Drops everything that has already been consumed and appends the next chunk
+        chunk = self.file.read(STIX_BUNDLE_CHUNK_SIZE)
+        self.bytes_read = min(self.file_size, self.bytes_read + len(chunk.encode('utf-8')))
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return len(chunk) > 0
+
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise(Exception(f"Malformed STIX bundle {self.file_path}: unexpected end of file"))
+
+
+    def next_token(self) -> str:
+        token = self.peek()
+        self.position += 1
+        return token
+
+
+    def expect(self, expected: str) -> None:
+        token = self.next_token()
+        if token != expected:
+            raise(Exception(f"Malformed STIX bundle {self.file_path}: expected '{expected}' but found '{token}'"))
+
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as e:
+                if not self.fill():
+                    raise(Exception(f"Malformed STIX bundle {self.file_path}: {str(e)}"))
+                continue
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self.fill():
+                # A number at the very end of the buffer may continue in the next chunk
+                continue
+            self.position = end
+            return value
@@ -3,10 +3,34 @@ from typing import Dict
 import yaml
 import sys
 
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import ContentCache
+
 class YmlReader():
 
     @staticmethod
     def load_file(file_path: str) -> Dict:
+        if ContentCache.enabled:
+            yml_obj = YmlReader.load_file_cached(file_path)
+        else:
+            yml_obj = YmlReader.parse_file(file_path)
+
+        yml_obj['file_path'] = file_path
+
+        if 'deprecated' in file_path:
+            yml_obj['deprecated'] = True
+        else:
+            yml_obj['deprecated'] = False
+
+        if 'experimental' in file_path:
+            yml_obj['experimental'] = True
+        else:
+            yml_obj['experimental'] = False
+
+        return yml_obj
+
+
+    @staticmethod
+    def parse_file(file_path: str) -> Dict:
         try:
             file_handler = open(file_path, 'r', encoding="utf-8")
             try:
@@ -19,16 +43,19 @@ class YmlReader():
             print(exc)
             sys.exit(1)
 
-        yml_obj['file_path'] = file_path
+        return yml_obj
 
-        if 'deprecated' in file_path:
-            yml_obj['deprecated'] = True
-        else:
-            yml_obj['deprecated'] = False
 
-        if 'experimental' in file_path:
-            yml_obj['experimental'] = True
-        else:
-            yml_obj['experimental'] = False
+    @staticmethod
+    def load_file_cached(file_path: str) -> Dict:
+        try:
+            digest = ContentCache.file_digest(file_path)
+        except OSError as exc:
+            print(exc)
+            sys.exit(1)
 
+        yml_obj = ContentCache.get("yml", file_path, digest)
+        if yml_obj is None:
+            yml_obj = YmlReader.parse_file(file_path)
+            ContentCache.put("yml", file_path, digest, yml_obj)
         return yml_obj
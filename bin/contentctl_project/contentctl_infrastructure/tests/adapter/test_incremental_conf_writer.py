@@ -0,0 +1,57 @@
+import os
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.incremental_conf_writer import IncrementalConfWriter
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
+
+
+def load_macros():
+    director = SecurityContentDirector()
+    macros = []
+    for macro_file in ['powershell.yml', 'process_reg.yml', 'security_content_ctime.yml']:
+        macro_builder = SecurityContentBasicBuilder()
+        director.constructMacro(macro_builder, os.path.join(os.path.dirname(__file__),
+            '../builder/test_data/macro', macro_file))
+        macros.append(macro_builder.getObject())
+    return macros
+
+
+def write_incremental(input_path, output_path, macros):
+    writer = IncrementalConfWriter(input_path, output_path)
+    writer.writeConfFileHeader(os.path.join(output_path, 'macros.conf'))
+    writer.writeConfFile('macros.j2', os.path.join(output_path, 'macros.conf'), macros)
+    writer.finalize()
+    return writer
+
+
+def test_incremental_conf_writer(tmp_path):
+    input_path = str(tmp_path / "content")
+    output_path = str(tmp_path / "output")
+    os.makedirs(input_path)
+    os.makedirs(output_path)
+    macros = load_macros()
+
+    writer = write_incremental(input_path, output_path, macros)
+    assert writer.rendered == len(macros)
+    assert writer.reused == 0
+    with open(os.path.join(output_path, 'macros.conf'), 'r') as f:
+        output = f.read()
+    assert output.endswith(ConfWriter.renderConfFile('macros.j2', macros))
+
+    # Nothing changed, so every stanza is reused and the file is left alone
+    modified_time = os.path.getmtime(os.path.join(output_path, 'macros.conf'))
+    writer = write_incremental(input_path, output_path, macros)
+    assert writer.rendered == 0
+    assert writer.reused == len(macros)
+    assert os.path.getmtime(os.path.join(output_path, 'macros.conf')) == modified_time
+
+    # Only the changed macro is rendered again
+    macros[1].definition = "index=changed"
+    writer = write_incremental(input_path, output_path, macros)
+    assert writer.rendered == 1
+    assert writer.reused == len(macros) - 1
+    with open(os.path.join(output_path, 'macros.conf'), 'r') as f:
+        output = f.read()
+    assert "definition = index=changed" in output
+    assert output.endswith(ConfWriter.renderConfFile('macros.j2', macros))
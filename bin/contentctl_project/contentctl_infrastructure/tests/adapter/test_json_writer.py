@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter, JsonArrayWriter
+
+OBJECTS = [
+    {"id": "9b4e8b2a-1c1e-4f44-9d6b-5c2c8a5d1a10", "name": "Détection One", "tags": {"risk_score": 56.5}},
+    {"id": "0f6d1a0c-6b43-4bd0-8a0e-5d2f2f7f8c11", "name": "Detection Two", "tags": {}},
+    {"name": "macro_without_id", "definition": "search *"},
+]
+
+
+def test_json_array_writer_matches_json_dump(tmp_path):
+    with JsonArrayWriter(str(tmp_path), 'detections.json', 'detections') as writer:
+        for obj in OBJECTS:
+            writer.write(obj)
+    JsonWriter.writeJsonObject(str(tmp_path / 'expected.json'), {'detections': OBJECTS})
+    with open(tmp_path / 'detections.json', 'rb') as f, open(tmp_path / 'expected.json', 'rb') as g:
+        assert f.read() == g.read()
+    assert not os.path.exists(tmp_path / 'detections.index.json')
+
+    with JsonArrayWriter(str(tmp_path), 'empty.json', 'empty') as writer:
+        pass
+    with open(tmp_path / 'empty.json') as f:
+        assert f.read() == json.dumps({'empty': []})
+
+
+def test_json_array_writer_ndjson_and_shards(tmp_path):
+    os.makedirs(tmp_path / 'detections')
+    with open(tmp_path / 'detections' / 'stale.json', 'w') as f:
+        f.write('{}')
+
+    with JsonArrayWriter(str(tmp_path), 'detections.json', 'detections', compact=True, ndjson=True, shards=True) as writer:
+        for obj in OBJECTS:
+            writer.write(obj)
+
+    with open(tmp_path / 'detections.json') as f:
+        assert json.load(f) == {'detections': OBJECTS}
+    with open(tmp_path / 'detections.index.json') as f:
+        index = json.load(f)['detections']
+    assert list(index) == ["9b4e8b2a-1c1e-4f44-9d6b-5c2c8a5d1a10", "0f6d1a0c-6b43-4bd0-8a0e-5d2f2f7f8c11", "macro_without_id"]
+
+    with open(tmp_path / 'detections.ndjson', 'rb') as f:
+        lines = f.read().splitlines()
+        for obj, line in zip(OBJECTS, lines):
+            entry = index[str(obj.get('id') or obj['name'])]
+            f.seek(entry['offset'])
+            assert f.read(entry['length']) == line
+            assert json.loads(line) == obj
+            with open(tmp_path / entry['shard']) as shard:
+                assert json.load(shard) == obj
+    assert sorted(os.listdir(tmp_path / 'detections')) == sorted(os.path.basename(entry['shard']) for entry in index.values())
+
+
+def test_json_array_writer_shard_collisions(tmp_path):
+    with JsonArrayWriter(str(tmp_path), 'macros.json', 'macros', shards=True) as writer:
+        writer.write({"name": "Foo.Bar"})
+        writer.write({"name": "foo_bar"})
+        # A second object under the same key would replace the first in the index
+        with pytest.raises(ValueError):
+            writer.write({"name": "foo_bar"})
+
+    with open(tmp_path / 'macros.index.json') as f:
+        index = json.load(f)['macros']
+    assert index['Foo.Bar']['shard'] == 'macros/foo_bar.json'
+    assert index['foo_bar']['shard'].startswith('macros/foo_bar_')
+    for name, entry in index.items():
+        with open(tmp_path / entry['shard']) as shard:
+            assert json.load(shard) == {"name": name}
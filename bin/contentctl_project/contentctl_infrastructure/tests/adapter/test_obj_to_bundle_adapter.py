@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_bundle_adapter import ObjToBundleAdapter
+from bin.contentctl_project.contentctl_infrastructure.builder.content_bundle import ContentBundle, CONTENT_BUNDLE_FILENAME, CONTENT_BUNDLE_VERSION
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+
+
+def write_bundle(output_path: str) -> dict:
+    director = SecurityContentDirector()
+
+    macro_builder = SecurityContentBasicBuilder()
+    director.constructMacro(macro_builder, os.path.join(SECURITY_CONTENT_ROOT, 'macros', 'azuread.yml'))
+    macro = macro_builder.getObject()
+
+    lookup_builder = SecurityContentBasicBuilder()
+    director.constructLookup(lookup_builder, os.path.join(SECURITY_CONTENT_ROOT, 'lookups', 'privileged_azure_ad_roles.yml'))
+    lookup = lookup_builder.getObject()
+
+    detection_builder = SecurityContentDetectionBuilder(force_cached_or_offline=True, skip_enrichment=True)
+    director.constructDetection(detection_builder, os.path.join(SECURITY_CONTENT_ROOT, 'detections', 'cloud',
+        'azure_ad_privileged_role_assigned.yml'), [], [], [], {}, [macro], [lookup], SECURITY_CONTENT_ROOT)
+    detection = detection_builder.getObject()
+
+    adapter = ObjToBundleAdapter()
+    adapter.writeObjects([detection], output_path, SecurityContentType.detections)
+    adapter.writeObjects([macro], output_path, SecurityContentType.macros)
+    adapter.writeObjects([lookup], output_path, SecurityContentType.lookups)
+    adapter.finalize(output_path)
+    return {'detection': detection, 'macro': macro, 'lookup': lookup}
+
+
+def test_bundle_round_trip(tmp_path):
+    content = write_bundle(str(tmp_path))
+    detection = content['detection']
+    assert os.listdir(tmp_path) == [CONTENT_BUNDLE_FILENAME]
+
+    with ContentBundle(str(tmp_path / CONTENT_BUNDLE_FILENAME)) as bundle:
+        assert bundle.connection is None
+        assert bundle.get_metadata()['format_version'] == CONTENT_BUNDLE_VERSION
+        assert bundle.get_names(SecurityContentType.detections) == [detection.name]
+
+        stored = bundle.get(SecurityContentType.detections, detection.name)
+        assert stored['id'] == detection.id
+        assert stored['search'] == detection.search
+        assert 'macros' not in stored and 'lookups' not in stored
+        assert bundle.get_by_id(detection.id) == stored
+        assert bundle.get('detections', 'does not exist') is None
+
+        assert bundle.get_references(SecurityContentType.detections, detection.name, SecurityContentType.macros) == [content['macro'].dict(exclude_none=True)]
+        assert [lookup['name'] for lookup in bundle.get_references(SecurityContentType.detections, detection.name, SecurityContentType.lookups)] == [content['lookup'].name]
+        assert bundle.get_reference_names(SecurityContentType.detections, detection.name, SecurityContentType.stories) == sorted(detection.tags.analytic_story)
+        # The stories are not part of this bundle
+        assert bundle.get_references(SecurityContentType.detections, detection.name, SecurityContentType.stories) == []
+        assert bundle.get_referencing(SecurityContentType.macros, content['macro'].name, SecurityContentType.detections) == [stored]
+
+
+def test_bundle_replaced_and_versioned(tmp_path):
+    write_bundle(str(tmp_path))
+    # Regenerating replaces the bundle in place
+    write_bundle(str(tmp_path))
+    bundle_file = str(tmp_path / CONTENT_BUNDLE_FILENAME)
+    assert ContentBundle(bundle_file).get_metadata()['count_detections'] == '1'
+
+    connection = sqlite3.connect(bundle_file)
+    connection.execute("UPDATE meta SET value = 'old' WHERE key = 'format_version'")
+    connection.commit()
+    connection.close()
+    with pytest.raises(Exception, match="format version old"):
+        ContentBundle(bundle_file).get_metadata()
+
+    with pytest.raises(Exception, match="does not exist"):
+        ContentBundle(str(tmp_path / 'missing.sqlite')).get_metadata()
@@ -57,11 +57,11 @@ def test_write_conf_files(patch_datetime_now):
     detection_builder = SecurityContentDetectionBuilder()
     director.constructDetection(detection_builder, os.path.join(os.path.dirname(__file__), 
         '../builder/test_data/detection/valid.yml'), [deployment], [playbook], [baseline], [test],
-        {}, [], [])
+        {}, [], [], SECURITY_CONTENT_ROOT)
     detection = detection_builder.getObject()
     director.constructDetection(detection_builder, os.path.join(os.path.dirname(__file__), 
         '../builder/test_data/detection/deprecated/detect_new_user_aws_console_login.yml'), [deployment], [playbook], [baseline], [test],
-        {}, [], [])
+        {}, [], [], SECURITY_CONTENT_ROOT)
     detection_deprecated = detection_builder.getObject()
     investigation_builder = SecurityContentInvestigationBuilder()
     director.constructInvestigation(investigation_builder, os.path.join(os.path.dirname(__file__), 
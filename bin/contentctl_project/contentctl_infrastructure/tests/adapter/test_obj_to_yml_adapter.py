@@ -33,7 +33,7 @@ def test_write_ssa_detection():
     detection_builder = SecurityContentDetectionBuilder()
     director.constructDetection(detection_builder, os.path.join(os.path.dirname(__file__), 
         'obj_to_yml_data/ssa___anomalous_usage_of_archive_tools.yml'), [], [], [], [test],
-        {}, [], [])
+        {}, [], [], SECURITY_CONTENT_ROOT)
     detection = detection_builder.getObject()
 
     adapter = ObjToYmlAdapter(input_path = SECURITY_CONTENT_ROOT)
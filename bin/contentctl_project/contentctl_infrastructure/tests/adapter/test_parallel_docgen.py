@@ -0,0 +1,42 @@
+import os
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.jinja_writer import JinjaWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_md_adapter import ObjToMdAdapter
+
+
+def write_pages(output_path, names, workers):
+    adapter = ObjToMdAdapter(workers=workers)
+    adapter.files_to_write = len(names)
+    pages = [('doc_navigation_pages.j2', os.path.join(output_path, name + '.md'), {'name': name}) for name in names]
+    if workers > 1:
+        adapter.writePagesParallel(pages)
+    else:
+        adapter.writePages(pages)
+    return adapter.written
+
+
+def test_parallel_docgen_matches_sequential(tmp_path):
+    names = [f"Category {i}" for i in range(20)]
+    sequential = tmp_path / "sequential"
+    parallel = tmp_path / "parallel"
+    os.makedirs(sequential)
+    os.makedirs(parallel)
+    assert write_pages(str(sequential), names, 1) == 20
+    assert write_pages(str(parallel), names, 3) == 20
+    for name in names:
+        with open(sequential / (name + '.md')) as f, open(parallel / (name + '.md')) as g:
+            assert f.read() == g.read()
+
+
+def test_unchanged_pages_are_not_rewritten(tmp_path):
+    names = ["Endpoint", "Network"]
+    assert write_pages(str(tmp_path), names, 2) == 2
+    os.utime(tmp_path / "Endpoint.md", (0, 0))
+    os.utime(tmp_path / "Network.md", (0, 0))
+    with open(tmp_path / "Network.md", 'a') as f:
+        f.write("edited by hand")
+
+    assert write_pages(str(tmp_path), names, 2) == 1
+    assert os.path.getmtime(tmp_path / "Endpoint.md") == 0
+    assert os.path.getmtime(tmp_path / "Network.md") != 0
+    assert JinjaWriter.writeIfChanged(str(tmp_path / "Endpoint.md"), open(tmp_path / "Endpoint.md").read()) is False
@@ -0,0 +1,59 @@
+import glob
+import os
+
+from jinja2 import Environment, FileSystemLoader
+
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
+from bin.contentctl_project.contentctl_core.domain.entities.detection_tags import DetectionTags
+from bin.contentctl_project.contentctl_infrastructure.adapter.placeholder_substitutor import PlaceholderSubstitutor
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry, TEMPLATE_DIRECTORY
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_director import SecurityContentDirector
+
+
+def test_placeholder_substitutor_matches_sequential_replace():
+    detection = Detection.construct(name="Detect Thing", type="TTP", description="50% of %name% hosts", search="| tstats count",
+        tags=DetectionTags.construct(name="tag name", risk_score=56, message="on %dest%", analytic_story=["Story"]))
+    strings = [
+        "%name%",
+        "Risk %risk_score% for %name%",
+        "%search%%type%",
+        "no placeholders",
+        "%unknown% %name% 100%",
+        "%%name%%",
+        "%name%name%",
+        "%na%name%me%",
+        "%description%",
+        "%message%",
+        "%tags%",
+        "%dict%",
+        "%_abc_impl% %__class__%",
+        "%risk_score%%risk_score%",
+    ]
+    for string in strings:
+        assert PlaceholderSubstitutor.substitute(string, detection) == PlaceholderSubstitutor.substitute_sequentially(string, detection), string
+
+
+def test_placeholder_substitutor_savedsearches_identical():
+    # savedsearches.conf for the repository's detections, rendered with the placeholder
+    # substitutor and with the attribute by attribute replacement it replaced
+    director = SecurityContentDirector()
+    deployments = []
+    for deployment_file in sorted(glob.glob(os.path.join(SECURITY_CONTENT_ROOT, 'deployments', '*.yml'))):
+        deployment_builder = SecurityContentBasicBuilder()
+        director.constructDeployment(deployment_builder, deployment_file)
+        deployments.append(deployment_builder.getObject())
+
+    detections = []
+    detection_builder = SecurityContentDetectionBuilder(skip_enrichment=True)
+    for detection_file in sorted(glob.glob(os.path.join(SECURITY_CONTENT_ROOT, 'detections', 'endpoint', '*.yml')))[:150]:
+        director.constructDetection(detection_builder, detection_file, deployments, [], [], {}, [], [], SECURITY_CONTENT_ROOT)
+        detections.append(detection_builder.getObject())
+    assert any(detection.deployment.notable for detection in detections)
+
+    sequential = Environment(loader=FileSystemLoader(TEMPLATE_DIRECTORY), trim_blocks=True)
+    sequential.filters['custom_jinja2_enrichment_filter'] = PlaceholderSubstitutor.substitute_sequentially
+    expected = sequential.get_template('savedsearches_detections.j2').render(objects=detections)
+    assert TemplateRegistry.get_template('savedsearches_detections.j2').render(objects=detections) == expected
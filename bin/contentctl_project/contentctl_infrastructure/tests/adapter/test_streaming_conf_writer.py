@@ -0,0 +1,27 @@
+import os
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.streaming_conf_writer import StreamingConfWriter
+from bin.contentctl_project.contentctl_infrastructure.tests.adapter.test_incremental_conf_writer import load_macros
+
+
+def test_streaming_conf_writer(tmp_path):
+    output_path = os.path.join(str(tmp_path), 'macros.conf')
+    macros = load_macros()
+    macros[0].description = "Non ASCII characters – like this dash – are dropped"
+
+    writer = StreamingConfWriter()
+    writer.writeConfFileHeader(output_path)
+    writer.writeConfFile('macros.j2', output_path, macros[:1])
+    writer.writeConfFile('macros.j2', output_path, macros[1:])
+    # Every template is flushed, so the file is complete before finalize
+    with open(output_path, 'r') as f:
+        output = f.read()
+    writer.finalize()
+    assert writer.handles == {}
+
+    expected = (ConfWriter.renderConfFile('macros.j2', macros[:1]) + ConfWriter.renderConfFile('macros.j2', macros[1:])).encode('ascii', 'ignore').decode('ascii')
+    assert "Non ASCII characters  like this dash  are dropped" in output
+    assert output.endswith(expected)
+    with open(output_path, 'r') as f:
+        assert f.read() == output
@@ -0,0 +1,28 @@
+import os
+
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
+
+
+def test_template_registry_compiles_once(monkeypatch):
+    monkeypatch.setattr(TemplateRegistry, "environments", {})
+    monkeypatch.setattr(TemplateRegistry, "bytecode_cache_directory", None)
+    assert TemplateRegistry.get_template('macros.j2') is TemplateRegistry.get_template('macros.j2')
+    assert TemplateRegistry.get_template('macros.j2') is not TemplateRegistry.get_template('macros.j2', trim_blocks=False)
+    assert TemplateRegistry.get_environment(trim_blocks=False).trim_blocks is False
+
+
+def test_template_registry_bytecode_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(TemplateRegistry, "environments", {})
+    TemplateRegistry.initialize(str(tmp_path))
+    # Nothing is compiled or written until a template is used
+    assert os.listdir(tmp_path) == []
+    TemplateRegistry.precompile()
+    # Each trim_blocks setting compiles to different code, so they are cached apart
+    templates = len(TemplateRegistry.get_environment().list_templates(extensions=['j2']))
+    assert len(os.listdir(tmp_path / "trim_blocks_true")) == templates
+    assert len(os.listdir(tmp_path / "trim_blocks_false")) == templates
+
+    rendered = TemplateRegistry.get_template('header.j2').render(time="2022-01-01T00:00:00")
+    TemplateRegistry.initialize(str(tmp_path))
+    assert TemplateRegistry.get_template('header.j2').render(time="2022-01-01T00:00:00") == rendered
+    monkeypatch.setattr(TemplateRegistry, "bytecode_cache_directory", None)
@@ -1,9 +1,91 @@
+import json
+import os
+
 from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
 
-from bin.contentctl_project.contentctl_infrastructure.builder.attack_enrichment import AttackEnrichment
+from bin.contentctl_project.contentctl_infrastructure.builder.attack_enrichment import AttackEnrichment, ATTACK_LOOKUP_CACHE_FILENAME
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import CONTENT_CACHE_DIRECTORY
 
 
 
 def test_mitre_attack_enrichment():
     attack_enrichment = AttackEnrichment.get_attack_lookup(SECURITY_CONTENT_ROOT)
     assert attack_enrichment["T1003.002"]["technique"] == "Security Account Manager"
+
+
+def test_build_attack_lookup():
+    techniques = [
+        {"id": "attack-pattern--1", "technique_id": "T1003", "technique": "OS Credential Dumping", "tactic": ["credential-access"]},
+        {"id": "attack-pattern--2", "technique_id": "T1059", "technique": "Command and Scripting Interpreter", "tactic": ["execution"]},
+        {"id": "attack-pattern--3", "technique_id": "T9999", "technique": "Revoked Technique", "revoked": True},
+    ]
+    relationships = [
+        {"source_ref": "intrusion-set--1", "target_ref": "attack-pattern--1"},
+        {"source_ref": "malware--1", "target_ref": "attack-pattern--1"},
+        {"source_ref": "intrusion-set--2", "target_ref": "attack-pattern--1"},
+        {"source_ref": "intrusion-set--2", "target_ref": "attack-pattern--2"},
+    ]
+    groups = [
+        {"id": "intrusion-set--1", "name": "APT28"},
+        {"id": "intrusion-set--2", "name": "Wizard Spider"},
+    ]
+    attack_lookup = AttackEnrichment.build_attack_lookup(techniques, relationships, groups)
+    assert attack_lookup == {
+        "T1003": {"technique": "OS Credential Dumping", "tactics": ["Credential Access"], "groups": ["APT28", "Wizard Spider"]},
+        "T1059": {"technique": "Command and Scripting Interpreter", "tactics": ["Execution"], "groups": ["Wizard Spider"]},
+    }
+
+
+def test_cached_attack_lookup(tmp_path):
+    cache_path = str(tmp_path / "attack_lookup.pickle")
+    attack_lookup = {"T1003": {"technique": "OS Credential Dumping", "tactics": ["Credential Access"], "groups": ["APT|28"]}}
+    assert AttackEnrichment.load_cached_lookup(cache_path, "14.1") is None
+
+    AttackEnrichment.store_cached_lookup(cache_path, "14.1", attack_lookup)
+    assert AttackEnrichment.load_cached_lookup(cache_path, "14.1") == attack_lookup
+    assert AttackEnrichment.load_cached_lookup(cache_path, "15.0") is None
+
+
+def test_offline_attack_lookup_reads_csv(tmp_path):
+    # Offline runs use the committed csv even when a lookup is cached locally
+    input_path = tmp_path / "content"
+    os.makedirs(input_path / "lookups")
+    csv_lookup = {"T1003": {"technique": "OS Credential Dumping", "tactics": ["Credential Access"], "groups": ["APT28"]}}
+    AttackEnrichment.write_csv(str(input_path / "lookups" / "mitre_enrichment.csv"), csv_lookup)
+    AttackEnrichment.store_cached_lookup(str(input_path / CONTENT_CACHE_DIRECTORY / ATTACK_LOOKUP_CACHE_FILENAME), "14.1",
+                                         {"T1059": {"technique": "Command and Scripting Interpreter", "tactics": ["Execution"], "groups": ["no"]}})
+    assert AttackEnrichment.get_attack_lookup(str(input_path), force_cached_or_offline=True) == csv_lookup
+
+
+def test_attack_lookup_from_bundle(tmp_path):
+    bundle = {
+        "type": "bundle",
+        "id": "bundle--1",
+        "objects": [
+            {"type": "x-mitre-collection", "id": "x-mitre-collection--1", "modified": "2023-04-25T14:00:00.000Z", "x_mitre_version": "13.0"},
+            {"type": "attack-pattern", "id": "attack-pattern--1", "name": "OS Credential Dumping", "revoked": False,
+             "external_references": [{"source_name": "mitre-attack", "external_id": "T1003"}],
+             "kill_chain_phases": [{"kill_chain_name": "mitre-attack", "phase_name": "credential-access"}]},
+            {"type": "attack-pattern", "id": "attack-pattern--2", "name": "Revoked Technique", "revoked": True,
+             "external_references": [{"source_name": "mitre-attack", "external_id": "T9999"}]},
+            {"type": "intrusion-set", "id": "intrusion-set--1", "name": "APT|28"},
+            {"type": "intrusion-set", "id": "intrusion-set--2", "name": "Deprecated Group", "x_mitre_deprecated": True},
+            {"type": "relationship", "id": "relationship--1", "relationship_type": "uses", "source_ref": "intrusion-set--1", "target_ref": "attack-pattern--1"},
+            {"type": "relationship", "id": "relationship--2", "relationship_type": "uses", "source_ref": "intrusion-set--2", "target_ref": "attack-pattern--1"},
+        ],
+        "spec_version": "2.0"
+    }
+    bundle_path = str(tmp_path / "enterprise-attack.json")
+    with open(bundle_path, "w") as f:
+        json.dump(bundle, f, indent=4)
+    input_path = str(tmp_path / "content")
+    os.makedirs(input_path)
+
+    expected = {"T1003": {"technique": "OS Credential Dumping", "tactics": ["Credential Access"], "groups": ["APT|28"]}}
+    assert AttackEnrichment.get_attack_lookup(input_path, attack_bundle=bundle_path) == expected
+
+    # The second run finds a cached lookup for version 13.0 and stops at the collection object
+    bundle["objects"][1]["name"] = "Changed"
+    with open(bundle_path, "w") as f:
+        json.dump(bundle, f, indent=4)
+    assert AttackEnrichment.get_attack_lookup(input_path, attack_bundle=bundle_path) == expected
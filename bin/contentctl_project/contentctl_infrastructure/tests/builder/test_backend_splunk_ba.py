@@ -0,0 +1,31 @@
+from bin.contentctl_project.contentctl_infrastructure.builder.backend_splunk_ba import SplunkBABackend
+
+
+MAPPING = SplunkBABackend.freeze_mapping({"mapping": {
+    "Image": "process.file.path",
+    "CommandLine": "process.cmd_line",
+    "ParentImage": "actor.process.file.path",
+    "User": "actor.user.name",
+    "OriginalFileName": "process.file.name"
+}})
+
+
+def test_compile_preamble():
+    preamble = SplunkBABackend.compile_preamble(MAPPING, None)
+    assert preamble.startswith(' | from read_ba_enriched_events() ')
+    # Every map is read once, before the fields below it
+    assert preamble.count('| eval process=') == 1
+    assert preamble.count('| eval process_file=') == 1
+    assert preamble.index('| eval process_file=') < preamble.index('| eval process_file_path=') < preamble.index('| eval process_file_name=')
+    assert '| eval process_file_path=ucast(map_get(process_file,"path"), "string", null) ' in preamble
+    assert '| eval actor_user=ucast(map_get(actor,"user"), "map<string, any>", null) ' in preamble
+
+    # Only the fields a search references, and the maps they are read from
+    preamble = SplunkBABackend.compile_preamble(MAPPING, frozenset(["process_cmd_line", "actor_user", "device_hostname"]))
+    assert '| eval process=' in preamble
+    assert '| eval process_cmd_line=' in preamble
+    assert '| eval actor_user=' in preamble
+    assert 'process_file' not in preamble
+    assert 'actor_process' not in preamble
+    assert 'actor_user_name' not in preamble
+    assert SplunkBABackend.compile_preamble(MAPPING, frozenset(["process_cmd_line", "actor_user", "device_hostname"])) is preamble
@@ -0,0 +1,45 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.builder.content_watcher import ContentWatcher
+
+
+def first_change(watcher: ContentWatcher, change) -> list[str]:
+    changes = queue.Queue()
+    threading.Thread(target=lambda: changes.put(next(watcher.watch())), daemon=True).start()
+    # Give the polling watcher time to take its first snapshot
+    time.sleep(0.1)
+    change()
+    return changes.get(timeout=5)
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_content_watcher(tmp_path, use_inotify):
+    os.makedirs(tmp_path / 'macros')
+    with open(tmp_path / 'macros' / 'cloudtrail.yml', 'w') as f:
+        f.write('name: cloudtrail\n')
+    watcher = ContentWatcher([str(tmp_path / 'macros'), str(tmp_path / 'missing')], poll_interval_seconds=0.05, use_inotify=use_inotify)
+    if use_inotify and watcher.inotify_fd is None:
+        pytest.skip("inotify is not available")
+
+    def save():
+        # Written next to the file and renamed over it, as many editors do
+        with open(tmp_path / 'macros' / 'cloudtrail.yml.swp', 'w') as f:
+            f.write('name: cloudtrail\ndefinition: sourcetype=aws:cloudtrail\n')
+        os.replace(tmp_path / 'macros' / 'cloudtrail.yml.swp', tmp_path / 'macros' / 'cloudtrail.yml')
+        os.makedirs(tmp_path / 'macros' / 'new')
+        with open(tmp_path / 'macros' / 'new' / 'added.yml', 'w') as f:
+            f.write('name: added\n')
+
+    changed = first_change(watcher, save)
+    if use_inotify:
+        # The new directory is watched from the event creating it, the file in it may or
+        # may not have been written by then and is reported once it is
+        assert str(tmp_path / 'macros' / 'cloudtrail.yml') in changed
+    else:
+        assert changed == sorted([str(tmp_path / 'macros' / 'cloudtrail.yml'), str(tmp_path / 'macros' / 'new' / 'added.yml')])
+    watcher.close()
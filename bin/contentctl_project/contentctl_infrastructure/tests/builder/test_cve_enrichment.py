@@ -1,10 +1,47 @@
+import gzip
+import json
 
-
-from bin.contentctl_project.contentctl_infrastructure.builder.cve_enrichment import CveEnrichment
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+from bin.contentctl_project.contentctl_infrastructure.builder.cve_enrichment import CveEnrichment, CveEnrichmentStore
+from bin.contentctl_project.contentctl_infrastructure.builder.enrichment_cache import EnrichmentCache
 
 
 def test_cve_enrichment():
-    cve_enrichment = CveEnrichment.enrich_cve('CVE-2021-34527')
+    cve_enrichment = CveEnrichment.enrich_cve('CVE-2021-34527', SECURITY_CONTENT_ROOT)
     assert cve_enrichment['id'] == 'CVE-2021-34527'
     assert cve_enrichment['cvss'] == 9.0
-    assert cve_enrichment['summary'] == 'Windows Print Spooler Remote Code Execution Vulnerability'
\ No newline at end of file
+    assert cve_enrichment['summary'] == 'Windows Print Spooler Remote Code Execution Vulnerability'
+
+def test_cve_enrichment_store_nvd_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(CveEnrichmentStore, "cache_file", str(tmp_path / "CVE_CACHE.sqlite"))
+    monkeypatch.setattr(CveEnrichmentStore, "results", {})
+    monkeypatch.setattr(CveEnrichmentStore, "failures", {})
+    monkeypatch.setattr(CveEnrichmentStore, "fetch", lambda cve_id: (_ for _ in ()).throw(Exception(f"{cve_id} fetched")))
+
+    feed = {"CVE_Items": [{
+        "cve": {"CVE_data_meta": {"ID": "CVE-2021-34527"},
+                "description": {"description_data": [{"lang": "en", "value": "Windows Print Spooler Remote Code Execution Vulnerability"}]}},
+        "impact": {"baseMetricV3": {"cvssV3": {"baseScore": 8.8}}, "baseMetricV2": {"cvssV2": {"baseScore": 9.0}}}}]}
+    feed_path = tmp_path / "nvdcve-1.1-2021.json.gz"
+    with gzip.open(feed_path, 'wt') as f:
+        json.dump(feed, f)
+    assert CveEnrichmentStore.import_nvd_feed(str(feed_path), str(tmp_path)) == 1
+
+    # A fresh process only has the SQLite file to go on
+    CveEnrichmentStore.results.clear()
+    CveEnrichmentStore.prefetch(["CVE-2021-34527", "CVE-2021-34527", "CVE-1999-0001"], str(tmp_path), force_cached_or_offline=True)
+    cve_enrichment = CveEnrichment.enrich_cve('CVE-2021-34527', str(tmp_path), force_cached_or_offline=True)
+    assert cve_enrichment == {'id': 'CVE-2021-34527', 'cvss': 9.0, 'summary': 'Windows Print Spooler Remote Code Execution Vulnerability'}
+    assert CveEnrichment.enrich_cve('CVE-1999-0001', str(tmp_path), force_cached_or_offline=True) == {}
+    assert "CVE-1999-0001" in CveEnrichmentStore.failures
+
+def test_cve_enrichment_store_without_lookups(tmp_path, monkeypatch):
+    monkeypatch.setattr(EnrichmentCache, "memory_connections", {})
+    monkeypatch.setattr(CveEnrichmentStore, "results", {})
+    monkeypatch.setattr(CveEnrichmentStore, "failures", {})
+    monkeypatch.setattr(CveEnrichmentStore, "fetch", lambda cve_id: {'cvss': 10.0, 'summary': cve_id})
+
+    # Content without a lookups folder: the CVEs are cached in memory instead
+    CveEnrichmentStore.prefetch(["CVE-2021-44228"], str(tmp_path))
+    assert CveEnrichment.enrich_cve('CVE-2021-44228', str(tmp_path)) == {'id': 'CVE-2021-44228', 'cvss': 10.0, 'summary': 'CVE-2021-44228'}
+    assert not (tmp_path / "lookups").exists()
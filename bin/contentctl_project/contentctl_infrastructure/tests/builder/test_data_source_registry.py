@@ -0,0 +1,33 @@
+import pytest
+
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+from bin.contentctl_project.contentctl_infrastructure.builder.data_source_registry import DataSourceRegistry
+
+
+def test_data_source_registry():
+    registry = DataSourceRegistry(SECURITY_CONTENT_ROOT)
+    sysmon = registry.get('Sysmon Event ID 1')
+    windows = registry.get('Windows Security 4688')
+    assert registry.get('missing') is None
+
+    assert registry.get_mapping(windows, 'data_model', 'cim')['data_set'] == 'Endpoint.Processes'
+    assert registry.get_mapping(sysmon, 'data_source', 'Windows Security 4688')['mapping']['Image'] == 'NewProcessName'
+    with pytest.raises(AttributeError):
+        registry.get_mapping(sysmon, 'data_model', 'ocsf')
+
+    cim_to_ocsf = registry.get_cim_to_ocsf_mapping(windows)
+    assert cim_to_ocsf['mapping']['process_id'] == 'process.pid'
+    assert registry.get_cim_to_ocsf_mapping(windows) is cim_to_ocsf
+
+    # Sysmon fields mapped to the OCSF fields of Windows Security 4688
+    converted = registry.get_mapping_converted_data_source(sysmon, 'data_source', 'Windows Security 4688', windows, 'data_model', 'ocsf')
+    assert converted['mapping']['Image'] == 'process.file.path'
+
+    built = []
+    def build():
+        built.append(1)
+        return object()
+    pipeline = registry.get_pipeline(sysmon, 'ocsf', 'Windows Security 4688', build)
+    assert registry.get_pipeline(sysmon, 'ocsf', 'Windows Security 4688', build) is pipeline
+    assert registry.get_pipeline(sysmon, 'ocsf', None, build) is not pipeline
+    assert len(built) == 2
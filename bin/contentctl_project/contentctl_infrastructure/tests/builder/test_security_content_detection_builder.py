@@ -201,7 +201,7 @@ def test_add_cve():
     security_content_builder = SecurityContentDetectionBuilder()
     security_content_builder.setObject(os.path.join(os.path.dirname(__file__), 
         'test_data/detection/spoolsv_suspicious_loaded_modules.yml'))
-    security_content_builder.addCve()
+    security_content_builder.addCve(SECURITY_CONTENT_ROOT)
     detection = security_content_builder.getObject()
     
     assert detection.cve_enrichment == [{'id': 'CVE-2021-34527', 'cvss': 9.0, 'summary': 'Windows Print Spooler Remote Code Execution Vulnerability'}]
\ No newline at end of file
@@ -0,0 +1,52 @@
+import os
+
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
+from bin.contentctl_project.contentctl_infrastructure.adapter.yml_writer import YmlWriter
+from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+from bin.contentctl_project.contentctl_infrastructure.builder.sigma_converter import SigmaConverter, SigmaConverterInputDto, SigmaConverterOutputDto
+from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SigmaConverterTarget
+
+
+def convert(detection_folder: str, workers: int, log_source: str = None) -> SigmaConverterOutputDto:
+    output_dto = SigmaConverterOutputDto([])
+    SigmaConverter(output_dto).execute(SigmaConverterInputDto(
+        data_model = SigmaConverterTarget.RAW,
+        detection_path = None,
+        detection_folder = detection_folder,
+        input_path = SECURITY_CONTENT_ROOT,
+        log_source = log_source,
+        workers = workers
+    ))
+    return output_dto
+
+
+def test_sigma_converter_errors(tmp_path):
+    detection = YmlReader.load_file(os.path.join(SECURITY_CONTENT_ROOT, 'dev', 'endpoint', '7zip_commandline_to_smb_share_path.yml'))
+    detection['tags']['required_fields'] = ['Image', 'CommandLine']
+    YmlWriter.writeYmlFile(str(tmp_path / 'a_7zip.yml'), detection)
+    YmlWriter.writeYmlFile(str(tmp_path / 'b_unknown_data_source.yml'), {**detection, 'name': 'Unknown Data Source', 'data_source': ['Missing']})
+    YmlWriter.writeYmlFile(str(tmp_path / 'c_7zip_copy.yml'), {**detection, 'name': '7zip Copy'})
+
+    # A file that fails is reported and does not stop the conversion of the others
+    sequential = convert(str(tmp_path), 1)
+    assert [d.name for d in sequential.detections] == ['7zip CommandLine To SMB Share Path', '7zip Copy']
+    assert sequential.detections[0].search.startswith('`sysmon` ')
+    assert sequential.errors == [{
+        'file': str(tmp_path / 'b_unknown_data_source.yml'),
+        'detection': 'Unknown Data Source',
+        'error': "Didn't find data source with name: Missing"
+    }]
+
+    parallel = convert(str(tmp_path), 2)
+    assert [d.dict() for d in parallel.detections] == [d.dict() for d in sequential.detections]
+    assert parallel.errors == sequential.errors
+
+
+def test_sigma_converter_mapping_error(tmp_path):
+    detection = YmlReader.load_file(os.path.join(SECURITY_CONTENT_ROOT, 'dev', 'endpoint', '7zip_commandline_to_smb_share_path.yml'))
+    detection['tags']['required_fields'] = ['Image', 'CommandLine']
+    YmlWriter.writeYmlFile(str(tmp_path / '7zip.yml'), detection)
+
+    # The error of the mapping lookup is kept in the message
+    output_dto = convert(str(tmp_path), 1, 'Missing')
+    assert output_dto.errors[0]['error'] == "Couldn't find data source mapping for log source Missing: Couldn't find mapping."
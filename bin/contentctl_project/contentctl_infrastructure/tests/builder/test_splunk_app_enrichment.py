@@ -1,9 +1,47 @@
 
 
+from bin.contentctl_project.contentctl_infrastructure.tests.test_constants import SECURITY_CONTENT_ROOT
 from bin.contentctl_project.contentctl_infrastructure.builder.splunk_app_enrichment import SplunkAppEnrichment
+from bin.contentctl_project.contentctl_infrastructure.builder.enrichment_cache import EnrichmentCache
 
 
 def test_splunk_app_enrichment():
-    splunk_app_enriched = SplunkAppEnrichment.enrich_splunk_app('Splunk_TA_microsoft_sysmon')
+    splunk_app_enriched = SplunkAppEnrichment.enrich_splunk_app('Splunk_TA_microsoft_sysmon', SECURITY_CONTENT_ROOT)
     assert splunk_app_enriched['name'] == 'Splunk Add-on for Sysmon'
-    assert splunk_app_enriched['url'] == 'https://splunkbase.splunk.com/app/5709'
\ No newline at end of file
+    assert splunk_app_enriched['url'] == 'https://splunkbase.splunk.com/app/5709'
+
+def test_splunk_app_enrichment_prefetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(SplunkAppEnrichment, "cache_file", str(tmp_path / "APP_ENRICHMENT_CACHE.sqlite"))
+    monkeypatch.setattr(SplunkAppEnrichment, "results", {})
+    monkeypatch.setattr(SplunkAppEnrichment, "failures", {})
+    fetched = []
+    def fetch(splunk_ta, session):
+        fetched.append(splunk_ta)
+        if splunk_ta == "Splunk_TA_missing":
+            raise(Exception("not found"))
+        return {'name': splunk_ta.upper(), 'url': f'https://splunkbase.splunk.com/app/{len(splunk_ta)}'}
+    monkeypatch.setattr(SplunkAppEnrichment, "fetch", fetch)
+
+    SplunkAppEnrichment.prefetch(["Splunk_TA_a", "Splunk_TA_b", "Splunk_TA_a", "Splunk_TA_missing"], str(tmp_path))
+    assert sorted(fetched) == ["Splunk_TA_a", "Splunk_TA_b", "Splunk_TA_missing"]
+    assert SplunkAppEnrichment.enrich_splunk_app("Splunk_TA_a", str(tmp_path)) == {'name': 'SPLUNK_TA_A', 'url': 'https://splunkbase.splunk.com/app/11'}
+    assert SplunkAppEnrichment.enrich_splunk_app("Splunk_TA_missing", str(tmp_path)) == {'name': 'Splunk_TA_missing', 'url': ''}
+
+    # A later run is served from the cache file, and only the failure is fetched again
+    fetched.clear()
+    SplunkAppEnrichment.results.clear()
+    SplunkAppEnrichment.failures.clear()
+    SplunkAppEnrichment.prefetch(["Splunk_TA_a", "Splunk_TA_b", "Splunk_TA_missing"], str(tmp_path), force_cached_or_offline=True)
+    assert fetched == ["Splunk_TA_missing"]
+    assert SplunkAppEnrichment.enrich_splunk_app("Splunk_TA_b", str(tmp_path)) == {'name': 'SPLUNK_TA_B', 'url': 'https://splunkbase.splunk.com/app/11'}
+
+def test_splunk_app_enrichment_without_lookups(tmp_path, monkeypatch):
+    monkeypatch.setattr(EnrichmentCache, "memory_connections", {})
+    monkeypatch.setattr(SplunkAppEnrichment, "results", {})
+    monkeypatch.setattr(SplunkAppEnrichment, "failures", {})
+    monkeypatch.setattr(SplunkAppEnrichment, "fetch", lambda splunk_ta, session: {'name': splunk_ta.upper(), 'url': ''})
+
+    # Content without a lookups folder: the enrichment is cached in memory instead
+    SplunkAppEnrichment.prefetch(["Splunk_TA_a"], str(tmp_path))
+    assert SplunkAppEnrichment.enrich_splunk_app("Splunk_TA_a", str(tmp_path)) == {'name': 'SPLUNK_TA_A', 'url': ''}
+    assert not (tmp_path / "lookups").exists()
@@ -1,9 +1,43 @@
 import pytest
 import os
+import shutil
 
 from bin.contentctl_project.contentctl_infrastructure.builder.yml_reader import YmlReader
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import ContentCache
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
+from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
+from bin.contentctl_project.contentctl_core.domain.entities.detection import Detection
 
 
 def test_read_detection_file():
     yml_obj = YmlReader.load_file(os.path.join(os.path.dirname(__file__), 'test_data/detection/valid.yml'))
     assert yml_obj['name'] == "Attempted Credential Dump From Registry via Reg exe"
+
+
+def test_read_detection_file_cached(tmp_path):
+    detection_path = tmp_path / 'valid.yml'
+    shutil.copy(os.path.join(os.path.dirname(__file__), 'test_data/detection/valid.yml'), detection_path)
+
+    ContentCache.initialize_cache(str(tmp_path / '.contentctl_cache'))
+    try:
+        yml_obj = YmlReader.load_file(str(detection_path))
+        yml_obj['name'] = "Changed by the caller"
+        yml_obj_cached = YmlReader.load_file(str(detection_path))
+        assert yml_obj_cached['name'] == "Attempted Credential Dump From Registry via Reg exe"
+        assert ContentCache.hits == 1
+
+        with open(detection_path, 'a') as f:
+            f.write('\nversion: 99\n')
+        yml_obj_modified = YmlReader.load_file(str(detection_path))
+        assert yml_obj_modified['version'] == 99
+    finally:
+        ContentCache.close_cache()
+        ContentCache.hits = 0
+        ContentCache.misses = 0
+
+
+def test_model_namespace():
+    # Objects validated by other validators or parsed by another builder are not reused
+    namespace = ContentCache.model_namespace(Detection, SecurityContentDetectionBuilder)
+    assert namespace.startswith("Detection:")
+    assert namespace != ContentCache.model_namespace(Detection, SecurityContentBasicBuilder)
@@ -9,10 +9,17 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'bin/
 from bin.contentctl_project.contentctl_core.application.use_cases.content_changer import ContentChanger, ContentChangerInputDto
 from bin.contentctl_project.contentctl_core.application.use_cases.generate import GenerateInputDto, Generate
 from bin.contentctl_project.contentctl_core.application.use_cases.validate import ValidateInputDto, Validate
+from bin.contentctl_project.contentctl_core.application.factory.utils.search_linter import SearchLinter
 from bin.contentctl_project.contentctl_core.application.use_cases.doc_gen import DocGenInputDto, DocGen
 from bin.contentctl_project.contentctl_core.application.use_cases.new_content import NewContentInputDto, NewContent, NewAttackDataContent
 from bin.contentctl_project.contentctl_core.application.use_cases.reporting import ReportingInputDto, Reporting
 from bin.contentctl_project.contentctl_core.application.use_cases.convert import ConvertInputDto, Convert
+from bin.contentctl_project.contentctl_core.application.use_cases.query import QueryInputDto, Query
+from bin.contentctl_project.contentctl_core.application.use_cases.watch import WatchInputDto, Watch
+from bin.contentctl_project.contentctl_core.application.factory.factory import LOAD_ORDER
+from bin.contentctl_project.contentctl_core.application.factory.utils.content_graph import ContentGraph
+from bin.contentctl_project.contentctl_core.application.factory.utils.profiler import Profiler
+from bin.contentctl_project.contentctl_core.application.factory.factory import Factory
 from bin.contentctl_project.contentctl_core.application.use_cases.initialize import Initialize
 from bin.contentctl_project.contentctl_core.application.use_cases.deploy import Deploy
 from bin.contentctl_project.contentctl_core.application.use_cases.build import Build
@@ -26,6 +33,10 @@ from bin.contentctl_project.contentctl_infrastructure.builder.security_content_d
 from bin.contentctl_project.contentctl_infrastructure.builder.sigma_converter import SigmaConverterInputDto
 from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_yml_adapter import ObjToYmlAdapter
 from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_json_adapter import ObjToJsonAdapter
+from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_bundle_adapter import ObjToBundleAdapter
+from bin.contentctl_project.contentctl_infrastructure.builder.content_bundle import ContentBundle, CONTENT_BUNDLE_FILENAME
+from bin.contentctl_project.contentctl_infrastructure.builder.content_watcher import ContentWatcher
+from bin.contentctl_project.contentctl_infrastructure.adapter.watch_status_server import WatchStatusServer
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_story_builder import SecurityContentStoryBuilder
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_detection_builder import SecurityContentDetectionBuilder
 from bin.contentctl_project.contentctl_infrastructure.builder.security_content_basic_builder import SecurityContentBasicBuilder
@@ -38,6 +49,16 @@ from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_md_adapter
 from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_svg_adapter import ObjToSvgAdapter
 from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_attack_nav_adapter import ObjToAttackNavAdapter
 from bin.contentctl_project.contentctl_infrastructure.builder.attack_enrichment import AttackEnrichment
+from bin.contentctl_project.contentctl_infrastructure.builder.content_cache import ContentCache, CONTENT_CACHE_DIRECTORY
+from bin.contentctl_project.contentctl_infrastructure.builder.cve_enrichment import CveEnrichmentStore, CveEnrichment
+from bin.contentctl_project.contentctl_infrastructure.builder.splunk_app_enrichment import SplunkAppEnrichment
+from bin.contentctl_project.contentctl_infrastructure.adapter.conf_writer import ConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.streaming_conf_writer import StreamingConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.incremental_conf_writer import IncrementalConfWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.json_writer import JsonWriter, JsonArrayWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.yml_writer import YmlWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.jinja_writer import JinjaWriter
+from bin.contentctl_project.contentctl_infrastructure.adapter.template_registry import TemplateRegistry
 from bin.contentctl_project.contentctl_core.domain.entities.enums.enums import SecurityContentType
 from bin.contentctl_project.contentctl_infrastructure.adapter.obj_to_attackdata_yml_adapter import ObjToAttackDataYmlAdapter
 
@@ -96,8 +117,8 @@ def generate(args) -> None:
         print("ERROR: missing parameter -p/--product .")
         sys.exit(1)
 
-    if args.product not in ['ESCU', 'SSA', 'API']:
-        print("ERROR: invalid product. valid products are ESCU, SSA or API. ")
+    if args.product not in ['ESCU', 'SSA', 'API', 'BUNDLE']:
+        print("ERROR: invalid product. valid products are ESCU, SSA, API or BUNDLE. ")
         sys.exit(1)
 
 
@@ -107,18 +128,20 @@ def generate(args) -> None:
     #Save runtime by only generating the required factory inputs
     factory_input_dto = None
     ba_factory_input_dto = None
-    if args.product in ["ESCU", "API"]:
+    if args.product in ["ESCU", "API", "BUNDLE"]:
 
         factory_input_dto = FactoryInputDto(
             os.path.abspath(args.path),
             SecurityContentBasicBuilder(),
-            SecurityContentDetectionBuilder(force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment),
-            SecurityContentStoryBuilder(output_path=args.output),
+            SecurityContentDetectionBuilder(force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, expand_macros=args.expand_macros),
+            # A bundle has no app.manifest, its story names use the ESCU app name like the API
+            SecurityContentStoryBuilder(output_path=None if args.product == "BUNDLE" else args.output),
             SecurityContentBaselineBuilder(),
             SecurityContentInvestigationBuilder(),
             SecurityContentPlaybookBuilder(input_path=args.path),
             SecurityContentDirector(),
-            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+            workers=args.workers
         )
     if args.product in ["SSA", "API"]:
         ba_factory_input_dto = BAFactoryInputDto(
@@ -126,7 +149,7 @@ def generate(args) -> None:
             SecurityContentBasicBuilder(),
             SecurityContentDetectionBuilder(force_cached_or_offline = args.cached_and_offline, skip_enrichment=args.skip_enrichment),
             SecurityContentDirector(),
-            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle)
         )
 
 
@@ -135,7 +158,7 @@ def generate(args) -> None:
             os.path.abspath(args.output),
             factory_input_dto,
             ba_factory_input_dto,
-            ObjToConfAdapter(args.path),
+            ObjToConfAdapter(args.path, incremental=args.incremental),
             SecurityContentProduct.ESCU
         )
     elif args.product == "API":
@@ -143,9 +166,17 @@ def generate(args) -> None:
             os.path.abspath(args.output),
             factory_input_dto,
             ba_factory_input_dto,
-            ObjToJsonAdapter(),
+            ObjToJsonAdapter(compact=args.api_compact, ndjson=args.api_ndjson, shards=args.api_shards),
             SecurityContentProduct.API
         )
+    elif args.product == "BUNDLE":
+        generate_input_dto = GenerateInputDto(
+            os.path.abspath(args.output),
+            factory_input_dto,
+            ba_factory_input_dto,
+            ObjToBundleAdapter(),
+            SecurityContentProduct.BUNDLE
+        )
     else:
         generate_input_dto = GenerateInputDto(
             os.path.abspath(args.output),
@@ -190,7 +221,9 @@ def validate(args) -> None:
             SecurityContentInvestigationBuilder(check_references=args.check_references),
             SecurityContentPlaybookBuilder(input_path=args.path, check_references=args.check_references),
             SecurityContentDirector(),
-            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+            workers=args.workers,
+            search_lint_suppress=tuple(args.suppress_search_rule)
         )
     if args.product in ["SSA", "all"]:
         ba_factory_input_dto = BAFactoryInputDto(
@@ -198,14 +231,16 @@ def validate(args) -> None:
             SecurityContentBasicBuilder(),
             SecurityContentDetectionBuilder(force_cached_or_offline = args.cached_and_offline, check_references=args.check_references, skip_enrichment=args.skip_enrichment),
             SecurityContentDirector(),
-            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle)
         )
 
     if args.product == "ESCU" or args.product == "all":
         validate_input_dto = ValidateInputDto(
             factory_input_dto,
             ba_factory_input_dto,
-            SecurityContentProduct.ESCU
+            SecurityContentProduct.ESCU,
+            search_cost_report=args.search_cost_report,
+            max_search_cost=args.max_search_cost
         )
         validate = Validate()
         validate.execute(validate_input_dto)
@@ -233,13 +268,14 @@ def doc_gen(args) -> None:
         SecurityContentInvestigationBuilder(),
         SecurityContentPlaybookBuilder(input_path=args.path),
         SecurityContentDirector(),
-        AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+        AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+        workers=args.workers
     )
 
     doc_gen_input_dto = DocGenInputDto(
         os.path.abspath(args.output),
         factory_input_dto,
-        ObjToMdAdapter()
+        ObjToMdAdapter(workers=args.workers)
     )
 
     doc_gen = DocGen()
@@ -278,7 +314,8 @@ def reporting(args) -> None:
         SecurityContentInvestigationBuilder(),
         SecurityContentPlaybookBuilder(input_path=args.path),
         SecurityContentDirector(),
-        AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment)
+        AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+        workers=args.workers
     )
 
     reporting_input_dto = ReportingInputDto(
@@ -291,6 +328,75 @@ def reporting(args) -> None:
     reporting.execute(reporting_input_dto)
 
 
+def query(args) -> None:
+    type_names = [type.name for type in SecurityContentType]
+    for type_name in [args.type, args.result_type]:
+        if type_name is not None and type_name not in type_names:
+            print(f"ERROR: invalid type {type_name}. valid types are {', '.join(type_names)}. ")
+            sys.exit(1)
+
+    factory_input_dto = None
+    graph = None
+    if args.bundle:
+        # Only the references are read from the bundle, no content is parsed
+        with ContentBundle(args.bundle) as bundle:
+            graph = ContentGraph.from_references(bundle.get_all_references(), bundle.get_all_names())
+    else:
+        factory_input_dto = FactoryInputDto(
+            os.path.abspath(args.path),
+            SecurityContentBasicBuilder(),
+            SecurityContentDetectionBuilder(force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment),
+            SecurityContentStoryBuilder(),
+            SecurityContentBaselineBuilder(),
+            SecurityContentInvestigationBuilder(),
+            SecurityContentPlaybookBuilder(input_path=args.path),
+            SecurityContentDirector(),
+            AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+            workers=args.workers
+        )
+
+    query_input_dto = QueryInputDto(
+        factory_input_dto,
+        graph,
+        SecurityContentType[args.type],
+        args.name,
+        dependencies=args.dependencies,
+        result_type=SecurityContentType[args.result_type] if args.result_type else None,
+        transitive=args.transitive
+    )
+    query = Query()
+    query.execute(query_input_dto)
+
+
+def watch(args) -> None:
+    if args.cached_and_offline:
+        LinkValidator.initialize_cache(args.cached_and_offline)
+
+    factory_input_dto = FactoryInputDto(
+        os.path.abspath(args.path),
+        SecurityContentBasicBuilder(),
+        SecurityContentDetectionBuilder(force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment),
+        SecurityContentStoryBuilder(),
+        SecurityContentBaselineBuilder(),
+        SecurityContentInvestigationBuilder(),
+        SecurityContentPlaybookBuilder(input_path=args.path),
+        SecurityContentDirector(),
+        AttackEnrichment.get_attack_lookup(args.path, force_cached_or_offline=args.cached_and_offline, skip_enrichment=args.skip_enrichment, attack_bundle=args.attack_bundle),
+        workers=args.workers
+    )
+
+    watch_input_dto = WatchInputDto(
+        factory_input_dto,
+        ContentWatcher([os.path.join(args.path, type.name) for type in LOAD_ORDER], use_inotify=not args.poll),
+        WatchStatusServer(args.host, args.port) if args.port is not None else None
+    )
+    watch = Watch()
+    watch.execute(watch_input_dto)
+
+    if args.cached_and_offline:
+        LinkValidator.close_cache()
+
+
 def initialize(args) -> None:
     Initialize(args)
 
@@ -321,7 +427,8 @@ def convert(args) -> None:
         detection_path = args.detection_path,
         detection_folder = args.detection_folder, 
         input_path = args.path,
-        log_source = args.log_source
+        log_source = args.log_source,
+        workers = args.workers
     )
 
     convert_input_dto = ConvertInputDto(
@@ -332,6 +439,22 @@ def convert(args) -> None:
     convert.execute(convert_input_dto)
 
 
+def profile_pipeline() -> None:
+    # The steps recorded by --profile: loading and validating content, every builder
+    # step, the enrichment lookups (network calls and their caches) and the adapters and
+    # writers producing the output
+    for cls in [Generate, Validate, Factory, SecurityContentDirector]:
+        Profiler.instrument(cls, 'pipeline')
+    for cls in [SecurityContentBasicBuilder, SecurityContentDetectionBuilder, SecurityContentStoryBuilder, SecurityContentBaselineBuilder,
+                SecurityContentInvestigationBuilder, SecurityContentPlaybookBuilder, SecurityContentObjectBuilder]:
+        Profiler.instrument(cls, 'builder')
+    for cls in [AttackEnrichment, CveEnrichmentStore, CveEnrichment, SplunkAppEnrichment, LinkValidator, ContentCache]:
+        Profiler.instrument(cls, 'enrichment')
+    for cls in [ObjToConfAdapter, ObjToJsonAdapter, ObjToBundleAdapter, ObjToYmlAdapter, ObjToMdAdapter, ObjToSvgAdapter, ObjToAttackNavAdapter,
+                ConfWriter, StreamingConfWriter, IncrementalConfWriter, JsonWriter, JsonArrayWriter, YmlWriter, JinjaWriter]:
+        Profiler.instrument(cls, 'adapter')
+
+
 def main(args):
 
     init()
@@ -345,8 +468,21 @@ def main(args):
         help="Force cached/offline resources.  While this makes execution much faster, it may result in enrichment which is out of date. This is suitable for use only in development or disconnected environments.")
     parser.add_argument("--skip_enrichment", action=argparse.BooleanOptionalAction,
         help="Skip enrichment of CVEs.  This can significantly decrease the amount of time needed to run content_ctl.")
-
-    parser.set_defaults(cached_and_offline=False, func=lambda _: parser.print_help())
+    parser.add_argument("--workers", required=False, type=int, default=1,
+        help="Number of worker processes used to parse and validate detections, and to convert them with convert.  Cross references are still resolved in a single process, so the output is identical to a run with one worker.")
+
+    parser.add_argument("--attack_bundle", required=False, type=str, default=None,
+        help="Path to a local ATT&CK Enterprise STIX bundle (enterprise-attack.json) to build the MITRE ATT&CK enrichment from, instead of the TAXII server.  Suitable for disconnected environments.")
+    parser.add_argument("--nvd_feed", required=False, type=str, action='append', default=[],
+        help=f"Path to an NVD JSON feed (nvdcve-1.1-*.json[.gz] or a saved NVD 2.0 API response) to import into {CveEnrichmentStore.cache_file} in the content folder before enrichment.  May be given more than once.  Combined with --cached_and_offline, CVE enrichment needs no network access.")
+    parser.add_argument("--content_cache", action=argparse.BooleanOptionalAction,
+        help=f"Cache parsed and validated content under {CONTENT_CACHE_DIRECTORY}/ in the content folder, keyed by file hash.  Only files that changed since the last run are parsed and validated again.")
+    parser.add_argument("--profile", required=False, type=str, nargs='?', const="contentctl_profile.json", default=None,
+        help="Record the wall time, CPU time, allocations and calls of every step (builder steps, enrichment lookups, adapter writes) and write them to this file, contentctl_profile.json by default, in the Chrome trace format (open it in chrome://tracing or https://ui.perfetto.dev).  A summary table is printed at the end.")
+    parser.add_argument("--profile_allocations", action=argparse.BooleanOptionalAction,
+        help="With --profile, also record the memory every step leaves allocated, traced with tracemalloc.  This makes the run several times slower.")
+
+    parser.set_defaults(cached_and_offline=False, content_cache=False, profile_allocations=False, func=lambda _: parser.print_help())
 
     actions_parser = parser.add_subparsers(title="Splunk Security Content actions", dest="action")
     #new_parser = actions_parser.add_parser("new", help="Create new content (detection, story, baseline)")
@@ -360,6 +496,8 @@ def main(args):
     #docgen_parser = actions_parser.add_parser("docgen", help="Generates documentation")
     
     reporting_parser = actions_parser.add_parser("reporting", help="Create security content reporting")
+    query_parser = actions_parser.add_parser("query", help="Show what depends on a piece of content, or what it depends on")
+    watch_parser = actions_parser.add_parser("watch", help="Validate content once, then keep validating the files that change")
 
 
     build_parser = actions_parser.add_parser("build", help="Build an application suitable for deployment to a search head")
@@ -381,6 +519,13 @@ def main(args):
                                    "Larger numbers will result in faster resolution, but will be more likely to hit rate limits or use a large amount of "
                                    "bandwidth.  A larger number of threads is particularly useful on high-bandwidth connections, but does not improve "
                                    "performance on slow connections.")
+    validate_parser.add_argument("--search_cost_report", "--search-cost-report", required=False, type=str, default=None,
+        help="ESCU only: write the search cost and the search cost warnings of every detection to this JSON file.")
+    validate_parser.add_argument("--max_search_cost", "--max-search-cost", required=False, type=int, default=None,
+        help="ESCU only: fail the validation when the search of a detection costs more than this.")
+    validate_parser.add_argument("--suppress_search_rule", "--suppress-search-rule", action="append", default=[], choices=list(SearchLinter.RULES),
+        help="A search cost rule to suppress for every detection, may be given more than once.  A detection suppresses rules "
+             "with tags.search_lint_suppress.")
 
     validate_parser.set_defaults(func=validate, check_references=False, epilog="""
                 Validates security manifest for correctness, adhering to spec and other common items.""")
@@ -388,7 +533,20 @@ def main(args):
     generate_parser.add_argument("-o", "--output", required=True, type=str,
         help="Path where to store the deployment package")
     generate_parser.add_argument("-pr", "--product", required=True, type=str,
-        help="Type of package to create, choose between `ESCU`, `SSA` or `API`.")
+        help="Type of package to create, choose between `ESCU`, `SSA`, `API` or `BUNDLE`.  `BUNDLE` writes all of the enriched content and the references between it to " + CONTENT_BUNDLE_FILENAME + ", a versioned SQLite file read with ContentBundle.")
+    generate_parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=False,
+        help="ESCU only: still build all of the content, but only re-render the conf stanzas of objects whose built content changed since the last "
+             "incremental generate into the same output path, and only rewrite conf files whose content changed.  Every built object is "
+             "fingerprinted to find the changes.  The manifest is kept in " + CONTENT_CACHE_DIRECTORY + " under the content path.")
+    generate_parser.add_argument("--api_compact", action=argparse.BooleanOptionalAction, default=False,
+        help="API only: write the JSON documents without whitespace, serialized with orjson when it is installed.")
+    generate_parser.add_argument("--api_ndjson", action=argparse.BooleanOptionalAction, default=False,
+        help="API only: also write every type as NDJSON (one object per line) and an <type>.index.json mapping each id to its byte offset and length in the NDJSON file.")
+    generate_parser.add_argument("--api_shards", action=argparse.BooleanOptionalAction, default=False,
+        help="API only: also write every object to its own file, <type>/<id>.json, listed in <type>.index.json.")
+    generate_parser.add_argument("--expand_macros", "--expand-macros", action=argparse.BooleanOptionalAction, default=False,
+        help="Write the search of every detection with its macros expanded, recursively, from the definitions in macros/, for offline review or to run the searches without the ESCU app installed.  "
+             "Macros that are not defined there, such as the ones of the CIM app, are left as they are.")
     generate_parser.set_defaults(func=generate)
 
     # content_changer_choices = ContentChanger.enumerate_content_changer_functions()
@@ -407,6 +565,27 @@ def main(args):
 
     reporting_parser.set_defaults(func=reporting)
 
+    query_parser.add_argument("-t", "--type", required=True, type=str,
+        help="Type of the content to query, e.g. `macros`, `lookups`, `stories`, `detections` or `data_sources`.")
+    query_parser.add_argument("-n", "--name", required=True, type=str, help="Name of the content to query")
+    query_parser.add_argument("--dependencies", action=argparse.BooleanOptionalAction, default=False,
+        help="List what the content depends on, instead of the content that depends on it.")
+    query_parser.add_argument("-rt", "--result_type", required=False, type=str, default=None,
+        help="Only list content of this type, e.g. `-t stories -rt detections` lists the detections of a story.")
+    query_parser.add_argument("--transitive", action=argparse.BooleanOptionalAction, default=False,
+        help="Follow references transitively, e.g. detections that use a macro through another macro.")
+    query_parser.add_argument("--bundle", required=False, type=str, default=None,
+        help=f"Read the references from a {CONTENT_BUNDLE_FILENAME} written by `generate -pr BUNDLE` instead of loading the content, which answers in well under a second.")
+    query_parser.set_defaults(func=query)
+
+    watch_parser.add_argument("--port", required=False, type=int, default=None,
+        help="Serve the validation status over HTTP on this port, for editor integrations: GET /status, GET /errors?file=<path> and POST /validate with {\"files\": [...]}.  0 picks a free port.")
+    watch_parser.add_argument("--host", required=False, type=str, default="127.0.0.1",
+        help="Address the validation status is served on.  Defaults to 127.0.0.1, so only local clients can reach it.")
+    watch_parser.add_argument("--poll", action=argparse.BooleanOptionalAction, default=False,
+        help="Poll the content for changes instead of using inotify, e.g. on network file systems.")
+    watch_parser.set_defaults(func=watch)
+
     convert_parser.add_argument("-dm", "--data_model", required=False, type=str, default="cim", help="converter target, choose between cim, raw, ocsf")
     convert_parser.add_argument("-lo", "--log_source", required=False, type=str, help="converter log source")
     convert_parser.add_argument("-dp", "--detection_path", required=False, type=str, help="path to a single detection")
@@ -442,11 +621,28 @@ def main(args):
 
     # # parse them
     args = parser.parse_args()
-#    try:
-    return args.func(args)
-#    except Exception as e:
-#        print(f"Error for function [{args.func.__name__}]: {str(e)}")
-#        sys.exit(1)
+
+    if args.profile is not None:
+        profile_pipeline()
+        Profiler.enable(args.profile_allocations)
+    if args.content_cache:
+        ContentCache.initialize_cache(os.path.join(args.path, CONTENT_CACHE_DIRECTORY))
+    # Every writer renders through the registry, which compiles a template on first use
+    TemplateRegistry.initialize(os.path.join(args.path, CONTENT_CACHE_DIRECTORY, 'templates'))
+    for nvd_feed in args.nvd_feed:
+        CveEnrichmentStore.import_nvd_feed(nvd_feed, args.path)
+    try:
+        with Profiler.span(f"contentctl {args.action}", 'pipeline'):
+            result = args.func(args)
+    finally:
+        if args.profile is not None:
+            Profiler.disable()
+            Profiler.write_trace(args.profile)
+            print(f"\n\nProfile of contentctl {args.action}, written to [{args.profile}]:\n{Profiler.summary()}")
+
+    if args.content_cache:
+        ContentCache.close_cache()
+    return result
 
 if __name__ == "__main__":
     main(sys.argv[1:])